@@ -0,0 +1,63 @@
+"""
+Validate many tenant configs with build_config in a loop and with build_configs on 1, 2, 4... workers.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_batch.py [number_of_documents]
+"""
+import os
+import sys
+import time
+from mapped_config.batch import build_configs
+from mapped_config.loader import build_config, InvalidDataException
+from mapped_config.schema import compile_schema
+
+
+def build_case(documents):
+    mapping = {
+        "tenant": None,
+        "database": {"hostname": "localhost", "port": 3306, "replicas": [{"hostname": None, "port": 3306}]},
+        "features": dict(("flag{i}".format(i=i), False) for i in range(50)),
+    }
+    return compile_schema(mapping), [{
+        "tenant": "tenant{i}".format(i=i),
+        "database": {"replicas": [{"hostname": "replica{j}".format(j=j)} for j in range(5)]},
+        "features": dict(("flag{j}".format(j=j), j % 2 == 0) for j in range(0, 50, 3)),
+    } for i in range(documents)]
+
+
+def serial(schema, documents):
+    for document in documents:
+        try:
+            build_config(schema, document)
+        except InvalidDataException:
+            pass
+
+
+def timed(function):
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    schema, documents = build_case(count)
+    cores = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 <= cores:
+        workers.append(workers[-1] * 2)
+
+    baseline = timed(lambda: serial(schema, documents))
+    print("{n} documents, {cores} cores".format(n=count, cores=cores))
+    print("  loop: {time:.3f}s".format(time=baseline))
+    for executor in ("thread", "process"):
+        for n in workers:
+            elapsed = timed(lambda: list(build_configs(schema, documents, workers=n, executor=executor,
+                                                       chunksize=64)))
+            print("{executor:>7} x{n}: {time:.3f}s ({speedup:.2f}x)".format(
+                executor=executor, n=n, time=elapsed, speedup=baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
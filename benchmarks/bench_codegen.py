@@ -0,0 +1,42 @@
+"""
+Compare the codegen engine with the fast one: validation and building the namedtuples of a generated configuration,
+and the time to compile the schema.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_codegen.py [number_of_items]
+"""
+import sys
+import timeit
+from bench_validator import build_case
+from mapped_config import codegen
+from mapped_config.loader import build_config
+from mapped_config.schema import compile_schema
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    schema, document = build_case(items)
+    results = {}
+    for engine in ["fast", "codegen"]:
+        compiled = compile_schema(schema, engine=engine)
+        runs = 3
+        validate = min(timeit.repeat(lambda: compiled.validator().validate(document), number=runs, repeat=3)) / runs
+        build = min(timeit.repeat(lambda: build_config(compiled, document), number=runs, repeat=3)) / runs
+        results[engine] = validate, build
+        print("{engine:>10}: {validate:.4f}s validate, {build:.4f}s build_config ({items} items per list)".format(
+            engine=engine, validate=validate, build=build, items=items))
+    print("   speedup: {validate:.1f}x validate, {build:.1f}x build_config".format(
+        validate=results["fast"][0] / results["codegen"][0], build=results["fast"][1] / results["codegen"][1]))
+
+    compiled = compile_schema(schema, engine="codegen")
+    runs = 100
+    generate = min(timeit.repeat(lambda: codegen.generate_source(compiled._schema), number=runs, repeat=3)) / runs
+    source = codegen.generate_source(compiled._schema)[0]
+    compile_time = min(timeit.repeat(lambda: compile(source, "<bench>", "exec"), number=runs, repeat=3)) / runs
+    print("   compile: {generate:.5f}s generate, {compile:.5f}s compile ({lines} lines, once per schema)".format(
+        generate=generate, compile=compile_time, lines=source.count("\n")))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Memory of a config with a big list of similar items, built as namedtuples and with compact=True.
+
+The document is parsed from JSON inside the measure, like a loader does, so the repeated strings are separate
+objects. The retained memory is what the built config keeps after the document is released.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_compact.py [number_of_hosts]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from mapped_config.loader import build_config
+from mapped_config.schema import compile_schema
+
+
+def build_case(hosts):
+    mapping = {"inventory": {"name": None, "hosts": [{
+        "name": None, "region": None, "port": 22, "user": "admin", "weight": 1.0, "tags": [""],
+        "provider": {"name": None, "zone": None},
+    }]}}
+    document = {"inventory": {"name": "production", "hosts": [{
+        "name": "host{i}".format(i=i),
+        "region": ["eu-west-1", "eu-central-1", "us-east-1"][i % 3],
+        "port": 22 if i % 10 else 2222,
+        "user": "deploy",
+        "weight": 1.0,
+        "tags": ["web", "linux"],
+        "provider": {"name": "aws", "zone": "zone{z}".format(z=i % 6)},
+    } for i in range(hosts)]}}
+    return compile_schema(mapping), json.dumps(document)
+
+
+def load(schema, text, compact):
+    return build_config(schema, json.loads(text), compact=compact)
+
+
+def measure(schema, text, compact):
+    gc.collect()
+    tracemalloc.start()
+    config = load(schema, text, compact)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert config.inventory.hosts[1].provider.zone == "zone1"
+    return retained, peak
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    schema, text = build_case(hosts)
+    print("{n} hosts".format(n=hosts))
+    for compact in (False, True):
+        start = time.perf_counter()
+        config = load(schema, text, compact)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        sum(host.port for host in config.inventory.hosts)
+        iteration = time.perf_counter() - start
+        del config
+        retained, peak = measure(schema, text, compact)
+        print("{mode:>10}: build {time:.3f}s, iterate {iteration:.3f}s, retained {retained:.1f}MB, "
+              "peak {peak:.1f}MB".format(mode="compact" if compact else "namedtuple", time=elapsed,
+                                         iteration=iteration, retained=retained / 1e6, peak=peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Memory and time of a big schema (per tenant feature flags) written as a raw dictionary and with the constructor.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_constructor.py [number_of_fields]
+"""
+import sys
+import timeit
+import tracemalloc
+from mapped_config.constructor import MultiField, BooleanField, IntegerField
+from mapped_config.schema import CompiledSchema, normalize_mapping
+
+
+def raw_schema(fields):
+    return dict(
+        ("tenant{t}".format(t=t), dict(("flag{i}".format(i=i), False if i % 2 else 0) for i in range(10)))
+        for t in range(fields // 10))
+
+
+def constructor_schema(fields):
+    return MultiField([
+        MultiField(name="tenant{t}".format(t=t), fields=[
+            BooleanField("flag{i}".format(i=i), False) if i % 2 else IntegerField("flag{i}".format(i=i), 0)
+            for i in range(10)])
+        for t in range(fields // 10)])
+
+
+def measure(label, make):
+    tracemalloc.start()
+    schema = make()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    build = min(timeit.repeat(lambda: normalize_mapping(schema), number=5, repeat=3)) / 5
+    compile_time = min(timeit.repeat(lambda: CompiledSchema(schema, engine="fast"), number=1, repeat=3))
+    print("{label:>12}: definition {size:.2f}MB, build {build:.4f}s, compile {compile:.4f}s".format(
+        label=label, size=size / 1e6, build=build, compile=compile_time))
+
+
+def main():
+    fields = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print("{n} fields".format(n=fields))
+    measure("raw dict", lambda: raw_schema(fields))
+    measure("constructor", lambda: constructor_schema(fields))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare the precompiled JSON templates with a re.sub over the whole text for every load.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_json_template.py [number_of_placeholders]
+"""
+import json
+import re
+import sys
+import timeit
+from mapped_config.template import JsonTemplate, json_value
+
+
+def build_case(placeholders):
+    text = json.dumps({"hosts": [{"name": "host{i}".format(i=i), "ip": "IP{i}".format(i=i), "port": "PORT{i}".format(i=i)}
+                                 for i in range(placeholders // 2)]})
+    text = re.sub(r'"(IP|PORT)([0-9]+)"', r"%\1\2%", text)
+    parameters = {}
+    for i in range(placeholders // 2):
+        parameters["IP{i}".format(i=i)] = "10.0.0.{i}".format(i=i % 255)
+        parameters["PORT{i}".format(i=i)] = 1000 + i
+    return text, parameters
+
+
+def render_with_re_sub(text, parameters):
+    def replace(match):
+        value = parameters[match.group(0)[1:-1]]
+        return str(value) if str(value).isdigit() else '"{value}"'.format(value=value)
+    return re.sub(pattern="(%[a-zA-Z_0-9]*%)", repl=replace, string=text)
+
+
+def render_with_template(template, parameters):
+    return template.render(dict((name, json_value(parameters[name])) for name in template.names))
+
+
+def main():
+    placeholders = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    text, parameters = build_case(placeholders)
+    template = JsonTemplate(text)
+    assert json.loads(render_with_re_sub(text, parameters)) == json.loads(render_with_template(template, parameters))
+
+    runs = 20
+    re_sub = min(timeit.repeat(lambda: render_with_re_sub(text, parameters), number=runs, repeat=3)) / runs
+    compile_time = min(timeit.repeat(lambda: JsonTemplate(text), number=runs, repeat=3)) / runs
+    total = min(timeit.repeat(lambda: render_with_template(template, parameters), number=runs, repeat=3)) / runs
+    values = dict((name, json_value(parameters[name])) for name in template.names)
+    render = min(timeit.repeat(lambda: template.render(values), number=runs, repeat=3)) / runs
+    print("{n} placeholders".format(n=placeholders))
+    print("            re.sub: {time:.5f}s".format(time=re_sub))
+    print("  template compile: {time:.5f}s (once per file)".format(time=compile_time))
+    print("   encode + render: {time:.5f}s ({speedup:.1f}x)".format(time=total, speedup=re_sub / total))
+    print("       render only: {time:.5f}s ({speedup:.1f}x)".format(time=render, speedup=re_sub / render))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare build_config building all the namedtuples with the lazy mode reading a single section.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_lazy.py [number_of_sections]
+"""
+import copy
+import sys
+import timeit
+import tracemalloc
+from mapped_config.loader import build_config
+from mapped_config.schema import compile_schema
+
+
+def build_case(sections):
+    mapping = {}
+    document = {}
+    for i in range(sections):
+        name = "module{i}".format(i=i)
+        mapping[name] = {"enabled": False, "hosts": [{"name": None, "port": 80}]}
+        document[name] = {"enabled": True, "hosts": [{"name": "host{j}".format(j=j), "port": j} for j in range(20)]}
+    return compile_schema(mapping), document
+
+
+def build_and_read(schema, document, lazy):
+    config = build_config(schema, copy.deepcopy(document), lazy=lazy)
+    return config.module0.hosts[0].name
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    schema, document = build_case(sections)
+    copy_time = min(timeit.repeat(lambda: copy.deepcopy(document), number=5, repeat=3)) / 5
+    print("{n} sections, one accessed (deepcopy of the input not included)".format(n=sections))
+    for lazy in (False, True):
+        elapsed = min(timeit.repeat(lambda: build_and_read(schema, document, lazy), number=5, repeat=3)) / 5
+        peak = peak_memory(lambda: build_and_read(schema, document, lazy))
+        print("{mode:>6}: {time:.4f}s, peak {peak:.1f}MB".format(
+            mode="lazy" if lazy else "eager", time=elapsed - copy_time, peak=peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+What every worker of a pre-fork server pays for its configuration: building it (validation and namedtuples) or
+opening the configuration published by the master and reading a few values. The memory is the Python heap of the
+worker (tracemalloc), the shared file is mapped once for all of them.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_shared.py [number_of_items]
+"""
+import copy
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from bench_validator import build_case
+from mapped_config.loader import build_config
+from mapped_config.schema import compile_schema
+from mapped_config.shared import SharedConfig, publish_config
+
+
+def measure(function):
+    tracemalloc.start()
+    result = function()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, retained
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    schema, document = build_case(items)
+    schema = compile_schema(schema)
+    path = os.path.join(tempfile.mkdtemp(), "config.shm")
+    publish_config(path, build_config(schema, copy.deepcopy(document), as_named_tuple=False), schema)
+    print("shared file: {size:.1f}MB ({items} items per list)".format(size=os.path.getsize(path) / 1e6, items=items))
+
+    def built():
+        return build_config(schema, document)
+
+    def shared():
+        config = SharedConfig(path, schema).config
+        config.database.providers[items // 2].hostname
+        config.queue.workers[0].plans.low
+        return config
+
+    for name, function in (("build_config", built), ("SharedConfig", shared)):
+        seconds = min(timeit.repeat(function, number=1, repeat=3))
+        config, retained = measure(function)
+        print("{name:>14}: {seconds:.4f}s, {retained:.1f}KB retained per worker".format(
+            name=name, seconds=seconds, retained=retained / 1e3))
+        del config
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Cold start: load and validate a YML config against reading a snapshot of it.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_snapshot.py [number_of_providers]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+from mapped_config.loader import YmlLoader, build_config
+from mapped_config.snapshot import write_snapshot, read_snapshot
+
+schema = {"database": {"providers": [{"name": None, "hostname": None, "port": 1, "user": "root"}]}}
+
+
+def main():
+    providers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        config_path = os.path.join(tmp_dir, "config.yml")
+        parameters_path = os.path.join(tmp_dir, "parameters.yml")
+        snapshot_path = os.path.join(tmp_dir, "config.snapshot")
+        with open(config_path, "w") as config:
+            config.write("database:\n  providers:\n")
+            for i in range(providers):
+                config.write("    - name: host{i}\n      hostname: {{hostname}}\n      port: {i}\n".format(i=i))
+        with open(parameters_path, "w") as parameters:
+            parameters.write("hostname: localhost\n")
+        yml_loader = YmlLoader()
+        write_snapshot(snapshot_path, yml_loader, config_path, parameters_path, schema)
+
+        cases = [
+            ("load + build", lambda: build_config(schema, yml_loader.load_config(config_path, parameters_path))),
+            ("snapshot", lambda: read_snapshot(snapshot_path, schema, config_path, parameters_path)),
+            ("snapshot lazy", lambda: read_snapshot(snapshot_path, schema, config_path, parameters_path, lazy=True)),
+        ]
+        print("{n} providers".format(n=providers))
+        for label, function in cases:
+            elapsed = min(timeit.repeat(function, number=3, repeat=3)) / 3
+            print("{label:>14}: {time:.4f}s".format(label=label, time=elapsed))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare the fast validation engine with cerberus on a generated configuration.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_validator.py [number_of_items]
+"""
+import sys
+import timeit
+from mapped_config.schema import compile_schema
+
+
+def build_case(items):
+    schema = {
+        "database": {
+            "default": None,
+            "providers": [{
+                "name": None,
+                "hostname": "localhost",
+                "username": "root",
+                "password": 123456,
+                "options": {"timeout": 1.5, "ssl": False, "tags": []}
+            }]
+        },
+        "queue": {"max_instances": 5, "workers": [{"name": None, "plans": {"low": [], "high": []}}]}
+    }
+    document = {
+        "database": {
+            "default": "mysql",
+            "providers": [{"name": "db{i}".format(i=i), "hostname": "10.0.0.{i}".format(i=i % 255),
+                           "options": {"timeout": 2.0, "tags": ["a", "b"]}} for i in range(items)]
+        },
+        "queue": {"workers": [{"name": "w{i}".format(i=i), "plans": {"low": [1, 2]}} for i in range(items)]}
+    }
+    return schema, document
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    schema, document = build_case(items)
+    results = {}
+    for engine in ["cerberus", "fast"]:
+        compiled = compile_schema(schema, engine=engine)
+        runs = 3
+        results[engine] = min(timeit.repeat(lambda: compiled.validator().validate(document), number=runs, repeat=3)) / runs
+        print("{engine:>10}: {time:.4f}s per document ({items} items per list)".format(
+            engine=engine, time=results[engine], items=items))
+    print("   speedup: {speedup:.1f}x".format(speedup=results["cerberus"] / results["fast"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Compare the libyaml and pure python YAML backends of YmlLoader on the example config scaled up.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_yaml_backend.py [number_of_items]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from mapped_config import loader
+
+example_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "mapped_config", "example")
+
+
+def write_scaled_config(path, items):
+    with open(os.path.join(example_path, "example_config.yml")) as example:
+        config = example.read()
+    providers = "".join("    - name: mysql{i}\n      hostname: {{mysql_hostname}}\n      username: user{i}\n"
+                        .format(i=i) for i in range(items))
+    workers = "".join("      - name: worker{i}\n        scheduler_plans:\n            low: [1, 3, {i}]\n"
+                      .format(i=i) for i in range(items))
+    config = config.replace("  providers:\n", "  providers:\n" + providers)
+    config = config.replace("   workers:\n", "   workers:\n" + workers)
+    with open(path, "w") as scaled:
+        scaled.write(config)
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        config_path = os.path.join(tmp_dir, "config.yml")
+        write_scaled_config(config_path, items)
+        parameters_path = os.path.join(example_path, "example_parameters.yml")
+        print("{size:.1f}MB config".format(size=os.path.getsize(config_path) / 1e6))
+        for backend in sorted(loader.YAML_BACKENDS):
+            for streaming in [False, True]:
+                yml_loader = loader.YmlLoader(streaming=streaming, backend=backend)
+                start = time.time()
+                yml_loader.load_config(config_path, parameters_path)
+                print("{backend:>8} {mode:>9}: {time:.3f}s".format(
+                    backend=backend, mode="streaming" if streaming else "text", time=time.time() - start))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
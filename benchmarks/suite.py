@@ -0,0 +1,282 @@
+"""
+Benchmark suite of the load -> substitute -> validate -> namedtuple pipeline.
+
+Generates synthetic configs and schemas at several scales and times every stage separately, for the YML and the
+JSON loaders: file read, parameters, substitution, parsing, mapped_to_cerberus, schema compilation, validation and
+dict_to_namedtuple. The memory peak of every stage is measured with tracemalloc in a separate run.
+
+Run it from the repository root:
+
+    PYTHONPATH=. python benchmarks/suite.py --output results.json
+    PYTHONPATH=. python benchmarks/suite.py --baseline results.json --fail-on-regression
+
+With a baseline every stage is compared with it and the stages slower than --threshold times are reported.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import yaml
+from mapped_config.loader import YmlLoader, JsonLoader, format_field_names
+from mapped_config.nodes import dict_to_namedtuple
+from mapped_config.schema import CompiledSchema, mapped_to_cerberus
+from mapped_config.template import JsonTemplate, json_value
+
+SCALES = {
+    "small": {"width": 4, "depth": 2, "list_length": 5, "placeholders": 10},
+    "medium": {"width": 8, "depth": 3, "list_length": 200, "placeholders": 200},
+    "large": {"width": 12, "depth": 4, "list_length": 1000, "placeholders": 2000},
+}
+FORMATS = ("yml", "json")
+
+
+def generate_schema(width, depth):
+    """Mapped schema: every level has width fields of every kind and one nested object and list of objects"""
+    schema = {}
+    for i in range(width):
+        kind = i % 4
+        name = "field{i}".format(i=i)
+        schema[name] = [None, 1, "text", True][kind]
+    if depth > 1:
+        schema["child"] = generate_schema(width, depth - 1)
+        schema["items"] = [generate_schema(max(width // 2, 1), 1)]
+    return schema
+
+
+def generate_document(schema, list_length, counter):
+    document = {}
+    for name, value in schema.items():
+        if isinstance(value, dict):
+            document[name] = generate_document(value, list_length, counter)
+        elif isinstance(value, list):
+            document[name] = [generate_document(value[0], list_length, counter) for _ in range(list_length)]
+        else:
+            counter[0] += 1
+            document[name] = "value{n}".format(n=counter[0]) if value is None else value
+    return document
+
+
+def _string_leaves(document, leaves):
+    for key, value in document.items():
+        if isinstance(value, dict):
+            _string_leaves(value, leaves)
+        elif isinstance(value, list):
+            for item in value:
+                _string_leaves(item, leaves)
+        elif isinstance(value, str) and value.startswith("value"):
+            leaves.append((document, key))
+    return leaves
+
+
+def generate_case(directory, width, depth, list_length, placeholders):
+    """Write the config and parameters files of both formats. Returns the schema and the paths"""
+    schema = generate_schema(width, depth)
+    document = generate_document(schema, list_length, [0])
+    leaves = _string_leaves(document, [])
+    parameters = {}
+    yml_document = copy.deepcopy(document)
+    json_document = copy.deepcopy(document)
+    yml_leaves = _string_leaves(yml_document, [])
+    json_leaves = _string_leaves(json_document, [])
+    for n in range(min(placeholders, len(leaves))):
+        name = "param{n}".format(n=n)
+        parameters[name] = leaves[n][0][leaves[n][1]]
+        node, key = yml_leaves[n]
+        node[key] = "{" + name + "}"
+        node, key = json_leaves[n]
+        node[key] = "%" + name + "%"
+
+    paths = {}
+    yml_text = yaml.safe_dump(yml_document, default_flow_style=False)
+    # The dumper quotes the placeholders, the loader expects them bare (the parameters are already quoted)
+    for name in parameters:
+        yml_text = yml_text.replace("'{" + name + "}'", "{" + name + "}")
+    json_text = json.dumps(json_document, indent=1)
+    for name in parameters:
+        json_text = json_text.replace('"%' + name + '%"', "%" + name + "%")
+    for file_format, text, parameters_text in [
+            ("yml", yml_text, yaml.safe_dump(parameters, default_flow_style=False)),
+            ("json", json_text, json.dumps(parameters))]:
+        config_path = os.path.join(directory, "config.{format}".format(format=file_format))
+        parameters_path = os.path.join(directory, "parameters.{format}".format(format=file_format))
+        with open(config_path, "w") as config_file:
+            config_file.write(text)
+        with open(parameters_path, "w") as parameters_file:
+            parameters_file.write(parameters_text)
+        paths[file_format] = (config_path, parameters_path)
+    return schema, paths
+
+
+def read_file(path):
+    with open(path) as source:
+        return source.read()
+
+
+def pipeline(file_format, schema, config_path, parameters_path):
+    """[(stage, function)]; every function gets the result of the previous one"""
+    if file_format == "yml":
+        loader = YmlLoader()
+        substitute = lambda state: dict(state, text=state["text"].format(**state["parameters"]))
+        parse = lambda state: dict(state, document=yaml.load(state["text"], Loader=loader.yaml_loader))
+        parameters = lambda state: dict(state, parameters=loader._parameters(
+            loader._file_parameters(parameters_path), format_field_names(state["text"])))
+    else:
+        loader = JsonLoader()
+
+        def substitute(state):
+            template = JsonTemplate(state["text"])
+            values = dict((name, json_value(state["parameters"][name])) for name in template.names)
+            return dict(state, text=template.render(values))
+        parse = lambda state: dict(state, document=json.loads(state["text"]))
+        parameters = lambda state: dict(state, parameters=loader._file_parameters(parameters_path))
+
+    def validate(state):
+        validator = state["compiled"].validator()
+        assert validator.validate(state["document"]), validator.errors
+        return dict(state, validated=validator.document)
+
+    return [
+        ("read", lambda state: dict(state, text=read_file(config_path))),
+        ("parameters", parameters),
+        ("substitute", substitute),
+        ("parse", parse),
+        ("mapped_to_cerberus", lambda state: dict(state, cerberus=mapped_to_cerberus(schema))),
+        ("compile", lambda state: dict(state, compiled=CompiledSchema(schema))),
+        ("validate", validate),
+        # dict_to_namedtuple modifies the dictionary, copy it outside of the timing
+        ("namedtuple", lambda state: dict(state, config=dict_to_namedtuple(state["validated_copy"]))),
+    ]
+
+
+def run_stage(function, state, stage):
+    if stage == "namedtuple":
+        state = dict(state, validated_copy=copy.deepcopy(state["validated"]))
+    # Like timeit, the garbage collector does not run while timing
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = function(state)
+        return time.perf_counter() - start, result
+    finally:
+        gc.enable()
+
+
+def measure(file_format, schema, paths, repeat):
+    config_path, parameters_path = paths
+    stages = pipeline(file_format, schema, config_path, parameters_path)
+    timings = dict((stage, []) for stage, _ in stages)
+    for _ in range(repeat):
+        state = {}
+        for stage, function in stages:
+            elapsed, state = run_stage(function, state, stage)
+            timings[stage].append(elapsed)
+
+    peaks = {}
+    state = {}
+    for stage, function in stages:
+        if stage == "namedtuple":
+            state = dict(state, validated_copy=copy.deepcopy(state["validated"]))
+        tracemalloc.start()
+        state = function(state)
+        peaks[stage] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    results = {}
+    for stage, _ in stages:
+        values = sorted(timings[stage])
+        results[stage] = {"min": values[0], "median": values[len(values) // 2], "peak_bytes": peaks[stage]}
+    results["total"] = {"min": sum(results[stage]["min"] for stage, _ in stages),
+                        "median": sum(results[stage]["median"] for stage, _ in stages),
+                        "peak_bytes": max(peaks.values())}
+    return results
+
+
+def run(scales, repeat):
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "libyaml": bool(getattr(yaml, "__with_libyaml__", False)),
+        "scales": {},
+    }
+    for scale in scales:
+        parameters = SCALES[scale]
+        directory = tempfile.mkdtemp()
+        try:
+            schema, paths = generate_case(directory, **parameters)
+            results["scales"][scale] = {"parameters": parameters}
+            for file_format in FORMATS:
+                results["scales"][scale][file_format] = measure(file_format, schema, paths[file_format], repeat)
+        finally:
+            shutil.rmtree(directory)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Print every stage against the baseline (the fastest run of each). Returns the list of regressions, slower
+    than threshold times and by more than min_delta seconds so the noise of the fastest stages is ignored
+    """
+    regressions = []
+    for scale, scale_results in sorted(results["scales"].items()):
+        for file_format in FORMATS:
+            current = scale_results.get(file_format, {})
+            previous = baseline.get("scales", {}).get(scale, {}).get(file_format, {})
+            for stage, values in current.items():
+                if stage not in previous:
+                    continue
+                ratio = values["min"] / previous[stage]["min"] if previous[stage]["min"] else 1.0
+                flag = ""
+                if ratio > threshold and values["min"] - previous[stage]["min"] > min_delta:
+                    flag = " REGRESSION"
+                    regressions.append((scale, file_format, stage, ratio))
+                print("{scale:>7} {format:>5} {stage:>18}: {time:.6f}s vs {base:.6f}s ({ratio:.2f}x){flag}".format(
+                    scale=scale, format=file_format, stage=stage, time=values["min"],
+                    base=previous[stage]["min"], ratio=ratio, flag=flag))
+    return regressions
+
+
+def print_results(results):
+    for scale, scale_results in sorted(results["scales"].items()):
+        for file_format in FORMATS:
+            for stage, values in scale_results[file_format].items():
+                print("{scale:>7} {format:>5} {stage:>18}: {time:.6f}s, peak {peak:.2f}MB".format(
+                    scale=scale, format=file_format, stage=stage, time=values["median"],
+                    peak=values["peak_bytes"] / 1e6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every stage of loading a config")
+    parser.add_argument("--scales", nargs="+", choices=sorted(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of every stage")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown reported as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.001,
+                        help="Seconds a stage must be slower to be reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 if there are regressions")
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.repeat)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold, args.min_delta)
+        if regressions and args.fail_on_regression:
+            return 1
+    else:
+        print_results(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1 @@
-from .loader import YmlLoader, JsonLoader, InvalidDataException
\ No newline at end of file
+from .loader import YmlLoader, JsonLoader, InvalidDataException, MissingParametersException
@@ -0,0 +1,57 @@
+"""
+asyncio versions of load_config and build_config.
+
+The files are read and parsed and the configuration is validated in an executor (the default one of the loop
+if None), so the event loop is never blocked. The loaders use them through ConfigurationLoader.aload_config
+and ConfigurationLoader.abuild_config.
+
+With a timeout asyncio.TimeoutError is raised. Cancelling (or a timeout) stops waiting at once, but a thread
+already reading or parsing finishes its work in the background.
+"""
+import asyncio
+import functools
+
+
+def _read_text(path):
+    with open(path) as text_file:
+        return text_file.read()
+
+
+async def _run(executor, function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(function, *args, **kwargs))
+
+
+def _loads_text(loader):
+    """
+    load_config only reads the files and calls load_config_text: both are defined by the same class and the
+    loader neither caches nor streams the config
+    """
+    for cls in type(loader).__mro__:
+        if "load_config" in vars(cls):
+            return ("load_config_text" in vars(cls) and loader.cache is None and
+                    not getattr(loader, "streaming", False))
+    return False
+
+
+async def _load_config(loader, config_source, parameters_source, executor):
+    if not _loads_text(loader):
+        return await _run(executor, loader.load_config, config_source, parameters_source)
+
+    # Read the config while the parameters file is loaded
+    config_text, file_parameters = await asyncio.gather(
+        _run(executor, _read_text, config_source),
+        _run(executor, loader._file_parameters, parameters_source))
+    return await _run(executor, loader.load_config_text, config_text, file_parameters)
+
+
+async def aload_config(loader, config_source, parameters_source, executor=None, timeout=None):
+    """loader.load_config without blocking the event loop"""
+    return await asyncio.wait_for(_load_config(loader, config_source, parameters_source, executor), timeout)
+
+
+async def abuild_config(loader, data, mapping, as_namedtuple=True, lazy=False, workers=None, executor=None,
+                        timeout=None):
+    """loader.build_config without blocking the event loop"""
+    return await asyncio.wait_for(_run(executor, loader.build_config, data, mapping, as_namedtuple=as_namedtuple,
+                                       lazy=lazy, workers=workers), timeout)
@@ -0,0 +1,104 @@
+"""
+Validate many configuration documents with a pool of processes or threads.
+
+The schema is compiled once and sent once to every worker (with the pool initializer), the documents are sent
+in chunks and the results are streamed back, in order or as they are completed.
+"""
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from cerberus import DocumentError
+from .loader import build_config, InvalidDataException
+from .schema import compile_schema
+
+EXECUTORS = ("process", "thread")
+
+
+class BatchResult(namedtuple("BatchResult", ["index", "config", "errors"])):
+    """The config of the document at index, or the list of errors (like InvalidDataException.errors)"""
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        return self.errors is None
+
+
+# Schema of the worker process, set by the pool initializer
+_worker_schema = None
+
+
+def _init_worker(schema):
+    global _worker_schema
+    _worker_schema = schema
+
+
+def _build_chunk(schema, chunk, as_named_tuple, lazy):
+    schema = schema if schema is not None else _worker_schema
+    results = []
+    for index, document in chunk:
+        try:
+            config = build_config(schema, document, as_named_tuple=as_named_tuple, lazy=lazy)
+            results.append(BatchResult(index, config, None))
+        except InvalidDataException as e:
+            results.append(BatchResult(index, None, e.errors))
+        except DocumentError as e:
+            results.append(BatchResult(index, None, [str(e)]))
+    return results
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_configs(mapped_schema, documents, workers=None, executor="process", ordered=True, chunksize=16,
+                  as_named_tuple=True, lazy=False):
+    """
+    Yield a BatchResult for every document. Invalid documents do not stop the batch, their errors are in the
+    result. With ordered=False the results are yielded as soon as they are ready (use the index to match them).
+
+    documents can be any iterable, only a few chunks per worker are read ahead. The processes return the
+    configs pickled, the namedtuple classes are the cached ones of every path.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError("Unknown executor {executor}, use one of {executors}".format(
+            executor=executor, executors=EXECUTORS))
+    schema = compile_schema(mapped_schema)
+    workers = workers or os.cpu_count() or 1
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(schema,))
+        # The workers already have it
+        task_schema = None
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        task_schema = schema
+
+    chunks = _chunks(enumerate(documents), chunksize)
+    max_pending = workers * 2
+    with pool:
+        def submit(chunk):
+            return pool.submit(_build_chunk, task_schema, chunk, as_named_tuple, lazy)
+
+        if ordered:
+            pending = deque(submit(chunk) for chunk in islice(chunks, max_pending))
+            while pending:
+                results = pending.popleft().result()
+                for chunk in islice(chunks, 1):
+                    pending.append(submit(chunk))
+                for result in results:
+                    yield result
+        else:
+            pending = set(submit(chunk) for chunk in islice(chunks, max_pending))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for chunk in islice(chunks, len(done)):
+                    pending.add(submit(chunk))
+                for future in done:
+                    for result in future.result():
+                        yield result
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+
+def write_atomic(path, data):
+    """
+    Write data (bytes or text) to a temporary file of the same directory and replace path with it, so other
+    processes never read a partial file. The temporary file is removed if it fails
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as target:
+            target.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class LRUCache(object):
+    """Thread safe mapping that keeps at most maxsize entries, evicting the least recently used one"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # Reinsert to mark it as the most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            self._evict()
+
+    def setdefault(self, key, value):
+        """Store value unless key is already cached. Returns the cached value"""
+        with self._lock:
+            if key in self._data:
+                return self.get(key)
+            self.set(key, value)
+            return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self):
+        if self.maxsize is None:
+            return
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+def file_key(path):
+    """Identity of a file: path, modification time and size. Missing files are valid (parameters are optional)"""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, getattr(stat, "st_mtime_ns", int(stat.st_mtime * 1e9)), stat.st_size
+
+
+def environment_digest(names=None):
+    """Digest of the environment variables, all of them or just the given names"""
+    if names is None:
+        items = sorted(os.environ.items())
+    else:
+        items = [(name, os.environ.get(name)) for name in sorted(names)]
+    return hashlib.sha1(repr(items).encode("utf-8")).hexdigest()
+
+
+class ConfigCache(object):
+    """
+    Cache of loaded configurations for ConfigurationLoader. Entries are keyed on the loader class, the config and
+    parameters files (path, modification time and size) and a digest of the environment variables used by the
+    config (loader.placeholder_names), so changing any of them loads the config again.
+
+    With a directory the results are also pickled there, so new processes do not have to parse the files.
+    The cached configuration is shared between callers, do not modify it.
+    """
+
+    def __init__(self, maxsize=32, directory=None):
+        self.entries = LRUCache(maxsize=maxsize)
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def key(self, loader, config_source, parameters_source):
+        loader_class = type(loader)
+        return ("{module}.{name}".format(module=loader_class.__module__, name=loader_class.__name__),
+                file_key(config_source), file_key(parameters_source))
+
+    def load(self, loader, load_config, config_source, parameters_source):
+        """Return the cached configuration or call load_config(config_source, parameters_source)"""
+        key = self.key(loader, config_source, parameters_source)
+        entry = self.entries.get(key)
+        if self._valid(entry):
+            self.hits += 1
+            return entry[2]
+
+        entry = self._read(key)
+        if self._valid(entry):
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            config = load_config(config_source, parameters_source)
+            names = loader.placeholder_names(config_source)
+            entry = (names, environment_digest(names), config)
+            self._write(key, entry)
+        self.entries.set(key, entry)
+        return entry[2]
+
+    @staticmethod
+    def _valid(entry):
+        """The environment variables used by the entry did not change"""
+        return entry is not None and environment_digest(entry[0]) == entry[1]
+
+    def clear(self):
+        self.entries.clear()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pickle")
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as cache_file:
+                stored_key, entry = pickle.load(cache_file)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        return entry if stored_key == key else None
+
+    def _write(self, key, entry):
+        if self.directory is None:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        write_atomic(self._path(key), pickle.dumps((key, entry), pickle.HIGHEST_PROTOCOL))
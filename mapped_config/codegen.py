@@ -0,0 +1,369 @@
+"""
+Validation engine that compiles a schema into Python code.
+
+The schema (the same subset of cerberus that the fast engine supports) is translated into one normalize,
+validate and build function per node, with the type, default and required checks of every field inlined, and
+loaded with compile and exec. The result, the errors and the namedtuples are the same as with the other
+engines. Use it with compile_schema(schema, engine="codegen").
+
+The compiled code is cached by the fingerprint of the schema, in memory and, if set_cache_directory was called
+(or MAPPED_CONFIG_CODEGEN_CACHE is set), on disk so other processes do not generate and compile it again.
+"""
+import copy
+import keyword
+import marshal
+import math
+import os
+import sys
+from cerberus import DocumentError, Validator, errors
+from collections.abc import Mapping, Sequence
+from .cache import LRUCache, write_atomic
+from .nodes import namedtuple_class, dict_to_namedtuple
+from .validator import SUPPORTED_RULES, REQUIRED_FIELD, UNKNOWN_FIELD, NOT_NULLABLE, BAD_TYPE, UnsupportedSchema, \
+    sort_errors
+
+# Changes of the generated code must change it, so the files cached on disk are not used
+VERSION = 2
+_MISSING = object()
+_modules = LRUCache(maxsize=128)
+_cache_directory = [os.environ.get("MAPPED_CONFIG_CODEGEN_CACHE")]
+
+
+def set_cache_directory(directory):
+    """Store the compiled code of the schemas in directory, None to keep it only in memory"""
+    _cache_directory[0] = directory
+
+
+def _valid_field_name(name):
+    return isinstance(name, str) and name.isidentifier() and not keyword.iskeyword(name) and \
+        not name.startswith("_")
+
+
+def _literal(value):
+    """The value can be written in the source (repr gives it back)"""
+    if value is None or type(value) in (bool, int, str, bytes):
+        return True
+    if type(value) is float:
+        return math.isfinite(value)
+    if type(value) in (list, tuple):
+        return all(_literal(item) for item in value)
+    if type(value) is dict:
+        return all(_literal(key) and _literal(item) for key, item in value.items())
+    return False
+
+
+def _join(path, key):
+    return "{path}.{key}".format(path=path, key=key) if path else str(key)
+
+
+def _check_rules(rules):
+    if not isinstance(rules, dict) or not SUPPORTED_RULES.issuperset(rules):
+        raise UnsupportedSchema(rules)
+    if not isinstance(rules.get("nullable", False), bool) or not isinstance(rules.get("required", False), bool):
+        raise UnsupportedSchema(rules)
+    type_name = rules.get("type")
+    if type_name is not None and (not isinstance(type_name, str) or type_name not in Validator.types_mapping):
+        raise UnsupportedSchema(rules)
+    if "schema" in rules and type_name not in ("dict", "list"):
+        raise UnsupportedSchema(rules)
+
+
+class _Generator(object):
+    """
+    Source of the functions of a schema. The nested nodes and list items are generated before the functions
+    that use them. Defaults that are not literals are passed as constants in the namespace
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self.functions = 0
+        self.variables = 0
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def suffix(self):
+        self.functions += 1
+        return str(self.functions)
+
+    def variable(self, prefix):
+        self.variables += 1
+        return "{prefix}{n}".format(prefix=prefix, n=self.variables)
+
+    def default(self, rules):
+        """Expression of the default value: a new copy of dictionaries and lists, like the fast engine"""
+        value = rules.get("default")
+        if _literal(value):
+            return repr(value)
+        name = "_K{n}".format(n=len(self.constants))
+        self.constants[name] = value
+        return "_deepcopy({name})".format(name=name) if isinstance(value, (dict, list)) else name
+
+    def node(self, schema, path):
+        """Generate the functions of a dict schema. Returns their suffix"""
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(schema)
+        children = {}
+        for name, rules in schema.items():
+            _check_rules(rules)
+            children[name] = self.children(rules, _join(path, name))
+        suffix = self.suffix()
+        self.normalize(suffix, schema, children)
+        self.validate(suffix, schema, children)
+        self.build(suffix, schema, children, path)
+        return suffix
+
+    def children(self, rules, path):
+        """None, the suffix of a dict schema or ("list", item rules, item children, item suffix)"""
+        if "schema" not in rules:
+            return None
+        if rules["type"] == "dict":
+            return self.node(rules["schema"], path)
+        item_rules = rules["schema"]
+        _check_rules(item_rules)
+        item_children = self.children(item_rules, path)
+        suffix = self.suffix()
+        self.emit(0, "def _item{suffix}(item):".format(suffix=suffix))
+        if "default" in item_rules and not item_rules.get("nullable", False):
+            self.emit(1, "if item is None:")
+            self.emit(2, "item = {default}".format(default=self.default(item_rules)))
+        self.emit(1, "return {value}".format(value=self.normalized("item", item_children)))
+        self.emit(0, "")
+        return "list", item_rules, item_children, suffix
+
+    def normalized(self, value, children):
+        """Expression of the normalized value of a field"""
+        if children is None:
+            return value
+        if not isinstance(children, tuple):
+            return "_normalize{suffix}({value}) if isinstance({value}, _Mapping) else {value}".format(
+                suffix=children, value=value)
+        return ("type({value})(_item{suffix}(item) for item in {value}) "
+                "if isinstance({value}, _Sequence) and not isinstance({value}, str) else {value}").format(
+            value=value, suffix=children[3])
+
+    def normalize(self, suffix, schema, children):
+        self.emit(0, "def _normalize{suffix}(mapping):".format(suffix=suffix))
+        self.emit(1, "result = _copy(mapping)")
+        for name, rules in schema.items():
+            if "default" in rules:
+                condition = "{name!r} not in result".format(name=name)
+                if not rules.get("nullable", False):
+                    condition += " or result[{name!r}] is None".format(name=name)
+                self.emit(1, "if {condition}:".format(condition=condition))
+                self.emit(2, "result[{name!r}] = {default}".format(name=name, default=self.default(rules)))
+        for name in schema:
+            if children[name] is not None:
+                self.emit(1, "if {name!r} in result:".format(name=name))
+                self.emit(2, "value = result[{name!r}]".format(name=name))
+                self.emit(2, "result[{name!r}] = {value}".format(name=name,
+                                                                 value=self.normalized("value", children[name])))
+        self.emit(1, "return result")
+        self.emit(0, "")
+
+    def check(self, indent, value, rules, children, target, key):
+        """Statements that set target[key] to the errors of value, if any"""
+        type_name = rules.get("type")
+        self.emit(indent, "if {value} is None:".format(value=value))
+        if rules.get("nullable", False):
+            self.emit(indent + 1, "pass")
+        else:
+            self.emit(indent + 1, "{target}[{key}] = [_NOT_NULLABLE]".format(target=target, key=key))
+        if type_name is not None:
+            condition = "not isinstance({value}, _{type_name}_types)".format(value=value, type_name=type_name)
+            if Validator.types_mapping[type_name].excluded_types:
+                condition += " or isinstance({value}, _{type_name}_excluded)".format(
+                    value=value, type_name=type_name)
+            self.emit(indent, "elif {condition}:".format(condition=condition))
+            self.emit(indent + 1, "{target}[{key}] = [{message!r}]".format(
+                target=target, key=key, message=BAD_TYPE.format(constraint=type_name)))
+        if children is None:
+            return
+        self.emit(indent, "else:")
+        if not isinstance(children, tuple):
+            error = self.variable("error")
+            self.emit(indent + 1, "{error} = _validate{suffix}({value})".format(
+                error=error, suffix=children, value=value))
+            self.emit(indent + 1, "if {error}:".format(error=error))
+            self.emit(indent + 2, "{target}[{key}] = [{error}]".format(target=target, key=key, error=error))
+            return
+        _, item_rules, item_children, _ = children
+        item_errors, index, item = self.variable("item_errors"), self.variable("i"), self.variable("item")
+        self.emit(indent + 1, "{item_errors} = {{}}".format(item_errors=item_errors))
+        self.emit(indent + 1, "for {index}, {item} in enumerate({value}):".format(
+            index=index, item=item, value=value))
+        self.check(indent + 2, item, item_rules, item_children, item_errors, index)
+        self.emit(indent + 1, "if {item_errors}:".format(item_errors=item_errors))
+        self.emit(indent + 2, "{target}[{key}] = [{item_errors}]".format(
+            target=target, key=key, item_errors=item_errors))
+
+    def validate(self, suffix, schema, children):
+        self.emit(0, "def _validate{suffix}(mapping):".format(suffix=suffix))
+        self.emit(1, "errors = {}")
+        self.emit(1, "known = 0")
+        for name, rules in schema.items():
+            self.emit(1, "value = mapping.get({name!r}, _MISSING)".format(name=name))
+            self.emit(1, "if value is not _MISSING:")
+            self.emit(2, "known += 1")
+            self.check(2, "value", rules, children[name], "errors", repr(name))
+            if rules.get("required") is True:
+                self.emit(1, "else:")
+                self.emit(2, "errors[{name!r}] = [_REQUIRED_FIELD]".format(name=name))
+        self.emit(1, "if known != len(mapping):")
+        self.emit(2, "for name in mapping:")
+        # A set display of constants is compiled into a frozenset constant
+        self.emit(3, "if name not in {{{fields}}}:".format(fields=", ".join(repr(name) for name in schema)))
+        self.emit(4, "errors[name] = [_UNKNOWN_FIELD]")
+        # Sorted by path like cerberus
+        self.emit(1, "return _sort_errors(errors)")
+        self.emit(0, "")
+
+    def built(self, value, rules, children, path):
+        """Expression of the namedtuple value of a field, the same as dict_to_namedtuple"""
+        if children is not None and not isinstance(children, tuple):
+            return "_build{suffix}({value}) if isinstance({value}, dict) else {value}".format(
+                suffix=children, value=value)
+        if rules.get("type") in ("integer", "string", "float", "boolean", "number", "binary"):
+            # Validated values of these types are never dictionaries nor lists
+            return value
+        if children is not None and children[2] is not None and not isinstance(children[2], tuple):
+            item = "_build{suffix}(item) if isinstance(item, dict) else item".format(suffix=children[2])
+        else:
+            item = "_to_namedtuple(item, {path!r}) if isinstance(item, dict) else item".format(path=path)
+        return ("_to_namedtuple({value}, {path!r}) if isinstance({value}, dict) else "
+                "[{item} for item in {value}] if isinstance({value}, list) else {value}").format(
+            value=value, path=path, item=item)
+
+    def build(self, suffix, schema, children, path):
+        self.emit(0, "def _build{suffix}(mapping):".format(suffix=suffix))
+        if not schema or not all(_valid_field_name(name) for name in schema):
+            # dict_to_namedtuple raises the same error for invalid field names
+            self.emit(1, "return _to_namedtuple(mapping, {path!r})".format(path=path))
+            self.emit(0, "")
+            return
+        # Optional fields without default can be missing, then the class has less fields
+        self.emit(1, "if len(mapping) != {length}:".format(length=len(schema)))
+        self.emit(2, "return _to_namedtuple(mapping, {path!r})".format(path=path))
+        self.emit(1, "return _namedtuple_class({path!r}, {fields!r})(".format(path=path, fields=tuple(schema)))
+        for name, rules in schema.items():
+            self.emit(2, "{name}={value},".format(name=name, value=self.built(
+                "mapping[{name!r}]".format(name=name), rules, children[name], _join(path, name))))
+        self.emit(1, ")")
+        self.emit(0, "")
+
+
+def generate_source(schema):
+    """
+    Python source of a cerberus schema and the constants it needs (defaults that are not literals). The
+    functions of the root are _normalize{n}, _validate{n} and _build{n}, n is in ROOT
+    """
+    generator = _Generator()
+    root = generator.node(schema, "")
+    generator.emit(0, "ROOT = {root!r}".format(root=root))
+    return "\n".join(generator.lines) + "\n", generator.constants
+
+
+def _namespace(constants):
+    namespace = {
+        "_copy": copy.copy,
+        "_deepcopy": copy.deepcopy,
+        "_Mapping": Mapping,
+        "_Sequence": Sequence,
+        "_MISSING": _MISSING,
+        "_REQUIRED_FIELD": REQUIRED_FIELD,
+        "_UNKNOWN_FIELD": UNKNOWN_FIELD,
+        "_NOT_NULLABLE": NOT_NULLABLE,
+        "_sort_errors": sort_errors,
+        "_to_namedtuple": dict_to_namedtuple,
+        "_namedtuple_class": namedtuple_class,
+    }
+    for name, definition in Validator.types_mapping.items():
+        namespace["_{name}_types".format(name=name)] = definition.included_types
+        namespace["_{name}_excluded".format(name=name)] = definition.excluded_types
+    namespace.update(constants)
+    return namespace
+
+
+class GeneratedModule(object):
+    """The functions of a compiled schema"""
+    __slots__ = ("normalize", "validate", "build", "source")
+
+    def __init__(self, namespace, source):
+        root = namespace["ROOT"]
+        self.normalize = namespace["_normalize" + root]
+        self.validate = namespace["_validate" + root]
+        self.build = namespace["_build" + root]
+        self.source = source
+
+
+def _cache_path(directory, fingerprint):
+    return os.path.join(directory, "{fingerprint}-{version}-{python}.code".format(
+        fingerprint=fingerprint, version=VERSION, python=sys.implementation.cache_tag))
+
+
+def _read_code(path):
+    try:
+        with open(path, "rb") as code_file:
+            return marshal.load(code_file)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _write_code(path, code):
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        write_atomic(path, marshal.dumps(code))
+    except (IOError, OSError):
+        # The cache is optional
+        pass
+
+
+def load_module(schema, fingerprint):
+    """
+    GeneratedModule of a cerberus schema, from the cache if the fingerprint is known. Raises UnsupportedSchema
+    if the schema has rules that the engine does not support
+    """
+    module = _modules.get(fingerprint)
+    if module is not None:
+        return module
+
+    source, constants = generate_source(schema)
+    directory = _cache_directory[0]
+    # Schemas with defaults that are not literals need their constants, their code is only kept in memory
+    path = _cache_path(directory, fingerprint) if directory is not None and not constants else None
+    code = _read_code(path) if path is not None else None
+    if code is None:
+        code = compile(source, "<mapped_config schema {fingerprint}>".format(fingerprint=fingerprint[:12]), "exec")
+        if path is not None:
+            _write_code(path, code)
+    namespace = _namespace(constants)
+    exec(code, namespace)
+    return _modules.setdefault(fingerprint, GeneratedModule(namespace, source))
+
+
+class GeneratedValidator(object):
+    """Same interface as the cerberus Validator used by build_config, with the generated functions"""
+    __slots__ = ("_module", "document", "errors")
+
+    def __init__(self, module):
+        self._module = module
+        self.document = None
+        self.errors = {}
+
+    def validate(self, document):
+        if document is None:
+            raise DocumentError(errors.DOCUMENT_MISSING)
+        if not isinstance(document, Mapping):
+            raise DocumentError(errors.DOCUMENT_FORMAT.format(document))
+        self.document = self._module.normalize(document)
+        self.errors = self._module.validate(self.document)
+        return not self.errors
+
+    __call__ = validate
+
+    def to_namedtuple(self):
+        """The validated document as namedtuples, like dict_to_namedtuple"""
+        return self._module.build(self.document)
@@ -0,0 +1,145 @@
+"""
+Compact configurations, for documents with big lists of similar items.
+
+build_config(..., compact=True) stores every repeated value once: equal strings and numbers, nodes and lists are
+shared. Lists of objects with the same fields (like hosts or providers) are stored by columns in a ColumnarList,
+numeric columns in arrays, and their rows are namedtuples built when they are accessed.
+
+The values are shared between the nodes, do not modify them.
+"""
+from array import array
+from collections.abc import Sequence
+from .nodes import namedtuple_class
+
+# Shorter lists of objects are plain lists, the columns would take more memory than the rows
+COLUMNAR_MIN_LENGTH = 16
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+def _column(values):
+    """An array for integers and floats, a list otherwise"""
+    value_type = type(values[0]) if values else None
+    if value_type is int or value_type is float:
+        if all(type(value) is value_type for value in values):
+            if value_type is float:
+                return array("d", values)
+            if _INT64[0] <= min(values) and max(values) <= _INT64[1]:
+                return array("q", values)
+    return values
+
+
+class ColumnarList(Sequence):
+    """
+    Read-only list of namedtuples stored by columns. Indexing and iteration build the rows, column(name)
+    returns all the values of a field without building them
+    """
+    __slots__ = ("_path", "_fields", "_columns", "_length", "_row_class")
+
+    def __init__(self, path, fields, columns):
+        # The rows are built by position: the columns follow the fields of the class, which is resolved once.
+        # The cached class may have the fields in another order than the given ones
+        row_class = namedtuple_class(path, fields)
+        fields = tuple(fields)
+        columns = dict(zip(fields, columns))
+        self._path = path
+        self._row_class = row_class
+        self._fields = row_class._fields
+        self._columns = tuple(_column(columns[name]) for name in self._fields)
+        self._length = len(self._columns[0]) if self._columns else 0
+
+    def column(self, name):
+        """Values of the field name in every row"""
+        return self._columns[self._fields.index(name)]
+
+    def _row(self, index):
+        return self._row_class._make(column[index] for column in self._columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("list index out of range")
+        return self._row(index)
+
+    def __iter__(self):
+        return map(self._row_class._make, zip(*self._columns)) if self._columns else iter(())
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnarList):
+            return self._length == other._length and list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # The fields go with their columns, the other process resolves its own class
+        return ColumnarList, (self._path, self._fields, [list(column) for column in self._columns])
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _Compactor(object):
+    """Shares the equal values of one document"""
+
+    def __init__(self):
+        self._values = {}
+        # The keys have the ids of the values, the values that are not shared must live until the end too
+        self._unshared = []
+
+    def _shared(self, key, value):
+        return self._values.setdefault(key, value)
+
+    def _keep(self, value):
+        self._unshared.append(value)
+        return value
+
+    def value(self, value, path):
+        if isinstance(value, dict):
+            return self.node(value, path)
+        elif isinstance(value, list):
+            return self.list(value, path)
+        try:
+            # The type is in the key so 1, 1.0 and True stay different
+            return self._shared((type(value), value), value)
+        except TypeError:
+            return self._keep(value)
+
+    def node(self, dictionary, path):
+        # The class may come from another document with the keys in another order
+        node_class = namedtuple_class(path, dictionary.keys())
+        fields = node_class._fields
+        values = [self.value(dictionary[key], "{path}.{key}".format(path=path, key=key) if path else str(key))
+                  for key in fields]
+        node = node_class._make(values)
+        # The values are already shared, equal nodes have the same values
+        return self._shared(("node", path, fields) + tuple(id(value) for value in values), node)
+
+    def list(self, items, path):
+        if len(items) >= COLUMNAR_MIN_LENGTH and all(isinstance(item, dict) for item in items):
+            fields = namedtuple_class(path, items[0].keys())._fields
+            field_set = set(fields)
+            if all(len(item) == len(fields) and field_set.issuperset(item) for item in items):
+                columns = []
+                for key in fields:
+                    item_path = "{path}.{key}".format(path=path, key=key) if path else str(key)
+                    columns.append([self.value(item[key], item_path) for item in items])
+                return self._keep(ColumnarList(path, fields, columns))
+        values = [self.value(item, path) for item in items]
+        return self._shared(("list",) + tuple(id(value) for value in values), values)
+
+
+def dict_to_compact(dictionary):
+    """Compact configuration of a validated document. The dictionary is not modified"""
+    return _Compactor().node(dictionary, "")
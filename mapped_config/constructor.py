@@ -1,51 +1,116 @@
+import copy
+
+
+def _defined_in(cls, name):
+    """Position in the MRO of the class that defines the method"""
+    for position, base in enumerate(cls.__mro__):
+        if name in vars(base):
+            return position
+    return None
+
+
+def build_field_into(field, target):
+    """
+    Add the mapped schema of a field to target. Fields without build_into (duck typed ones) or that override the
+    build of a constructor class are built with their build, which could return shared dictionaries
+    """
+    build_into = _defined_in(type(field), "build_into")
+    build = _defined_in(type(field), "build")
+    if build_into is None or (build is not None and build < build_into):
+        target.update(copy.deepcopy(field.build()))
+    else:
+        field.build_into(target)
+
 
 class Field(object):
+    __slots__ = ("name", "default", "required", "type")
+
     def __init__(self, name=None, default=None, data_type=None):
         self.name = name
         self.default = default
         self.required = self.default is None
         self.type = data_type
 
+    def _entry(self):
+        entry = {}
+        if self.default is not None:
+            # Lists and dictionaries are copied so the built schema does not share them with the field
+            entry["default"] = copy.deepcopy(self.default) if isinstance(self.default, (list, dict)) else self.default
+        entry["required"] = self.required
+        if self.type is not None:
+            entry["type"] = self.type
+        # Subclasses without __slots__ add their attributes as rules (regex, nullable...)
+        for key, value in getattr(self, "__dict__", {}).items():
+            if value is not None:
+                entry[key] = copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+        return entry
+
+    def build_into(self, target):
+        """Add the mapped schema of the field to the target dictionary"""
+        if self.name is None:
+            target.update(self._entry())
+        else:
+            target[self.name] = self._entry()
+
     def build(self):
-        result = {key: value for key, value in self.__dict__.items() if value is not None}
+        entry = self._entry()
         if self.name is not None:
-            del result["name"]
-            result = {self.name: result}
-        return result
+            return {self.name: entry}
+        return entry
+
 
 class MultiField(object):
+    __slots__ = ("fields", "name")
+
     def __init__(self, fields, name=None):
         self.fields = fields
         self.name = name
 
+    def build_into(self, target):
+        """The fields write directly into the target (or into the node of the name), no intermediate copies"""
+        if self.name is not None:
+            node = {}
+            target[self.name] = node
+            target = node
+        for field in self.fields:
+            build_field_into(field, target)
+
     def build(self):
         result = {}
-        for i in self.fields:
-            result.update(i.build())
+        self.build_into(result)
+        return result
 
-        if self.name is None:
-            return result
-        else:
-            return {self.name: result}
 
 class TypeField(Field):
+    __slots__ = ()
     data_type = None
+
     def __init__(self, name=None, default=None):
         super().__init__(name=name, default=default, data_type=self.data_type)
 
+
 class IntegerField(TypeField):
+    __slots__ = ()
     data_type = "integer"
 
+
 class FloatField(TypeField):
+    __slots__ = ()
     data_type = "float"
 
+
 class StringField(TypeField):
+    __slots__ = ()
     data_type = "string"
 
+
 class BooleanField(TypeField):
+    __slots__ = ()
     data_type = "boolean"
 
+
 class ListField(object):
+    __slots__ = ("name", "field")
 
     def __init__(self, name, field=None):
         self.name = name
@@ -53,7 +118,11 @@ class ListField(object):
             self.field = StringField()
         else:
             self.field = field
-    def build(self):
-        return {self.name: [self.field.build()]}
 
+    def build_into(self, target):
+        target[self.name] = [self.field.build()]
 
+    def build(self):
+        result = {}
+        self.build_into(result)
+        return result
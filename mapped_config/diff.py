@@ -0,0 +1,81 @@
+"""
+Structural diff between two built configurations.
+
+Works on the namedtuple trees returned by build_config and on the plain dictionaries of
+as_named_tuple=False. Paths use the a:b:c notation of format_errors, list items are indexes (a:b:0).
+"""
+from collections import namedtuple
+from .fingerprint import structural_digest
+from .lazy import is_node, is_list, node_items
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+Change = namedtuple("Change", ["kind", "path", "old", "new"])
+
+
+def _unchanged(old, new, strict):
+    """
+    Cheap check before walking a subtree. The same object is unchanged; otherwise containers of the same class
+    are compared in C. Namedtuple classes are cached per path and fields, so the same class has the same fields
+    (trees built with the same schema). Hashed nodes (build_config(..., hashed=True)) compare the digests they
+    carry. == does not tell 1, 1.0 and True apart inside containers, strict compares their structural digests too
+    """
+    if old is new:
+        return True
+    if type(old) is not type(new):
+        return False
+    digest = getattr(old, "_digest", None)
+    if digest is not None:
+        return digest == new._digest
+    if old != new:
+        return False
+    return not strict or not (is_node(old) or is_list(old)) or structural_digest(old) == structural_digest(new)
+
+
+def _join(path, key):
+    return "{path}:{key}".format(path=path, key=key) if path else str(key)
+
+
+def _diff(old, new, path, strict):
+    if _unchanged(old, new, strict):
+        return
+
+    if is_node(old) and is_node(new):
+        old_items = dict(node_items(old))
+        new_items = dict(node_items(new))
+        for key, old_value in old_items.items():
+            if key in new_items:
+                for change in _diff(old_value, new_items[key], _join(path, key), strict):
+                    yield change
+            else:
+                yield Change(REMOVED, _join(path, key), old_value, None)
+        for key, new_value in new_items.items():
+            if key not in old_items:
+                yield Change(ADDED, _join(path, key), None, new_value)
+    elif is_list(old) and is_list(new):
+        for index, (old_value, new_value) in enumerate(zip(old, new)):
+            for change in _diff(old_value, new_value, _join(path, index), strict):
+                yield change
+        for index in range(len(new), len(old)):
+            yield Change(REMOVED, _join(path, index), old[index], None)
+        for index in range(len(old), len(new)):
+            yield Change(ADDED, _join(path, index), None, new[index])
+    else:
+        yield Change(CHANGED, path, old, new)
+
+
+def diff(old, new, strict=False):
+    """
+    Yield a Change(kind, path, old, new) for every added, removed or changed value between two configurations.
+    Unchanged subtrees are skipped without walking them. Values that are equal but of another type (1, 1.0 and
+    True) are only changes if they are not inside equal subtrees; with strict (or hashed configs) they always are,
+    at the cost of hashing the equal subtrees
+    """
+    return _diff(old, new, "", strict)
+
+
+def changed_roots(old, new, strict=False):
+    """Top level keys with changes, so only the modules that use them need to be initialised again"""
+    return set(change.path.split(":", 1)[0] for change in diff(old, new, strict))
@@ -1,4 +1,4 @@
-import loader
+from mapped_config import loader
 
 def load_kerner():
     return CoolFrameworkKernel()
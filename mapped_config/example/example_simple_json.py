@@ -1,4 +1,4 @@
-import loader
+from mapped_config import loader
 
 database_config_schema = {
     "database": {
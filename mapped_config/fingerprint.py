@@ -0,0 +1,76 @@
+"""
+Stable digests of schemas and configurations.
+
+structural_digest is a Merkle hash: the digest of a node is computed from the names, the scalar values and the
+digests of its children, so it does not depend on the order of the keys, on the path of the node or on whether
+it is a dictionary or a namedtuple. Values of different types are different (1, 1.0 and True), and the digest is
+the same in every process and Python run.
+"""
+import functools
+import hashlib
+from .lazy import is_node, is_list, node_items
+
+MAP = b"m"
+LIST = b"l"
+SCALAR = b"s"
+# Marks a child by its digest in the encoding of its parent, scalars start with their type
+CHILD = b"#"
+_SCALAR_TYPES = frozenset([str, int, float, bool, bytes, type(None)])
+
+
+def _name(value):
+    module = getattr(value, "__module__", None)
+    name = getattr(value, "__qualname__", None) or getattr(value, "__name__", None)
+    if name is None:
+        return repr(value)
+    return "{module}.{name}".format(module=module, name=name) if module else name
+
+
+def encode_scalar(value):
+    """Bytes of a value that is not a container: type, length and value"""
+    value_type = type(value)
+    if value_type is str or isinstance(value, str):
+        data = value.encode("utf-8", "surrogatepass")
+    elif value_type in _SCALAR_TYPES or isinstance(value, (int, float, bytes)):
+        data = repr(value).encode("ascii")
+    else:
+        # Functions and classes (like cerberus coerce rules) by name, their repr has the address
+        data = _name(value).encode("utf-8", "surrogatepass")
+    return b"%s:%d:%s" % (value_type.__name__.encode("ascii"), len(data), data)
+
+
+# Field names are the same in many nodes
+_encode_name = functools.lru_cache(maxsize=4096)(encode_scalar)
+
+
+def _encode_child(value):
+    if type(value) in _SCALAR_TYPES:
+        return encode_scalar(value)
+    if is_node(value) or is_list(value):
+        return CHILD + structural_digest(value)
+    return encode_scalar(value)
+
+
+def map_digest(items):
+    """Digest of a node from its (name, value) pairs"""
+    parts = sorted(_encode_name(name) + _encode_child(value) for name, value in items)
+    return hashlib.sha1(MAP + b"".join(parts)).digest()
+
+
+def list_digest(values):
+    return hashlib.sha1(LIST + b"".join(_encode_child(value) for value in values)).digest()
+
+
+def structural_digest(value):
+    """
+    sha1 digest (20 bytes) of a configuration or schema: dictionaries, namedtuples, lazy nodes, lists and
+    scalars. Hashed nodes return the digest they carry without walking their subtree
+    """
+    digest = getattr(value, "_digest", None)
+    if digest is not None:
+        return digest
+    if is_node(value):
+        return map_digest(node_items(value))
+    elif is_list(value):
+        return list_digest(value)
+    return hashlib.sha1(SCALAR + encode_scalar(value)).digest()
@@ -0,0 +1,166 @@
+"""
+Configuration composed of many layers (base, region, cluster, host...).
+
+The layers are files of any registered format or dictionary overlays, merged in order: dictionaries are merged
+key by key, lists follow the list strategy and any other value replaces the previous one. Every parsed file is
+cached (until it or the environment variables it uses change) and every top level key keeps its merged result,
+so changing one file parses only that file and merges only the keys it has.
+"""
+import copy
+import hashlib
+import os
+from .cache import ConfigCache, LRUCache
+from .loader import ConfigurationLoader, YmlLoader, JsonLoader
+
+LIST_STRATEGIES = ("replace", "append", "unique")
+
+# File extension -> ConfigurationLoader class
+LOADERS = {
+    ".yml": YmlLoader,
+    ".yaml": YmlLoader,
+    ".json": JsonLoader,
+}
+
+
+def register_loader(extension, loader_class):
+    """Load the files with this extension (like ".toml") with loader_class"""
+    LOADERS[extension.lower()] = loader_class
+
+
+class LayeredLoader(ConfigurationLoader):
+    """
+    load_config takes a list of sources instead of a single file: paths and dictionaries, the last one wins.
+    The parameters file is loaded by the loader of every file layer, to mix YML and JSON layers use a JSON
+    parameters file (it is valid YAML too).
+
+    The result shares the unchanged subtrees with the previous results, do not modify it.
+    """
+
+    def __init__(self, list_strategy="replace", loaders=None, cache_size=64):
+        """
+        The list strategy is "replace" (the last list wins), "append" (the lists of all the layers are
+        concatenated) or "unique" (concatenated without repeated items).
+        loaders overwrites the loader of some extensions, like {".yml": YmlLoader(streaming=True)}
+        """
+        if list_strategy not in LIST_STRATEGIES:
+            raise ValueError("Unknown list strategy {strategy}, use one of {strategies}".format(
+                strategy=list_strategy, strategies=LIST_STRATEGIES))
+        self.list_strategy = list_strategy
+        self.loaders = dict((extension.lower(), loader) for extension, loader in (loaders or {}).items())
+        self.layer_cache = ConfigCache(maxsize=cache_size)
+        # Overlays by content, so equal dictionaries are the same layer object
+        self._overlays = LRUCache(maxsize=cache_size)
+        # (labels of the layers, top level key) -> (values of the layers, merged value, provenance)
+        self._merged = LRUCache(maxsize=1024)
+
+    def loader_for(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        loader = self.loaders.get(extension)
+        if loader is None:
+            if extension not in LOADERS:
+                raise ValueError("No loader registered for {path}".format(path=path))
+            loader = self.loaders.setdefault(extension, LOADERS[extension]())
+        return loader
+
+    def load_parameters(self, source):
+        return self.loader_for(source).load_parameters(source)
+
+    def _overlay(self, overlay):
+        key = hashlib.sha1(repr(overlay).encode("utf-8")).digest()
+        return self._overlays.setdefault(key, copy.deepcopy(overlay))
+
+    def load_layers(self, config_sources, parameters_source):
+        """[(label, config)] of every source, the label is the path or overlay[index]"""
+        layers = []
+        for index, source in enumerate(config_sources):
+            if isinstance(source, dict):
+                layers.append(("overlay[{index}]".format(index=index), self._overlay(source)))
+            else:
+                loader = self.loader_for(source)
+                config = self.layer_cache.load(loader, loader.load_config, source, parameters_source)
+                if not isinstance(config, dict):
+                    raise ValueError("The root of {path} is not a mapping".format(path=source))
+                layers.append((source, config))
+        return layers
+
+    def load_config(self, config_sources, parameters_source):
+        return self.load_with_provenance(config_sources, parameters_source)[0]
+
+    def load_with_provenance(self, config_sources, parameters_source):
+        """
+        The merged config and a dictionary with the label of the layer of every leaf, by path (a:b:c). Lists are
+        leaves, with append or unique their items (a:b:0) are leaves too
+        """
+        layers = self.load_layers(config_sources, parameters_source)
+        labels = tuple(label for label, _ in layers)
+        keys = []
+        seen = set()
+        for _, config in layers:
+            for key in config:
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+
+        config = {}
+        provenance = {}
+        for key in keys:
+            items = [(label, layer[key]) for label, layer in layers if key in layer]
+            values = [value for _, value in items]
+            merged = self._merged.get((labels, key))
+            # The parsed layers are cached, the same objects mean nothing changed for this key
+            if merged is None or len(merged[0]) != len(values) or \
+                    any(old is not new for old, new in zip(merged[0], values)):
+                key_provenance = {}
+                merged = (values, self._merge(items, str(key), key_provenance), key_provenance)
+                self._merged.set((labels, key), merged)
+            config[key] = merged[1]
+            provenance.update(merged[2])
+        return config, provenance
+
+    def _merge(self, items, path, provenance):
+        """Merge the values of the layers at path. items is a list of (label, value)"""
+        label, last = items[-1]
+        if isinstance(last, dict):
+            # Only the trailing dictionaries are merged, a layer with another type replaces the previous ones
+            run = self._trailing(items, dict)
+            if len(run) == 1:
+                _leaves(last, path, label, provenance)
+                return last
+            merged = {}
+            for _, value in run:
+                for key in value:
+                    if key not in merged:
+                        merged[key] = self._merge([(run_label, run_value[key]) for run_label, run_value in run
+                                                   if key in run_value],
+                                                  "{path}:{key}".format(path=path, key=key), provenance)
+            return merged
+
+        provenance[path] = label
+        if isinstance(last, list) and self.list_strategy != "replace":
+            merged = []
+            for item_label, value in self._trailing(items, list):
+                for item in value:
+                    if self.list_strategy == "unique" and item in merged:
+                        continue
+                    provenance["{path}:{index}".format(path=path, index=len(merged))] = item_label
+                    merged.append(item)
+            return merged
+        return last
+
+    @staticmethod
+    def _trailing(items, value_type):
+        run = []
+        for item in reversed(items):
+            if not isinstance(item[1], value_type):
+                break
+            run.append(item)
+        run.reverse()
+        return run
+
+
+def _leaves(value, path, label, provenance):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _leaves(child, "{path}:{key}".format(path=path, key=key), label, provenance)
+    else:
+        provenance[path] = label
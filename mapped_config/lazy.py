@@ -0,0 +1,180 @@
+"""
+Lazy configuration objects.
+
+build_config(..., lazy=True) validates the whole document but returns a read-only view over the validated
+dictionary. Nested nodes and list items are wrapped the first time they are accessed and memoized, so only the
+sections that are used are built.
+"""
+from collections import OrderedDict
+from collections.abc import Sequence
+
+
+def _wrap(value, path):
+    if isinstance(value, dict):
+        return LazyNode(value, path)
+    elif isinstance(value, list):
+        return LazyList(value, path)
+    return value
+
+
+class LazyNode(object):
+    """Behaves like the namedtuple that build_config returns: attributes, _fields, _asdict, iteration and indexes"""
+    __slots__ = ("_data", "_path", "_fields", "_children")
+    # Subclasses over other containers wrap their own children
+    _wrap = staticmethod(_wrap)
+
+    def __init__(self, data, path=""):
+        object.__setattr__(self, "_data", data)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_fields", tuple(data.keys()))
+        object.__setattr__(self, "_children", {})
+
+    def _child(self, name):
+        children = self._children
+        try:
+            return children[name]
+        except KeyError:
+            path = "{path}.{name}".format(path=self._path, name=name) if self._path else str(name)
+            return children.setdefault(name, self._wrap(self._data[name], path))
+
+    def __getattr__(self, name):
+        if name in self._data:
+            return self._child(name)
+        raise AttributeError("'{type}' object has no attribute '{name}'".format(type=self._type_name(), name=name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute")
+
+    def __delattr__(self, name):
+        raise AttributeError("can't delete attribute")
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._child(name) for name in self._fields[index])
+        return self._child(self._fields[index])
+
+    def __iter__(self):
+        for name in self._fields:
+            yield self._child(name)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyNode):
+            return self._data == other._data
+        if isinstance(other, tuple):
+            if getattr(type(other), "_hashed", False):
+                # Hashed nodes are only equal to hashed nodes
+                return NotImplemented
+            fields = getattr(other, "_fields", None)
+            if fields is not None and fields != self._fields:
+                # The shared namedtuple class can have the fields in another order than the document
+                return set(fields) == set(self._fields) and \
+                    all(self._child(name) == value for name, value in zip(fields, other))
+            return tuple(self) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return LazyNode, (self._data, self._path)
+
+    def _type_name(self):
+        return self._path or "Configuration"
+
+    def _asdict(self):
+        return OrderedDict((name, self._child(name)) for name in self._fields)
+
+    def _replace(self, **kwargs):
+        data = dict(self._data)
+        for name, value in kwargs.items():
+            if name not in data:
+                raise ValueError("Got unexpected field names: {names}".format(names=[name]))
+            data[name] = value
+        return LazyNode(data, self._path)
+
+    def __repr__(self):
+        return "{type}({fields})".format(type=self._type_name(), fields=", ".join(
+            "{name}={value!r}".format(name=name, value=self._child(name)) for name in self._fields))
+
+
+class LazyList(object):
+    """Read-only list whose dictionaries are wrapped as LazyNode when they are accessed"""
+    __slots__ = ("_items", "_path", "_wrapped")
+    _wrap = staticmethod(_wrap)
+
+    def __init__(self, items, path=""):
+        object.__setattr__(self, "_items", items)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_wrapped", {})
+
+    def _item(self, index):
+        wrapped = self._wrapped
+        try:
+            return wrapped[index]
+        except KeyError:
+            return wrapped.setdefault(index, self._wrap(self._items[index], self._path))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._item(i) for i in range(*index.indices(len(self._items)))]
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError("list index out of range")
+        return self._item(index)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute")
+
+    def __iter__(self):
+        for index in range(len(self._items)):
+            yield self._item(index)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyList):
+            return self._items == other._items
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return LazyList, (self._items, self._path)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def is_node(value):
+    """Dictionaries, namedtuples and lazy nodes"""
+    return isinstance(value, (dict, LazyNode)) or (isinstance(value, tuple) and hasattr(value, "_fields"))
+
+
+def is_list(value):
+    """Lists, lazy lists and other sequences (like the ColumnarList of compact configs) but not strings"""
+    return isinstance(value, (list, LazyList, Sequence)) and not isinstance(value, (str, bytes, bytearray)) and \
+        not is_node(value)
+
+
+def node_items(node):
+    """(name, value) pairs of a node"""
+    if isinstance(node, dict):
+        return node.items()
+    elif isinstance(node, LazyNode):
+        return node._asdict().items()
+    return zip(node._fields, node)
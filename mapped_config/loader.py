@@ -4,27 +4,45 @@ import re
 from abc import ABCMeta, abstractmethod
 import six
 import os
-from cerberus import Validator
-from collections import namedtuple
+import logging
+import functools
+import itertools
+import string
+from . import streaming
+from .template import JsonTemplate, json_value
+from .compact import dict_to_compact
+from .lazy import LazyNode
+from .partial import selector_tree, select, select_schema, split_yaml, split_json, join_json
+from .nodes import namedtuple_class, dict_to_namedtuple, dict_to_hashed_namedtuple
+from .sections import build_sections
+from .stats import clock, count_nodes
+from .schema import CompiledSchema, SchemaCollision, compile_schema, mapped_to_cerberus, type_map
+from . import aio
+
+logger = logging.getLogger(__name__)
+
+
+YAML_BACKENDS = {"python": yaml.SafeLoader}
+if getattr(yaml, "__with_libyaml__", False):
+    YAML_BACKENDS["libyaml"] = yaml.CSafeLoader
+
 
 class InvalidDataException(Exception):
-    def __init__(self, errors):
+    """errors are the formatted messages. truncated is True if the validation stopped before finding all"""
+    def __init__(self, errors, truncated=False):
         self.errors = errors
+        self.truncated = truncated
+
 
+class MissingParametersException(KeyError):
+    """The config uses parameters that are neither in the parameters file nor in the environment"""
+    def __init__(self, names):
+        self.names = sorted(names)
+        super(MissingParametersException, self).__init__(
+            "Missing parameters: {names}".format(names=", ".join(self.names)))
 
-def dict_to_namedtuple(dictionary):
-    for key, value in dictionary.items():
-            if isinstance(value, dict):
-                dictionary[key] = dict_to_namedtuple(value)
-            elif isinstance(value, list):
-                el = []
-                for i in value:
-                    if isinstance(i, dict):
-                        el.append(dict_to_namedtuple(i))
-                    else:
-                        el.append(i)
-                dictionary[key] = el
-    return namedtuple('Configuration', dictionary.keys())(**dictionary)
+    def __str__(self):
+        return self.args[0]
 
 
 def is_string(value):
@@ -38,90 +56,198 @@ def is_string(value):
             return True
 
 
-type_map = {
-    int: "integer",
-    str: "string",
-    float: "float",
-    bool: "boolean"
-}
-def mapped_to_cerberus(d):
-
-    for key, value in d.items():
-
-        if value is None:
-            d[key] = {"required": True}
-        elif isinstance(value, dict):
-            if "type" not in value:
-                schema_dict = {"type": "dict", "default": {}, "schema": mapped_to_cerberus(value)}
-                d[key] = schema_dict
-
-        elif isinstance(value, list):
-            if len(value) > 0:
-                schema_list = mapped_to_cerberus({"_":value[0]})["_"]
-            else:
-                schema_list = {}
-
-            if isinstance(value, list):
-                if isinstance(value[0], dict):
-                    default_value = []
-                else:
-                    default_value = value
-            elif not isinstance(value, dict):
-                default_value = value
-            else:
-                default_value = []
-            d[key] = {"type": "list", "default": default_value, "schema": schema_list}
+_formatter = string.Formatter()
+# Superset of the names that can be used as {placeholder} in a line
+_yml_placeholder = re.compile(r"\{\s*([^{}.\[:!\s]*)")
+
+
+def format_field_names(template):
+    """Names of the parameters used by a str.format template"""
+    names = set()
+    for _, field_name, format_spec, _ in _formatter.parse(template):
+        if field_name is not None:
+            names.add(re.match(r"[^.\[]*", field_name).group(0))
+        if format_spec:
+            names.update(format_field_names(format_spec))
+    return names
+
+
+def environment_parameter(name):
+    """The environment variable, quoted like YML strings. None if it does not exist"""
+    value = os.environ.get(name)
+    if value is not None and is_string(value):
+        value = "'" + value + "'"
+    return value
+
+
+class _StreamParameters(object):
+    """Parameters resolved when they are used: the environment first, then the parameters file"""
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.missing = set()
+
+    def __getitem__(self, name):
+        value = environment_parameter(name)
+        if value is not None:
+            return value
+        try:
+            return self.parameters[name]
+        except KeyError:
+            # Keep going to report all the missing parameters at once
+            self.missing.add(name)
+            return ""
+
+    def check(self):
+        if self.missing:
+            raise MissingParametersException(self.missing)
+
+
+def _lap(stats, stage, started, **measurements):
+    """Record the stage that started at started. Returns the time, to start the next one"""
+    now = clock()
+    stats.record(stage, now - started, **measurements)
+    return now
+
+
+def build_config(mapped_schema, config_data, as_named_tuple=True, lazy=False, workers=None, stats=None,
+                 hashed=False, compact=False, fail_fast=False, max_errors=None, sections=None):
+    """
+    Validate config_data against the schema. The schema can be a raw dictionary, a constructor field, a list
+    of them or an already CompiledSchema.
+    With lazy the namedtuples are built the first time every node is accessed.
+    With workers the top level sections are validated separately in that many threads and cached, so only
+    the sections that changed since the last call are validated again.
+    With a LoadStats the compile, validate and namedtuple stages are measured.
+    With hashed every namedtuple carries the structural digest of its subtree, so equal subtrees are compared
+    and hashed without walking them.
+    With compact the repeated values are shared and the lists of objects are stored by columns.
+    With max_errors (or fail_fast, the same as max_errors=1) the validation stops after that many errors and
+    InvalidDataException has only those, with truncated set if part of the document was not validated. Only
+    the fast engine stops early, with codegen, cerberus and with workers the errors are cut after validating everything.
+    With sections (like ["queue", "database:providers"]) only those subtrees of the schema are validated and
+    built, the rest of the document is ignored
+    """
+    if fail_fast:
+        max_errors = 1
+    if max_errors is not None and max_errors < 1:
+        raise ValueError("max_errors must be at least 1")
+    if (hashed or compact) and (lazy or not as_named_tuple):
+        raise ValueError("hashed and compact configs are namedtuples, they can not be lazy nor dictionaries")
+    if hashed and compact:
+        raise ValueError("A config can not be hashed and compact")
+    if stats is not None:
+        started = clock()
+    if sections is not None:
+        schema = select_schema(mapped_schema, sections)
+        if isinstance(config_data, dict):
+            config_data = select(config_data, selector_tree(sections))
+    else:
+        schema = compile_schema(mapped_schema)
+    if stats is not None:
+        started = _lap(stats, "compile", started)
+    if workers is not None and isinstance(config_data, dict):
+        mode = "dict" if not as_named_tuple or hashed or compact else "lazy" if lazy else "namedtuple"
+        config, errors = build_sections(schema, config_data, mode, workers)
+        if stats is not None:
+            _lap(stats, "sections", started, errors=len(errors or ()))
+        if errors:
+            raise _invalid(errors, max_errors, False)
+        if hashed:
+            return dict_to_hashed_namedtuple(config)
+        return dict_to_compact(config) if compact else config
+
+    v = schema.validator(max_errors)
+    valid = v.validate(config_data)
+    if stats is not None:
+        seconds = clock() - started
+        stats.record("validate", seconds, nodes=count_nodes(config_data), errors=0 if valid else len(v.errors))
+        started = clock()
+    if valid:
+        if hashed:
+            config = dict_to_hashed_namedtuple(v.document)
+        elif compact:
+            config = dict_to_compact(v.document)
+        elif as_named_tuple and lazy:
+            config = LazyNode(v.document)
+        elif as_named_tuple:
+            # The codegen engine builds the namedtuples with generated code
+            to_namedtuple = getattr(v, "to_namedtuple", None)
+            config = to_namedtuple() if to_namedtuple is not None else dict_to_namedtuple(v.document)
         else:
-
-                new_value = {
-                    "type": type_map[type(value)],
-                    "default": value,
-                    "required": False
-                }
-                d[key] = new_value
+            config = v.document
+        if stats is not None:
+            _lap(stats, "namedtuple" if as_named_tuple else "document", started)
+        return config
+    else:
+        raise _invalid(v.errors, max_errors, getattr(v, "truncated", False))
 
 
+def _invalid(errors, max_errors, truncated):
+    """InvalidDataException with at most max_errors formatted errors"""
+    if max_errors is None:
+        return InvalidDataException(format_errors(errors), truncated)
+    error_list = list(itertools.islice(iter_errors(errors), max_errors + 1))
+    truncated = truncated or len(error_list) > max_errors
+    return InvalidDataException(error_list[:max_errors], truncated)
 
-    return d
 
+def iter_errors(errors, prefix=()):
+    """Yield the formatted errors one by one, like format_errors but without building the whole list"""
+    return _iter_errors(errors, [str(key) for key in prefix])
 
 
+def _iter_errors(errors, path):
+    # One path list for the whole tree instead of a new prefix for every node
+    for key, value in errors.items():
+        path.append(str(key))
+        for err in value:
+            if isinstance(err, dict):
+                for message in _iter_errors(err, path):
+                    yield message
+            else:
+                yield "Field [{field}] {desc}".format(field=":".join(path), desc=err)
+        path.pop()
 
-def build_config(mapped_schema, config_data, as_named_tuple=True):
-    if not isinstance(mapped_schema, dict):
-        mapped_schema = mapped_schema.build()
 
-    cer = mapped_to_cerberus(mapped_schema)
-    v = Validator(cer)
-    if v.validate(config_data):
-        if as_named_tuple:
-            config = dict_to_namedtuple(v.document)
-        else:
-            config = v.document
-        return config
-    else:
-        raise InvalidDataException(format_errors(v.errors))
+def format_errors(errors, prefix=[]):
+    return list(iter_errors(errors, prefix))
 
 
 
-def format_errors(errors, prefix=[]):
-    error_list = []
-    for key, value in errors.items():
-        for err in value:
-            node_prefix = prefix + [str(key)]
-            if isinstance(err, dict):
-                error_list += format_errors(err, node_prefix)
-            else:
-                error_list.append("Field [{field}] {desc}".format(field=":".join(node_prefix), desc=err))
-    return error_list
 
 
 
+def cached(load_config):
+    """Decorator for load_config that uses the ConfigCache of the loader, if it has one"""
+    @functools.wraps(load_config)
+    def load(self, config_source, parameters_source, sections=None):
+        stats = self.stats
+        # Partial configs are not cached, the cache has the whole file
+        if self.cache is None or sections is not None:
+            if stats is None:
+                return load_config(self, config_source, parameters_source, sections)
+            started = clock()
+            config = load_config(self, config_source, parameters_source, sections)
+            _lap(stats, "load", started)
+            return config
 
+        if stats is not None:
+            started = clock()
+            misses = self.cache.misses
+        config = self.cache.load(self, lambda config, parameters: load_config(self, config, parameters),
+                                 config_source, parameters_source)
+        if stats is not None:
+            miss = self.cache.misses != misses
+            _lap(stats, "load", started, cache_hits=0 if miss else 1, cache_misses=1 if miss else 0)
+        return config
+    return load
 
 
 @six.add_metaclass(ABCMeta)
 class ConfigurationLoader(object):
+    cache = None
+    stats = None
+
     @abstractmethod
     def load_parameters(self, source):
         """Convert the source into a dictionary"""
@@ -131,80 +257,224 @@ class ConfigurationLoader(object):
     def load_config(self, config_source, parameters_source):
         pass
 
-    def build_config(self, data, mapping, as_namedtuple=True):
-        return build_config(mapped_schema=mapping, config_data=data, as_named_tuple=as_namedtuple)
+    def placeholder_names(self, config_source):
+        """
+        Names of the parameters that the config can use, or None if unknown. The ConfigCache only watches
+        these environment variables
+        """
+        return None
+
+    def _file_parameters(self, parameters_source):
+        """Parameteres from file, the file is optional"""
+        if os.path.isfile(parameters_source):
+            params = self.load_parameters(parameters_source)
+            if params is not None:
+                return params
+        return {}
+
+    def build_config(self, data, mapping, as_namedtuple=True, lazy=False, workers=None, hashed=False,
+                     compact=False, fail_fast=False, max_errors=None, sections=None):
+        """The mapping can be a raw schema, a constructor field, a list of module mappings or a CompiledSchema"""
+        return build_config(mapped_schema=mapping, config_data=data, as_named_tuple=as_namedtuple, lazy=lazy,
+                            workers=workers, stats=self.stats, hashed=hashed, compact=compact,
+                            fail_fast=fail_fast, max_errors=max_errors, sections=sections)
+
+    def aload_config(self, config_source, parameters_source, executor=None, timeout=None):
+        """
+        Coroutine of load_config for asyncio: the files are read at the same time and parsed in the executor
+        (the default of the loop if None). Raises asyncio.TimeoutError after timeout seconds
+        """
+        return aio.aload_config(self, config_source, parameters_source, executor=executor, timeout=timeout)
+
+    def abuild_config(self, data, mapping, as_namedtuple=True, lazy=False, workers=None, executor=None,
+                      timeout=None):
+        """Coroutine of build_config for asyncio, the validation runs in the executor"""
+        return aio.abuild_config(self, data, mapping, as_namedtuple=as_namedtuple, lazy=lazy, workers=workers,
+                                 executor=executor, timeout=timeout)
 
 
 
 class YmlLoader(ConfigurationLoader):
+    def __init__(self, streaming=False, backend=None, cache=None, stats=None):
+        """
+        With streaming the config file is parsed in one pass, replacing the parameters in every value as it
+        is read. Use it for very big files.
+        The backend is the YAML parser: "libyaml" (much faster, if PyYAML was built with it) or "python".
+        By default libyaml is used when it is available.
+        The cache is an optional ConfigCache for load_config and stats an optional LoadStats
+        """
+        self.streaming = streaming
+        self.cache = cache
+        self.stats = stats
+        if backend is None:
+            backend = "libyaml" if "libyaml" in YAML_BACKENDS else "python"
+        elif backend not in ("libyaml", "python"):
+            raise ValueError("Unknown YAML backend {backend}, use libyaml or python".format(backend=backend))
+        elif backend not in YAML_BACKENDS:
+            raise ValueError("The libyaml backend is not available, PyYAML was built without it")
+        self.backend = backend
+        self.yaml_loader = YAML_BACKENDS[backend]
+        logger.debug("YmlLoader using the %s YAML backend", backend)
+
     def load_parameters(self, source):
         """For YML, the source it the file path"""
         with open(source) as parameters_source:
-            loaded = yaml.safe_load(parameters_source.read())
+            loaded = yaml.load(parameters_source.read(), Loader=self.yaml_loader)
             for k, v in loaded.items():
                 if isinstance(v, str):
                     loaded[k] = "'"+v+"'"
             return loaded
 
-    def load_config(self, config_source, parameters_source):
-        """For YML, the source it the file path"""
+    def _parameters(self, file_parameters, names):
+        """The parameters used by the config. The environment variables overwrite the parameters file"""
+        parameters = {}
+        for name in names:
+            value = environment_parameter(name)
+            if value is not None:
+                parameters[name] = value
+            elif name in file_parameters:
+                parameters[name] = file_parameters[name]
+
+        missing = names.difference(parameters)
+        if missing:
+            raise MissingParametersException(missing)
+        return parameters
+
+    @cached
+    def load_config(self, config_source, parameters_source, sections=None):
+        """
+        For YML, the source it the file path. With sections (like ["queue", "database:providers"]) only the
+        top level sections that have them are substituted and parsed
+        """
+        stats = self.stats
+        if stats is not None:
+            started = clock()
         with open(config_source) as config_source:
-            config_raw = config_source.read()
-
-            parameters = {}
-            """Parameteres from file"""
-            if os.path.isfile(parameters_source):
-                params = self.load_parameters(parameters_source)
-                if params is not None:
-                    parameters.update(params)
-
-            """Overwrite parameteres with the environment variables"""
-            env_params = {}
-            env_params.update(os.environ)
-            for k, v in env_params.items():
-                if is_string(v):
-                    env_params[k] = "'" + v + "'"
-
-            parameters.update(env_params)
-
-            """Replace the parameters"""
-            final_configuration = config_raw.format(**parameters)
-            final_configuration = yaml.safe_load(final_configuration)
+            if sections is not None:
+                tree = selector_tree(sections)
+                config_text = config_source.read()
+                blocks = split_yaml(config_text)
+                if blocks is not None:
+                    config_text = "".join(blocks[key] for key in blocks if key in tree)
+                if stats is not None:
+                    started = _lap(stats, "read", started, bytes=len(config_text))
+                return select(self.load_config_text(config_text, self._file_parameters(parameters_source)), tree)
+            if not self.streaming:
+                config_text = config_source.read()
+                if stats is not None:
+                    started = _lap(stats, "read", started, bytes=len(config_text))
+                file_parameters = self._file_parameters(parameters_source)
+                if stats is not None:
+                    _lap(stats, "parameters_file", started)
+                return self.load_config_text(config_text, file_parameters)
+            parameters = _StreamParameters(self._file_parameters(parameters_source))
+            final_configuration = streaming.load(config_source, parameters, self.yaml_loader)
+            parameters.check()
+            if stats is not None:
+                _lap(stats, "stream", started, bytes=os.fstat(config_source.fileno()).st_size)
             return final_configuration if final_configuration is not None else {}
 
+    def load_config_text(self, config_text, file_parameters):
+        """Same as load_config but with the text of the config file and the already loaded parameters file"""
+        stats = self.stats
+        if stats is not None:
+            started = clock()
+        parameters = self._parameters(file_parameters, format_field_names(config_text))
+        if stats is not None:
+            started = _lap(stats, "parameters", started, placeholders=len(parameters))
+        """Replace the parameters"""
+        final_configuration = config_text.format(**parameters)
+        if stats is not None:
+            started = _lap(stats, "substitute", started, bytes=len(final_configuration))
+        final_configuration = yaml.load(final_configuration, Loader=self.yaml_loader)
+        if stats is not None:
+            _lap(stats, "parse", started)
+        return final_configuration if final_configuration is not None else {}
+
+    def iter_config_sections(self, config_source, parameters_source):
+        """
+        Yield the (key, value) pairs of the root of the config file one by one, so every section can be
+        validated and released before the next one is read
+        """
+        parameters = _StreamParameters(self._file_parameters(parameters_source))
+        with open(config_source) as config_source:
+            for key, value in streaming.iter_sections(config_source, parameters, self.yaml_loader):
+                yield key, value
+        parameters.check()
+
+    def placeholder_names(self, config_source):
+        names = set()
+        with open(config_source) as config_file:
+            for line in config_file:
+                if "{" in line:
+                    names.update(_yml_placeholder.findall(line))
+        return names
+
 
 class JsonLoader(ConfigurationLoader):
-    def __init__(self):
-        self.parameters = None
+    def __init__(self, cache=None, stats=None):
+        """The cache is an optional ConfigCache for load_config and stats an optional LoadStats"""
+        self.cache = cache
+        self.stats = stats
 
     def load_parameters(self, source):
         """For JSON, the source it the file path"""
         with open(source) as parameters_source:
             return json.loads(parameters_source.read())
 
-    def load_config(self, config_source, parameters_source):
-        """For JSON, the source it the file path"""
-        with open(config_source) as config_source:
-            config_raw = config_source.read()
-            """Replace the parameters"""
-            pattern = "(%[a-zA-Z_0-9]*%)"
-
-            self.parameters = {}
-            """Parameteres from file"""
-            if os.path.isfile(parameters_source):
-                self.parameters.update(self.load_parameters(parameters_source))
-
-            """Overwrite parameteres with the environment variables"""
-            self.parameters.update(os.environ)
-
-            replaced_config = re.sub(pattern=pattern, repl=self._replace_function, string=config_raw)
-            return json.loads(replaced_config)
-
-    def _replace_function(self, match):
-        # Remove % from the begining and from the end
-        parameter_key = match.group(0)[1:-1]
-        value = self.parameters[parameter_key]
-        # Add the " for string values
-        return str(value) if str(value).isdigit() else '"{value}"'.format(value=value)
-
+    @cached
+    def load_config(self, config_source, parameters_source, sections=None):
+        """
+        For JSON, the source it the file path. With sections (like ["queue", "database:providers"]) only the
+        top level members that have them are substituted and parsed
+        """
+        stats = self.stats
+        if sections is not None:
+            tree = selector_tree(sections)
+            with open(config_source) as config_file:
+                config_text = config_file.read()
+            members = split_json(config_text)
+            if members is not None:
+                config_text = join_json(member for key, member in members.items() if key in tree)
+            return select(self.load_config_text(config_text, self._file_parameters(parameters_source)), tree)
+        if stats is None:
+            return self._render(JsonTemplate.from_file(config_source), self._file_parameters(parameters_source))
+        started = clock()
+        template = JsonTemplate.from_file(config_source)
+        started = _lap(stats, "template", started, placeholders=len(template.names))
+        file_parameters = self._file_parameters(parameters_source)
+        _lap(stats, "parameters_file", started)
+        return self._render(template, file_parameters)
+
+    def load_config_text(self, config_text, file_parameters):
+        return self._render(JsonTemplate(config_text), file_parameters)
+
+    def _render(self, template, parameters):
+        stats = self.stats
+        if stats is not None:
+            started = clock()
+        """Overwrite parameteres with the environment variables, only the ones used"""
+        values = {}
+        for name in template.names:
+            if name in os.environ:
+                values[name] = json_value(os.environ[name])
+            elif name in parameters:
+                values[name] = json_value(parameters[name])
+
+        missing = template.names.difference(values)
+        if missing:
+            raise MissingParametersException(missing)
+        if stats is not None:
+            started = _lap(stats, "parameters", started, placeholders=len(values))
+
+        """Replace the parameters"""
+        text = template.render(values)
+        if stats is None:
+            return json.loads(text)
+        started = _lap(stats, "substitute", started, bytes=len(text))
+        config = json.loads(text)
+        _lap(stats, "parse", started)
+        return config
 
+    def placeholder_names(self, config_source):
+        return set(JsonTemplate.from_file(config_source).names)
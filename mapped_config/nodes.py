@@ -0,0 +1,141 @@
+"""
+Namedtuple classes of the configuration nodes, cached by path and fields.
+
+The hashed variants carry the structural digest of their subtree (see fingerprint), computed once when they
+are built.
+"""
+import re
+from collections import namedtuple
+from .cache import LRUCache
+from .fingerprint import map_digest
+from .lazy import LazyNode
+
+
+_namedtuple_classes = LRUCache(maxsize=1024)
+
+
+def namedtuple_class(path, fields):
+    """
+    Namedtuple class for the node at path (like database.providers). The same class is returned for the same
+    path and set of fields, so documents and list items share it
+    """
+    key = (path, frozenset(fields))
+    node_class = _namedtuple_classes.get(key)
+    if node_class is None:
+        name = path or "Configuration"
+        node_class = namedtuple(re.sub(r"\W", "_", name), fields)
+        # Dots are not valid in identifiers but they are in class names
+        node_class.__name__ = name
+        node_class.__qualname__ = name
+        # The class can not be found by its name, pickle the path and fields to get it from the cache again
+        node_class._path = path
+        node_class.__reduce__ = _reduce_namedtuple
+        node_class = _namedtuple_classes.setdefault(key, node_class)
+    return node_class
+
+
+def _reduce_namedtuple(node):
+    return _rebuild_namedtuple, (node._path, node._fields, tuple(node))
+
+
+def _rebuild_namedtuple(path, fields, values):
+    return namedtuple_class(path, fields)(**dict(zip(fields, values)))
+
+
+def dict_to_namedtuple(dictionary, path=""):
+    """Namedtuples of a validated document. The dictionary is not modified, loaders can cache it"""
+    values = {}
+    for key, value in dictionary.items():
+        node_path = "{path}.{key}".format(path=path, key=key) if path else str(key)
+        if isinstance(value, dict):
+            value = dict_to_namedtuple(value, node_path)
+        elif isinstance(value, list):
+            value = [dict_to_namedtuple(item, node_path) if isinstance(item, dict) else item for item in value]
+        values[key] = value
+    return namedtuple_class(path, values.keys())(**values)
+
+
+_hashed_classes = LRUCache(maxsize=1024)
+
+
+def hashed_namedtuple_class(path, fields):
+    """
+    Subclass of namedtuple_class(path, fields) whose instances carry the structural digest of their subtree
+    (_digest), so comparing and hashing them does not walk the subtree
+    """
+    key = (path, frozenset(fields))
+    hashed_class = _hashed_classes.get(key)
+    if hashed_class is None:
+        node_class = namedtuple_class(path, fields)
+        hashed_class = type(node_class.__name__, (node_class,), {
+            "__eq__": _hashed_eq,
+            "__ne__": _hashed_ne,
+            "__hash__": _hashed_hash,
+            "__getattr__": _hashed_getattr,
+            "__reduce__": _reduce_hashed,
+            "_hashed": True,
+            "__module__": node_class.__module__,
+        })
+        hashed_class.__qualname__ = node_class.__qualname__
+        hashed_class = _hashed_classes.setdefault(key, hashed_class)
+    return hashed_class
+
+
+def _hashed_getattr(node, name):
+    # Nodes made by _replace or _make do not have the digest yet
+    if name == "_digest":
+        digest = node.__dict__["_digest"] = map_digest(zip(node._fields, node))
+        return digest
+    raise AttributeError("'{type}' object has no attribute '{name}'".format(type=type(node).__name__, name=name))
+
+
+def _hashed_eq(node, other):
+    """
+    Equal digests are equal subtrees. Nodes without a digest (namedtuples, lazy nodes) are never equal, their
+    hash is not the one of the digest
+    """
+    if isinstance(other, tuple):
+        other_digest = getattr(other, "_digest", None)
+        return other_digest is not None and node._digest == other_digest
+    return False if isinstance(other, LazyNode) else NotImplemented
+
+
+def _hashed_ne(node, other):
+    equal = _hashed_eq(node, other)
+    return equal if equal is NotImplemented else not equal
+
+
+def _hashed_hash(node):
+    return hash(node._digest)
+
+
+def _reduce_hashed(node):
+    return _rebuild_hashed, (node._path, node._fields, tuple(node), node._digest)
+
+
+def _rebuild_hashed(path, fields, values, digest):
+    node = hashed_namedtuple_class(path, fields)(**dict(zip(fields, values)))
+    node.__dict__["_digest"] = digest
+    return node
+
+
+def dict_to_hashed_namedtuple(dictionary, path="", interned=None):
+    """
+    Like dict_to_namedtuple but the nodes carry their digest, computed once while building. The dictionary is
+    not modified. With an interned dictionary (digest -> node), shared between builds, identical subtrees are
+    the same object
+    """
+    values = {}
+    for key, value in dictionary.items():
+        node_path = "{path}.{key}".format(path=path, key=key) if path else str(key)
+        if isinstance(value, dict):
+            value = dict_to_hashed_namedtuple(value, node_path, interned)
+        elif isinstance(value, list):
+            value = [dict_to_hashed_namedtuple(item, node_path, interned) if isinstance(item, dict) else item
+                     for item in value]
+        values[key] = value
+    node = hashed_namedtuple_class(path, values.keys())(**values)
+    digest = node.__dict__["_digest"] = map_digest(values.items())
+    if interned is not None:
+        node = interned.setdefault(digest, node)
+    return node
@@ -0,0 +1,152 @@
+"""
+Partial configurations: only the sections a process needs.
+
+Sections are selectors like "queue" or "database:providers". With them load_config substitutes and parses only
+the top level sections that contain them, when the format allows to split the file (otherwise the whole file
+is parsed and the rest is dropped), and build_config validates and builds only the selected subtrees of the
+schema. Parameters used only by other sections are not needed.
+"""
+import json
+import re
+from collections import OrderedDict
+from .cache import LRUCache
+from .schema import compile_schema
+
+# A simple top level key of a block mapping, like "database:" or "queue: {params}"
+_yaml_top_key = re.compile(r"([A-Za-z0-9_][\w.-]*)[ \t]*:(?:[ \t]|\r?$)")
+# Anchors and aliases can link sections, the file is not split if it has them
+_yaml_anchor = re.compile(r"(?:^|[\s\[{,])[&*]\w", re.M)
+_json_token = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\],:]')
+
+
+def selector_tree(sections):
+    """{"database": {"providers": None}, "queue": None} for ["database:providers", "queue"]"""
+    if isinstance(sections, str):
+        raise TypeError("sections is a list of selectors, not a string")
+    tree = {}
+    for selector in sections:
+        keys = selector.split(":") if isinstance(selector, str) else list(selector)
+        if not keys or not all(keys):
+            raise ValueError("Invalid section selector {selector!r}".format(selector=selector))
+        node = tree
+        for key in keys[:-1]:
+            child = node.get(key, {})
+            if child is None:
+                # A parent is already selected entirely
+                break
+            node = node.setdefault(key, child)
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def select(mapping, tree):
+    """The subtrees of the dictionary selected by the tree. Missing keys are skipped"""
+    result = {}
+    for key, subtree in tree.items():
+        if key in mapping:
+            value = mapping[key]
+            result[key] = value if subtree is None or not isinstance(value, dict) else select(value, subtree)
+    return result
+
+
+def _select_mapping(mapping, tree, path):
+    result = {}
+    for key, subtree in tree.items():
+        key_path = "{path}:{key}".format(path=path, key=key) if path else key
+        if key not in mapping:
+            raise ValueError("The schema has no section {path}".format(path=key_path))
+        value = mapping[key]
+        if subtree is None:
+            result[key] = value
+        elif isinstance(value, dict) and "type" not in value:
+            result[key] = _select_mapping(value, subtree, key_path)
+        else:
+            raise ValueError("{path} is not an object of the schema".format(path=key_path))
+    return result
+
+
+_selected_schemas = LRUCache(maxsize=128)
+
+
+def select_schema(mapped_schema, sections):
+    """CompiledSchema with only the selected sections. Raises ValueError for sections not in the schema"""
+    schema = compile_schema(mapped_schema)
+    key = (schema, tuple(tuple(selector.split(":")) if isinstance(selector, str) else tuple(selector)
+                         for selector in sections))
+    selected = _selected_schemas.get(key)
+    if selected is None:
+        mapping = _select_mapping(schema._mapping, selector_tree(sections), "")
+        selected = _selected_schemas.setdefault(key, compile_schema(mapping, schema.key[0]))
+    return selected
+
+
+def split_yaml(text):
+    """
+    The text of every top level section of a YAML document, by key. None if the document can not be split
+    safely (flow style, several documents, anchors, complex or quoted keys...)
+    """
+    if _yaml_anchor.search(text):
+        return None
+    blocks = OrderedDict()
+    current = None
+    for line in text.splitlines(True):
+        first = line[:1]
+        if first in ("", " ", "\t", "\n", "\r", "#"):
+            if current is not None:
+                current.append(line)
+            continue
+        match = _yaml_top_key.match(line)
+        if match is None or match.group(1) in blocks:
+            return None
+        current = blocks[match.group(1)] = [line]
+    return OrderedDict((key, "".join(lines)) for key, lines in blocks.items())
+
+
+def split_json(text):
+    """
+    The text of every member ("key": value) of the root object of a JSON document, by key. The values can have
+    placeholders. None if the root is not an object or the text can not be split
+    """
+    members = OrderedDict()
+    depth = 0
+    key = start = None
+    expect_key = False
+    for match in _json_token.finditer(text):
+        token = match.group()
+        if depth == 0:
+            if token != "{" or members or key is not None or text[:match.start()].strip():
+                return None
+            depth = 1
+            expect_key = True
+            continue
+        if token in "{[":
+            depth += 1
+        elif token in "}]":
+            depth -= 1
+            if depth == 0:
+                if key is not None:
+                    members[key] = text[start:match.start()]
+                    key = None
+                if text[match.end():].strip():
+                    return None
+        elif depth == 1:
+            if expect_key:
+                if token[0] != '"':
+                    return None
+                key = json.loads(token)
+                if key in members:
+                    return None
+                start = match.start()
+                expect_key = False
+            elif token == ",":
+                members[key] = text[start:match.start()]
+                key = None
+                expect_key = True
+    if depth != 0:
+        return None
+    return members
+
+
+def join_json(members):
+    return "{" + ",".join(members) + "}"
@@ -0,0 +1,276 @@
+import copy
+import threading
+from cerberus import Validator
+from .cache import LRUCache
+from .fingerprint import structural_digest
+from .validator import FastValidator, UnsupportedSchema, compile_validator
+from .codegen import GeneratedValidator, load_module
+from .constructor import build_field_into
+
+
+type_map = {
+    int: "integer",
+    str: "string",
+    float: "float",
+    bool: "boolean"
+}
+
+
+def mapped_to_cerberus(d):
+    """Convert a mapped schema into a cerberus schema. The given dictionary is not modified"""
+    result = {}
+    for key, value in d.items():
+
+        if value is None:
+            result[key] = {"required": True}
+        elif isinstance(value, dict):
+            if "type" not in value:
+                result[key] = {"type": "dict", "default": {}, "schema": mapped_to_cerberus(value)}
+            else:
+                # Already a cerberus definition
+                result[key] = value
+
+        elif isinstance(value, list):
+            if len(value) > 0:
+                schema_list = mapped_to_cerberus({"_": value[0]})["_"]
+            else:
+                schema_list = {}
+
+            if len(value) > 0 and isinstance(value[0], dict):
+                # The element defines the structure of the items, not a default value
+                default_value = []
+            else:
+                default_value = value
+            result[key] = {"type": "list", "default": default_value, "schema": schema_list}
+        else:
+            result[key] = {
+                "type": type_map[type(value)],
+                "default": value,
+                "required": False
+            }
+
+    return result
+
+
+class SchemaCollision(ValueError):
+    """Two mappings of a list define the same top level keys"""
+    def __init__(self, keys):
+        self.keys = sorted(str(key) for key in keys)
+        super(SchemaCollision, self).__init__(
+            "Keys defined by more than one mapping: {keys}".format(keys=", ".join(self.keys)))
+
+
+def normalize_mapping(mapped_schema):
+    """
+    Return a new dictionary with the mapped schema. The schema can be a raw dictionary, a constructor field
+    or a list of them (like the config_mapping of every module)
+    """
+    if isinstance(mapped_schema, dict):
+        return copy.deepcopy(mapped_schema)
+    elif isinstance(mapped_schema, (list, tuple)):
+        # Every module owns its top level keys
+        result = {}
+        for mapping in mapped_schema:
+            module_mapping = normalize_mapping(mapping)
+            collisions = set(module_mapping).intersection(result)
+            if collisions:
+                raise SchemaCollision(collisions)
+            result.update(module_mapping)
+        return result
+    elif hasattr(mapped_schema, "build_into") or hasattr(mapped_schema, "build"):
+        result = {}
+        build_field_into(mapped_schema, result)
+        return result
+    else:
+        raise TypeError("Unsupported mapped schema {schema!r}".format(schema=mapped_schema))
+
+
+def _freeze(value):
+    """Hashable representation of a schema. Types are kept so 1, 1.0 and True are not confused"""
+    if isinstance(value, dict):
+        return "dict", tuple(sorted(((repr(k), _freeze(v)) for k, v in value.items())))
+    elif isinstance(value, (list, tuple)):
+        return "list", tuple(_freeze(v) for v in value)
+    elif value is None:
+        return None
+    else:
+        return type(value).__name__, value
+
+
+ENGINES = ("auto", "fast", "cerberus", "codegen")
+# Rules whose value is the one cerberus uses when they are missing
+_DEFAULT_RULES = ("required", "nullable")
+
+
+def _without_defaults(definition):
+    """Cerberus definition without the rules that have their default value, so equivalent definitions are equal"""
+    if not isinstance(definition, dict):
+        return definition
+    result = dict((rule, value) for rule, value in definition.items()
+                  if not (rule in _DEFAULT_RULES and value is False))
+    schema = result.get("schema")
+    if isinstance(schema, dict):
+        if result.get("type") == "list":
+            result["schema"] = _without_defaults(schema)
+        elif result.get("type") == "dict":
+            result["schema"] = _schema_without_defaults(schema)
+    return result
+
+
+def _schema_without_defaults(schema):
+    return dict((key, _without_defaults(definition)) for key, definition in schema.items())
+
+
+class CompiledSchema(object):
+    """
+    A mapped schema converted once into its cerberus form. It is immutable and can be shared between threads,
+    every thread gets its own validator.
+
+    The engine can be "fast" (the built in validator), "cerberus", "auto", that uses the fast one unless
+    the schema has rules that it does not support, or "codegen", that compiles the schema into Python code.
+    """
+    __slots__ = ("_mapping", "_schema", "_key", "_hash", "_local", "_engine", "_fast_node", "_sections",
+                 "_fingerprint", "_module")
+
+    def __init__(self, mapped_schema, engine="auto"):
+        mapping = normalize_mapping(mapped_schema)
+        self._setup(mapping, (engine, _freeze(mapping)), engine)
+
+    @classmethod
+    def _from_normalized(cls, mapping, key, engine):
+        compiled = cls.__new__(cls)
+        compiled._setup(mapping, key, engine)
+        return compiled
+
+    def _setup(self, mapping, key, engine):
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine {engine}, use one of {engines}".format(engine=engine, engines=ENGINES))
+        schema = mapped_to_cerberus(mapping)
+        object.__setattr__(self, "_mapping", mapping)
+        object.__setattr__(self, "_schema", schema)
+        object.__setattr__(self, "_key", key)
+        object.__setattr__(self, "_hash", hash(key))
+        object.__setattr__(self, "_sections", None)
+        object.__setattr__(self, "_fingerprint", None)
+        object.__setattr__(self, "_local", threading.local())
+        # Fail now if cerberus does not accept the schema
+        self._cerberus_validator()
+
+        module = None
+        if engine == "codegen":
+            try:
+                module = load_module(schema, self.fingerprint)
+            except UnsupportedSchema:
+                raise ValueError("The schema uses rules not supported by the codegen engine")
+        object.__setattr__(self, "_module", module)
+        fast_node = compile_validator(schema) if engine in ("auto", "fast") else None
+        if engine == "fast" and fast_node is None:
+            raise ValueError("The schema uses rules not supported by the fast engine")
+        object.__setattr__(self, "_fast_node", fast_node)
+        object.__setattr__(self, "_engine", "codegen" if module is not None else
+                           "fast" if fast_node is not None else "cerberus")
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def fingerprint(self):
+        """
+        Hex digest of the cerberus form of the schema, the same in every process. Equivalent schemas (a constructor
+        field and its dictionary, a value and its cerberus definition, a list of mappings in any order) have the same
+        fingerprint: required and nullable are False when they are missing, like in cerberus. Other rules are
+        compared as they are written. The engine is not included
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            fingerprint = structural_digest(_schema_without_defaults(self._schema)).hex()
+            object.__setattr__(self, "_fingerprint", fingerprint)
+        return fingerprint
+
+    @property
+    def engine(self):
+        """Validation engine in use, fast, codegen or cerberus"""
+        return self._engine
+
+    @property
+    def mapping(self):
+        """Copy of the mapped schema"""
+        return copy.deepcopy(self._mapping)
+
+    @property
+    def schema(self):
+        """Copy of the cerberus schema"""
+        return copy.deepcopy(self._schema)
+
+    def sections(self):
+        """A CompiledSchema for every top level key, to validate the sections of a document separately"""
+        sections = self._sections
+        if sections is None:
+            engine = self._key[0]
+            sections = dict((key, compile_schema({key: value}, engine)) for key, value in self._mapping.items())
+            object.__setattr__(self, "_sections", sections)
+        return sections
+
+    def validator(self, max_errors=None):
+        """
+        Validator with the cerberus interface (validate, document and errors) for the current thread. The fast
+        engine stops after max_errors errors, codegen and cerberus always find all of them
+        """
+        if self._module is not None:
+            return GeneratedValidator(self._module)
+        if self._fast_node is not None:
+            return FastValidator(self._fast_node, max_errors)
+        return self._cerberus_validator()
+
+    def _cerberus_validator(self):
+        validator = getattr(self._local, "validator", None)
+        if validator is None:
+            validator = Validator(copy.deepcopy(self._schema))
+            self._local.validator = validator
+        return validator
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledSchema is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledSchema is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledSchema) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # Compiled again (once per process, it is cached) instead of pickling the validators
+        return compile_schema, (self._mapping, self._key[0])
+
+    def __repr__(self):
+        return "CompiledSchema({fields})".format(fields=", ".join(sorted(str(k) for k in self._mapping)))
+
+
+def schema_fingerprint(mapped_schema):
+    """Fingerprint of a mapped schema, a constructor field, a list of them or a CompiledSchema"""
+    return compile_schema(mapped_schema).fingerprint
+
+
+_compiled_schemas = LRUCache(maxsize=128)
+
+
+def compile_schema(mapped_schema, engine="auto"):
+    """
+    Compile the mapped schema. Structurally identical schemas get the same CompiledSchema instance.
+    """
+    if isinstance(mapped_schema, CompiledSchema):
+        return mapped_schema
+
+    mapping = normalize_mapping(mapped_schema)
+    key = (engine, _freeze(mapping))
+    compiled = _compiled_schemas.get(key)
+    if compiled is None:
+        compiled = _compiled_schemas.setdefault(key, CompiledSchema._from_normalized(mapping, key, engine))
+    return compiled
@@ -0,0 +1,120 @@
+"""
+Validate the top level sections of a configuration separately.
+
+Every section (database, persistence, queue...) is validated with its own CompiledSchema, in a thread pool,
+and its result is cached by the content of the section. Loading a document where only one section changed
+validates only that section again.
+"""
+import copy
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .cache import LRUCache
+from .lazy import LazyNode
+from .nodes import dict_to_namedtuple, namedtuple_class
+from .validator import UNKNOWN_FIELD, sort_errors
+
+MODES = ("namedtuple", "dict", "lazy")
+
+_MISSING = object()
+
+# (section schema, mode, digest of the section) -> (value, errors)
+_results = LRUCache(maxsize=256)
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(workers):
+    """Thread pools are shared by all the calls with the same number of workers"""
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            _executors[workers] = executor
+        return executor
+
+
+def _digest(value):
+    # repr is fast and tells apart 1, 1.0, True and "1"
+    return hashlib.sha1(repr(value).encode("utf-8")).digest()
+
+
+def _build_value(value, name, mode):
+    if mode == "namedtuple":
+        if isinstance(value, dict):
+            return dict_to_namedtuple(value, name)
+        elif isinstance(value, list):
+            return [dict_to_namedtuple(i, name) if isinstance(i, dict) else i for i in value]
+    return value
+
+
+def _fresh(value):
+    """
+    Copy of the lists (and the dictionaries in them) of a cached namedtuple result, like the ones that
+    dict_to_namedtuple builds every time. The namedtuples without lists are immutable and shared
+    """
+    if isinstance(value, list):
+        return [_fresh(item) for item in value]
+    elif isinstance(value, tuple) and hasattr(value, "_fields"):
+        values = [_fresh(item) for item in value]
+        if all(new is old for new, old in zip(values, value)):
+            return value
+        return value._make(values)
+    elif isinstance(value, dict):
+        return copy.deepcopy(value)
+    return value
+
+
+def _validate_section(section_schema, name, value, mode):
+    """(value, errors) of the section. The value is _MISSING if the section is not in the document"""
+    key = (section_schema, mode, _digest(value) if value is not _MISSING else None)
+    result = _results.get(key)
+    if result is None:
+        v = section_schema.validator()
+        if v.validate({name: value} if value is not _MISSING else {}):
+            result = (_build_value(v.document[name], name, mode) if name in v.document else _MISSING, None)
+        else:
+            result = (_MISSING, v.errors[name])
+        result = _results.setdefault(key, result)
+    if result[0] is not _MISSING:
+        # Every caller gets its own dictionaries and lists
+        if mode == "dict":
+            return copy.deepcopy(result[0]), None
+        elif mode == "namedtuple":
+            return _fresh(result[0]), None
+    return result
+
+
+def build_sections(schema, document, mode="namedtuple", workers=None):
+    """
+    Validate every section of the document with its own schema. Returns the configuration and the errors, in
+    the cerberus format, or None if it is valid
+    """
+    sections = schema.sections()
+    names = [name for name in document if name in sections]
+    names += [name for name in sections if name not in document]
+    values = [document.get(name, _MISSING) for name in names]
+    if workers and workers > 1 and len(names) > 1:
+        results = list(_executor(workers).map(_validate_section, [sections[name] for name in names], names,
+                                              values, [mode] * len(names)))
+    else:
+        results = [_validate_section(sections[name], name, value, mode) for name, value in zip(names, values)]
+
+    config = {}
+    errors = {}
+    for name, (value, section_errors) in zip(names, results):
+        if section_errors is not None:
+            errors[name] = section_errors
+        elif value is not _MISSING:
+            config[name] = value
+    for name in document:
+        if name not in sections:
+            errors[name] = [UNKNOWN_FIELD]
+    if errors:
+        return None, sort_errors(errors)
+
+    if mode == "namedtuple":
+        return namedtuple_class("", config.keys())(**config), None
+    elif mode == "lazy":
+        return LazyNode(config), None
+    return config, None
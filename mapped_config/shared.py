@@ -0,0 +1,346 @@
+"""
+Configurations shared by the processes of a pre-fork server.
+
+The master builds the configuration once and publishes the validated document to a file (in /dev/shm it is only
+in memory) with publish_config. The workers open it with SharedConfig: the file is mapped read-only, so all of
+them share the same memory, and the config is a lazy view (like build_config(..., lazy=True)) that decodes the
+nodes from the mapped file when they are accessed.
+
+Every publication has a generation. Publishing again writes a new file, replaces the old one and marks it as
+superseded, so SharedConfig.changed() is a read of the mapped memory and refresh() adopts the new generation
+without parsing nor validating anything.
+
+The encoding has offsets to every child: a node or a list item is found without decoding its siblings. Equal
+scalars (names, hosts, numbers) are stored once.
+"""
+import marshal
+import mmap
+import struct
+from collections.abc import Mapping, Sequence
+from .cache import write_atomic
+from .lazy import LazyNode, LazyList
+from .loader import build_config
+from .schema import compile_schema
+
+MAGIC = b"MCSHRD"
+VERSION = 1
+# Magic, version, generation, superseded by (0 while it is the latest), schema fingerprint, root offset
+_HEADER = struct.Struct("<6sBxQQ20sI")
+_SUPERSEDED_OFFSET = 16
+_SUPERSEDED = struct.Struct("<Q")
+_OFFSET = struct.Struct("<I")
+_LENGTH = struct.Struct("<I")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+_MAX_OFFSET = 2 ** 32 - 1
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+_MARSHAL_VERSION = 4
+# Tags of the values: a tag byte, then the length or count and the data
+NONE, TRUE, FALSE, INT, FLOAT, STR, BYTES, MAP, LIST, MARSHAL = (bytes([tag]) for tag in b"NTFidsbmlx")
+
+
+class SharedConfigError(ValueError):
+    """The file is not a shared configuration of this version, or it is for another schema"""
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.data = bytearray(_HEADER.size)
+        self._scalars = {}
+
+    def _append(self, chunk):
+        offset = len(self.data)
+        if offset > _MAX_OFFSET:
+            raise ValueError("The configuration is too big to share")
+        self.data += chunk
+        return offset
+
+    def value(self, value):
+        if isinstance(value, dict):
+            return self.map(value.items())
+        elif isinstance(value, LazyNode):
+            return self.map(value._asdict().items())
+        elif isinstance(value, tuple) and hasattr(value, "_fields"):
+            return self.map(zip(value._fields, value))
+        elif isinstance(value, (list, LazyList)):
+            return self.list(value)
+        try:
+            key = (type(value), value)
+            offset = self._scalars.get(key)
+        except TypeError:
+            return self._append(self.scalar(value))
+        if offset is None:
+            # The type is in the key so 1, 1.0 and True stay different
+            offset = self._scalars[key] = self._append(self.scalar(value))
+        return offset
+
+    def scalar(self, value):
+        value_type = type(value)
+        if value is None:
+            return NONE
+        elif value is True:
+            return TRUE
+        elif value is False:
+            return FALSE
+        elif value_type is int and _INT64[0] <= value <= _INT64[1]:
+            return INT + _INT.pack(value)
+        elif value_type is float:
+            return FLOAT + _FLOAT.pack(value)
+        elif value_type is str:
+            data = value.encode("utf-8", "surrogatepass")
+            return STR + _LENGTH.pack(len(data)) + data
+        elif value_type is bytes:
+            return BYTES + _LENGTH.pack(len(value)) + value
+        try:
+            # Big integers, tuples, sets...
+            data = marshal.dumps(value, _MARSHAL_VERSION)
+        except ValueError:
+            raise ValueError("The configuration has values that can not be shared: {value!r}".format(value=value))
+        return MARSHAL + _LENGTH.pack(len(data)) + data
+
+    def map(self, items):
+        # The children first, the node has their offsets
+        offsets = [(self.value(name), self.value(value)) for name, value in items]
+        return self._append(MAP + _LENGTH.pack(len(offsets)) +
+                            b"".join(_OFFSET.pack(name) + _OFFSET.pack(value) for name, value in offsets))
+
+    def list(self, items):
+        offsets = [self.value(item) for item in items]
+        return self._append(LIST + _LENGTH.pack(len(offsets)) + b"".join(_OFFSET.pack(offset) for offset in offsets))
+
+
+def encode(document, fingerprint=None, generation=1):
+    """Bytes of a shared configuration: the header and the document, a dictionary or namedtuples"""
+    encoder = _Encoder()
+    root = encoder.value(document)
+    fingerprint = bytes.fromhex(fingerprint) if fingerprint else b""
+    _HEADER.pack_into(encoder.data, 0, MAGIC, VERSION, generation, 0, fingerprint, root)
+    return bytes(encoder.data)
+
+
+def _decode(data, offset):
+    tag = data[offset:offset + 1]
+    if tag == STR:
+        length, = _LENGTH.unpack_from(data, offset + 1)
+        return data[offset + 5:offset + 5 + length].decode("utf-8", "surrogatepass")
+    elif tag == INT:
+        return _INT.unpack_from(data, offset + 1)[0]
+    elif tag == MAP:
+        return SharedMapping(data, offset)
+    elif tag == LIST:
+        return SharedSequence(data, offset)
+    elif tag == NONE:
+        return None
+    elif tag == TRUE:
+        return True
+    elif tag == FALSE:
+        return False
+    elif tag == FLOAT:
+        return _FLOAT.unpack_from(data, offset + 1)[0]
+    elif tag == BYTES:
+        length, = _LENGTH.unpack_from(data, offset + 1)
+        return data[offset + 5:offset + 5 + length]
+    elif tag == MARSHAL:
+        length, = _LENGTH.unpack_from(data, offset + 1)
+        return marshal.loads(data[offset + 5:offset + 5 + length])
+    raise SharedConfigError("Corrupted shared configuration")
+
+
+def decode(value):
+    """A copy of a shared value with dictionaries and lists"""
+    if isinstance(value, SharedMapping):
+        return dict((name, decode(child)) for name, child in value.items())
+    elif isinstance(value, SharedSequence):
+        return [decode(item) for item in value]
+    return value
+
+
+class SharedMapping(Mapping):
+    """Read-only dictionary over a node of the mapped file. The names are indexed the first time it is used"""
+    __slots__ = ("_data", "_offset", "_index")
+
+    def __init__(self, data, offset):
+        self._data = data
+        self._offset = offset
+        self._index = None
+
+    def _offsets(self):
+        index = self._index
+        if index is None:
+            data = self._data
+            length, = _LENGTH.unpack_from(data, self._offset + 1)
+            start = self._offset + 5
+            pairs = struct.unpack_from("<{n}I".format(n=length * 2), data, start)
+            index = self._index = dict((_decode(data, pairs[i]), pairs[i + 1]) for i in range(0, len(pairs), 2))
+        return index
+
+    def __getitem__(self, name):
+        return _decode(self._data, self._offsets()[name])
+
+    def __contains__(self, name):
+        return name in self._offsets()
+
+    def __iter__(self):
+        return iter(self._offsets())
+
+    def __len__(self):
+        return len(self._offsets())
+
+    def __repr__(self):
+        return repr(decode(self))
+
+
+class SharedSequence(Sequence):
+    """Read-only list over a list of the mapped file"""
+    __slots__ = ("_data", "_offset", "_length")
+
+    def __init__(self, data, offset):
+        self._data = data
+        self._offset = offset
+        self._length = _LENGTH.unpack_from(data, offset + 1)[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("list index out of range")
+        return _decode(self._data, _OFFSET.unpack_from(self._data, self._offset + 5 + 4 * index)[0])
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if isinstance(other, (SharedSequence, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(decode(self))
+
+
+def _wrap(value, path):
+    if isinstance(value, (dict, SharedMapping)):
+        return SharedNode(value, path)
+    elif isinstance(value, (list, SharedSequence)):
+        return SharedList(value, path)
+    return value
+
+
+class SharedNode(LazyNode):
+    """LazyNode over a node of the mapped file"""
+    __slots__ = ()
+    _wrap = staticmethod(_wrap)
+
+    def _replace(self, **kwargs):
+        return LazyNode(decode(self._data), self._path)._replace(**kwargs)
+
+    def __reduce__(self):
+        # Pickled as a plain lazy node, the mapped file is not sent
+        return LazyNode, (decode(self._data), self._path)
+
+
+class SharedList(LazyList):
+    """LazyList over a list of the mapped file"""
+    __slots__ = ()
+    _wrap = staticmethod(_wrap)
+
+    def __reduce__(self):
+        return LazyList, (decode(self._items), self._path)
+
+
+def _read_generation(config_file):
+    """Generation of an open shared configuration, 0 if it is not one"""
+    header = config_file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return 0
+    magic, version, generation = _HEADER.unpack(header)[:3]
+    return generation if magic == MAGIC and version == VERSION else 0
+
+
+def publish_config(path, document, mapped_schema=None):
+    """
+    Publish a validated document (build_config(..., as_named_tuple=False)) or a built configuration for the
+    processes that open path. The file is replaced at once and the previous one is marked as superseded.
+    Returns the generation, one more than the previous one
+    """
+    fingerprint = compile_schema(mapped_schema).fingerprint if mapped_schema is not None else None
+    try:
+        # Opened before replacing it, the workers that use it have to know
+        previous = open(path, "r+b")
+    except (IOError, OSError):
+        previous = None
+    try:
+        generation = (_read_generation(previous) if previous is not None else 0) + 1
+        data = encode(document, fingerprint, generation)
+        write_atomic(path, data)
+        if previous is not None and generation > 1:
+            previous.seek(_SUPERSEDED_OFFSET)
+            previous.write(_SUPERSEDED.pack(generation))
+    finally:
+        if previous is not None:
+            previous.close()
+    return generation
+
+
+def load_and_publish(path, loader, config_source, parameters_source, mapped_schema):
+    """Load and validate the config files and publish the document. Raises InvalidDataException like build_config"""
+    schema = compile_schema(mapped_schema)
+    document = build_config(schema, loader.load_config(config_source, parameters_source), as_named_tuple=False)
+    return publish_config(path, document, schema)
+
+
+class SharedConfig(object):
+    """
+    A published configuration mapped read-only. config is the lazy view of the current generation, it stays
+    valid (and unchanged) after refresh adopts a new one. With the schema, generations published for another
+    schema are rejected with SharedConfigError
+    """
+
+    def __init__(self, path, mapped_schema=None):
+        self.path = path
+        self.fingerprint = compile_schema(mapped_schema).fingerprint if mapped_schema is not None else None
+        self.generation = None
+        self.config = None
+        self._data = None
+        self._attach()
+
+    def _attach(self):
+        with open(self.path, "rb") as config_file:
+            try:
+                data = mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SharedConfigError("Empty shared configuration")
+        if len(data) < _HEADER.size:
+            raise SharedConfigError("Not a shared configuration")
+        magic, version, generation, _, fingerprint, root = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise SharedConfigError("Not a shared configuration of this version")
+        if self.fingerprint is not None and fingerprint != bytes.fromhex(self.fingerprint):
+            raise SharedConfigError("The configuration was published for another schema")
+        # The old mapping is closed when no view uses it
+        self._data = data
+        self.generation = generation
+        self.config = _wrap(_decode(data, root), "")
+
+    def changed(self):
+        """A newer generation was published. It only reads the mapped header"""
+        return _SUPERSEDED.unpack_from(self._data, _SUPERSEDED_OFFSET)[0] != 0
+
+    def refresh(self):
+        """Adopt the latest generation if there is a new one. Returns True if the config changed"""
+        if not self.changed():
+            return False
+        self._attach()
+        return True
+
+    def __repr__(self):
+        return "SharedConfig({path!r}, generation={generation})".format(path=self.path, generation=self.generation)
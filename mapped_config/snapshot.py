@@ -0,0 +1,183 @@
+"""
+Snapshots of built configurations, to start new processes without parsing and validating the config files.
+
+A snapshot stores the validated document (marshal) with the fingerprint of the schema, a digest of the config
+and parameters files and of the environment variables they use. Reading it maps the file and only builds the
+namedtuples; if the schema, the files or the environment changed it is rejected with StaleSnapshot.
+
+Build them at deploy time with:
+
+    python -m mapped_config.snapshot build --config config.yml --parameters parameters.yml \\
+        --schema myapp.modules:DatabaseManager.config_mapping --output config.snapshot
+"""
+import argparse
+import hashlib
+import importlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+from .cache import environment_digest, write_atomic
+from .lazy import LazyNode
+from .loader import YmlLoader, JsonLoader, build_config
+from .nodes import dict_to_namedtuple
+from .schema import compile_schema
+
+MAGIC = b"MCSNAP"
+VERSION = 1
+# Magic, version and length of the header
+_PREFIX = struct.Struct("<6sBI")
+# marshal format version. marshal is only guaranteed to read what the same Python version wrote, the header has
+# its cache tag (cpython-311...) and the snapshots of other versions are stale
+_MARSHAL_VERSION = 4
+
+
+class StaleSnapshot(ValueError):
+    """The snapshot does not match the schema, the files or the environment (or it is not a snapshot)"""
+
+
+def file_digest(path):
+    """sha1 of the content of the file, None if it does not exist (the parameters file is optional)"""
+    try:
+        with open(path, "rb") as source:
+            return hashlib.sha1(source.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def _sources(config_source, parameters_source):
+    return [(os.path.abspath(path), file_digest(path)) for path in (config_source, parameters_source)]
+
+
+def write_snapshot(path, loader, config_source, parameters_source, mapped_schema):
+    """Load, validate and store the configuration. Raises InvalidDataException like build_config"""
+    schema = compile_schema(mapped_schema)
+    # Digest the files before loading, a change while loading makes the snapshot stale instead of wrong
+    sources = _sources(config_source, parameters_source)
+    names = loader.placeholder_names(config_source)
+    document = build_config(schema, loader.load_config(config_source, parameters_source), as_named_tuple=False)
+    header = {
+        "python": sys.implementation.cache_tag,
+        "schema": schema.fingerprint,
+        "sources": sources,
+        "environment": [sorted(names) if names is not None else None, environment_digest(names)],
+    }
+    header_data = marshal.dumps(header, _MARSHAL_VERSION)
+    try:
+        body = marshal.dumps(document, _MARSHAL_VERSION)
+    except ValueError:
+        raise ValueError("The configuration has values that can not be stored in a snapshot")
+
+    write_atomic(path, _PREFIX.pack(MAGIC, VERSION, len(header_data)) + header_data + body)
+    return header
+
+
+def _check(header, schema, config_source, parameters_source):
+    if header.get("python") != sys.implementation.cache_tag:
+        raise StaleSnapshot("The snapshot was written by another Python version")
+    if header["schema"] != schema.fingerprint:
+        raise StaleSnapshot("The schema changed")
+    if config_source is not None:
+        if header["sources"] != _sources(config_source, parameters_source):
+            raise StaleSnapshot("The config or parameters file changed")
+    names, digest = header["environment"]
+    if environment_digest(names) != digest:
+        raise StaleSnapshot("The environment variables used by the config changed")
+
+
+def read_snapshot(path, mapped_schema, config_source=None, parameters_source=None, as_named_tuple=True,
+                  lazy=False):
+    """
+    The configuration stored in the snapshot, without parsing nor validating. With the sources, their digests
+    are checked too (without them the files are not read at all). Raises StaleSnapshot if it does not match
+    """
+    schema = compile_schema(mapped_schema)
+    with open(path, "rb") as snapshot:
+        try:
+            data = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise StaleSnapshot("Empty snapshot")
+    try:
+        view = memoryview(data)
+        try:
+            if len(data) < _PREFIX.size:
+                raise StaleSnapshot("Not a snapshot")
+            magic, version, header_length = _PREFIX.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                raise StaleSnapshot("Not a snapshot of this version")
+            header_end = _PREFIX.size + header_length
+            try:
+                header = marshal.loads(view[_PREFIX.size:header_end])
+                _check(header, schema, config_source, parameters_source)
+                document = marshal.loads(view[header_end:])
+            except StaleSnapshot:
+                raise
+            except (EOFError, ValueError, TypeError, KeyError):
+                raise StaleSnapshot("Corrupted snapshot")
+        finally:
+            view.release()
+    finally:
+        data.close()
+
+    if as_named_tuple and lazy:
+        return LazyNode(document)
+    elif as_named_tuple:
+        return dict_to_namedtuple(document)
+    return document
+
+
+def load_with_snapshot(path, loader, config_source, parameters_source, mapped_schema, as_named_tuple=True,
+                       lazy=False):
+    """Read the snapshot, or build the configuration and write the snapshot if it is missing or stale"""
+    try:
+        return read_snapshot(path, mapped_schema, config_source, parameters_source, as_named_tuple, lazy)
+    except (StaleSnapshot, IOError, OSError):
+        write_snapshot(path, loader, config_source, parameters_source, mapped_schema)
+        return read_snapshot(path, mapped_schema, None, None, as_named_tuple, lazy)
+
+
+def import_mapping(reference):
+    """The object at module:attribute.attribute, like myapp.modules:DatabaseManager.config_mapping"""
+    module_name, _, attributes = reference.partition(":")
+    value = importlib.import_module(module_name)
+    for attribute in filter(None, attributes.split(".")):
+        value = getattr(value, attribute)
+    return value
+
+
+def _loader(config_source, loader_format):
+    loader_format = loader_format or ("json" if config_source.lower().endswith(".json") else "yml")
+    return JsonLoader() if loader_format == "json" else YmlLoader()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mapped-config-snapshot", description="Build and check config snapshots")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    for command in ("build", "check"):
+        command_parser = commands.add_parser(command)
+        command_parser.add_argument("--config", required=True, help="Config file")
+        command_parser.add_argument("--parameters", required=True, help="Parameters file")
+        command_parser.add_argument("--schema", required=True, action="append",
+                                    help="module:attribute of a mapping, can be repeated for every module")
+        command_parser.add_argument("--output", required=True, help="Snapshot file")
+        command_parser.add_argument("--format", choices=["yml", "json"], help="By default from the extension")
+    args = parser.parse_args(argv)
+
+    mappings = [import_mapping(reference) for reference in args.schema]
+    if args.command == "build":
+        write_snapshot(args.output, _loader(args.config, args.format), args.config, args.parameters, mappings)
+        print("Snapshot written to {path}".format(path=args.output))
+        return 0
+    try:
+        read_snapshot(args.output, mappings, args.config, args.parameters, as_named_tuple=False)
+    except (StaleSnapshot, IOError, OSError) as e:
+        print("Snapshot {path} is not valid: {error}".format(path=args.output, error=e))
+        return 1
+    print("Snapshot {path} is valid".format(path=args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
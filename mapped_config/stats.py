@@ -0,0 +1,99 @@
+"""
+Timings and sizes of every stage of loading and building a configuration.
+
+Give a LoadStats to a loader (YmlLoader(stats=stats)) or to build_config(..., stats=stats). Every stage
+(read, parameters, substitute, parse, cache, compile, validate, namedtuple...) records its duration and, when it
+makes sense, bytes, nodes, placeholders, hits and misses. Without stats nothing is measured.
+
+Hooks get every measurement as it happens, LoggingHook emits them as structured log records and
+write_prometheus writes the totals in the Prometheus text format (for the node exporter textfile collector).
+"""
+import logging
+import threading
+import time
+from .cache import write_atomic
+
+clock = time.perf_counter
+
+
+def count_nodes(value):
+    """Dictionaries, lists and values of a document"""
+    if isinstance(value, dict):
+        return 1 + sum(count_nodes(child) for child in value.values())
+    elif isinstance(value, (list, tuple)):
+        return 1 + sum(count_nodes(child) for child in value)
+    return 1
+
+
+class LoadStats(object):
+    """Totals by stage: calls, seconds and the sum of every other measurement"""
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """hook(stage, measurements) is called with every measurement, seconds included"""
+        self.hooks.append(hook)
+
+    def record(self, stage, seconds, **measurements):
+        with self._lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                totals = self.stages[stage] = {"calls": 0, "seconds": 0.0}
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            for name, value in measurements.items():
+                totals[name] = totals.get(name, 0) + value
+        if self.hooks:
+            measurements["seconds"] = seconds
+            for hook in self.hooks:
+                hook(stage, measurements)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+
+    def __repr__(self):
+        return "LoadStats({stages})".format(stages=", ".join(
+            "{stage}={seconds:.6f}s".format(stage=stage, seconds=totals["seconds"])
+            for stage, totals in sorted(self.stages.items())))
+
+
+class LoggingHook(object):
+    """Log every measurement, the values are in the extra of the record (config_stage and config_<name>)"""
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("mapped_config.stats")
+        self.level = level
+
+    def __call__(self, stage, measurements):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        extra = dict(("config_{name}".format(name=name), value) for name, value in measurements.items())
+        extra["config_stage"] = stage
+        self.logger.log(self.level, "Config stage %s: %s", stage, ", ".join(
+            "{name}={value}".format(name=name, value=value) for name, value in sorted(measurements.items())),
+            extra=extra)
+
+
+def prometheus_text(stats, prefix="mapped_config"):
+    """The totals of stats in the Prometheus text format"""
+    with stats._lock:
+        stages = dict((stage, dict(totals)) for stage, totals in stats.stages.items())
+    names = sorted(set(name for totals in stages.values() for name in totals))
+    lines = []
+    for name in names:
+        metric = "{prefix}_stage_{name}_total".format(prefix=prefix, name=name)
+        lines.append("# TYPE {metric} counter".format(metric=metric))
+        for stage in sorted(stages):
+            if name in stages[stage]:
+                lines.append('{metric}{{stage="{stage}"}} {value}'.format(
+                    metric=metric, stage=stage, value=repr(float(stages[stage][name]))))
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(stats, path, prefix="mapped_config"):
+    """Write prometheus_text to path, replacing it at once so the collector never reads half a file"""
+    write_atomic(path, prometheus_text(stats, prefix))
@@ -0,0 +1,180 @@
+"""
+Build YAML configurations in one pass from the parser events.
+
+The YmlLoader replaces {parameter} placeholders in the raw text before parsing it. For big files that means
+holding the raw text, the replaced text and the parsed document at the same time. Here the file is read in
+chunks by the parser and the parameters are replaced in every scalar as it is emitted.
+
+A placeholder used as a whole value (host: {database_host}) is, for the parser, a flow mapping with a single
+key and no value. Those mappings are replaced by the parameter value parsed as YAML, which gives the same
+result as replacing the text. Flow mappings with real values are kept as mappings.
+"""
+import copy
+import string
+import yaml
+from yaml.events import (AliasEvent, DocumentEndEvent, DocumentStartEvent, MappingEndEvent, MappingStartEvent,
+                         ScalarEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent, StreamStartEvent)
+from yaml.nodes import ScalarNode
+
+MERGE_TAG = u"tag:yaml.org,2002:merge"
+# Key of the << merge entries
+_MERGE = object()
+_formatter = string.Formatter()
+
+
+class _Frame(object):
+    __slots__ = ("container", "key", "has_key", "merges", "placeholder")
+
+    def __init__(self, container, placeholder=False):
+        self.container = container
+        self.key = None
+        self.has_key = False
+        self.merges = []
+        # Raw key of a flow mapping that can be a {placeholder}
+        self.placeholder = None if placeholder else False
+
+
+class StreamBuilder(object):
+    """
+    Build the document from the events of loader. parameters is the mapping used to format the scalars and
+    the placeholders, like in str.format. It only needs __getitem__, so parameters can be resolved on demand
+    """
+
+    def __init__(self, loader, parameters):
+        self.loader = loader
+        self.parameters = parameters
+        self.anchors = {}
+        self._placeholders = {}
+
+    def load(self):
+        """Return the document, or None if the stream is empty"""
+        document = None
+        for _, value in self._events(sections=False):
+            document = value
+        return document
+
+    def sections(self):
+        """Yield the (key, value) pairs of the root mapping as soon as every value is complete"""
+        return self._events(sections=True)
+
+    def _format(self, value):
+        if "{" in value or "}" in value:
+            return _formatter.vformat(value, (), self.parameters)
+        return value
+
+    def _placeholder(self, name):
+        """Value of a whole value placeholder, parsed as if it was replaced in the text"""
+        if name not in self._placeholders:
+            text = _formatter.vformat("{" + name + "}", (), self.parameters)
+            self._placeholders[name] = yaml.load(text, Loader=type(self.loader))
+        value = self._placeholders[name]
+        # Every occurrence gets its own list or dict
+        return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+
+    def _scalar(self, event, value):
+        tag = event.tag
+        if tag is None or tag == u"!":
+            tag = self.loader.resolve(ScalarNode, value, event.implicit)
+        if tag == MERGE_TAG:
+            return _MERGE
+        node = ScalarNode(tag, value, event.start_mark, event.end_mark, style=event.style)
+        constructors = self.loader.yaml_constructors
+        constructor = constructors.get(tag, constructors.get(None))
+        return constructor(self.loader, node)
+
+    def _events(self, sections):
+        loader = self.loader
+        stack = []
+        documents = 0
+
+        while not loader.check_event(StreamEndEvent):
+            event = loader.get_event()
+            completed = None
+
+            if isinstance(event, (StreamStartEvent, DocumentEndEvent)):
+                continue
+            elif isinstance(event, DocumentStartEvent):
+                documents += 1
+                if documents > 1:
+                    raise yaml.composer.ComposerError("expected a single document in the stream", None,
+                                                      "but found another document", event.start_mark)
+                continue
+            elif isinstance(event, ScalarEvent):
+                top = stack[-1] if stack else None
+                if top is not None and top.placeholder is not False:
+                    plain = event.implicit[0] and event.anchor is None and event.tag is None
+                    if not top.has_key and top.placeholder is None and plain:
+                        top.placeholder = event.value
+                    elif not (top.has_key and plain and event.value == u""):
+                        top.placeholder = False
+                completed = self._scalar(event, self._format(event.value))
+                if event.anchor is not None:
+                    self.anchors[event.anchor] = completed
+            elif isinstance(event, AliasEvent):
+                if event.anchor not in self.anchors:
+                    raise yaml.composer.ComposerError(None, None, "found undefined alias %r" % event.anchor,
+                                                      event.start_mark)
+                self._not_placeholder(stack)
+                completed = self.anchors[event.anchor]
+            elif isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+                self._not_placeholder(stack)
+                if isinstance(event, MappingStartEvent):
+                    frame = _Frame({}, placeholder=bool(event.flow_style))
+                else:
+                    frame = _Frame([])
+                if event.anchor is not None:
+                    self.anchors[event.anchor] = frame.container
+                stack.append(frame)
+                continue
+            elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+                frame = stack.pop()
+                completed = frame.container
+                if frame.placeholder not in (None, False) and len(completed) == 1:
+                    completed = self._placeholder(frame.placeholder)
+                for merged in frame.merges:
+                    for key, value in merged.items():
+                        completed.setdefault(key, value)
+
+            if not stack:
+                if not sections:
+                    yield None, completed
+                continue
+
+            top = stack[-1]
+            if isinstance(top.container, list):
+                top.container.append(completed)
+            elif not top.has_key:
+                top.key = completed
+                top.has_key = True
+            else:
+                if top.key is _MERGE:
+                    top.merges.extend(completed if isinstance(completed, list) else [completed])
+                elif sections and len(stack) == 1:
+                    yield top.key, completed
+                else:
+                    top.container[top.key] = completed
+                top.has_key = False
+
+    @staticmethod
+    def _not_placeholder(stack):
+        if stack and stack[-1].placeholder is not False:
+            stack[-1].placeholder = False
+
+
+def load(stream, parameters, loader_class=yaml.SafeLoader):
+    """Load the YAML stream replacing the parameters in one pass"""
+    loader = loader_class(stream)
+    try:
+        return StreamBuilder(loader, parameters).load()
+    finally:
+        loader.dispose()
+
+
+def iter_sections(stream, parameters, loader_class=yaml.SafeLoader):
+    """Yield the (key, value) pairs of the root mapping one by one, without keeping the whole document"""
+    loader = loader_class(stream)
+    try:
+        for key, value in StreamBuilder(loader, parameters).sections():
+            yield key, value
+    finally:
+        loader.dispose()
@@ -0,0 +1,52 @@
+import json
+import re
+import six
+from .cache import LRUCache, file_key
+
+
+_placeholder = re.compile(r"%([a-zA-Z_0-9]*)%")
+# Strings that are already valid JSON values: numbers, booleans and null
+_json_literal = re.compile(r"^(-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?|true|false|null)$")
+_encode_string = json.encoder.encode_basestring
+
+
+def json_value(value):
+    """JSON text of a parameter. Strings that look like numbers, booleans or null are not quoted"""
+    if isinstance(value, six.string_types):
+        return value if _json_literal.match(value) else _encode_string(value)
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, six.integer_types):
+        return str(value)
+    return json.dumps(value)
+
+
+class JsonTemplate(object):
+    """
+    A JSON config with %name% placeholders, split once into literal segments and placeholder slots
+    """
+    __slots__ = ("segments", "names")
+
+    def __init__(self, text):
+        # Literals are in the even positions and placeholder names in the odd ones
+        self.segments = _placeholder.split(text)
+        self.names = frozenset(self.segments[1::2])
+
+    def render(self, values):
+        """Replace the placeholders with values, a dictionary of already encoded JSON text"""
+        parts = list(self.segments)
+        parts[1::2] = [values[name] for name in self.segments[1::2]]
+        return "".join(parts)
+
+    @classmethod
+    def from_file(cls, path):
+        """Template of the file, cached while the file does not change"""
+        key = file_key(path)
+        template = _templates.get(key)
+        if template is None:
+            with open(path) as template_file:
+                template = _templates.setdefault(key, cls(template_file.read()))
+        return template
+
+
+_templates = LRUCache(maxsize=64)
@@ -0,0 +1,100 @@
+from mapped_config import aio, loader
+from mapped_config.loader import InvalidDataException, MissingParametersException
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+import unittest
+
+
+class SlowLoader(loader.YmlLoader):
+    """Only load_parameters and load_config, like third party loaders"""
+
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    def load_config(self, config_source, parameters_source):
+        self.release.wait(5)
+        return super().load_config(config_source, parameters_source)
+
+class TestAsyncLoader(unittest.TestCase):
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    example_path = os.path.join(dir_path, "..", "example")
+    schema = {"database": {"host": None, "username": "admin", "static": None}}
+
+    def yml_sources(self):
+        return os.path.join(self.dir_path, "config.yml"), os.path.join(self.dir_path, "parameters.yml")
+
+    def test_yml(self):
+        yml_loader = loader.YmlLoader()
+        expected = yml_loader.load_config(*self.yml_sources())
+        self.assertEqual(asyncio.run(yml_loader.aload_config(*self.yml_sources())), expected)
+        streaming_loader = loader.YmlLoader(streaming=True)
+        self.assertEqual(asyncio.run(streaming_loader.aload_config(*self.yml_sources())), expected)
+
+    def test_json(self):
+        json_loader = loader.JsonLoader()
+        sources = (os.path.join(self.example_path, "example_simple_config.json"),
+                   os.path.join(self.example_path, "example_simple_parameters.json"))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            config = asyncio.run(json_loader.aload_config(*sources, executor=executor))
+        self.assertEqual(config, json_loader.load_config(*sources))
+
+        with self.assertRaises(MissingParametersException):
+            asyncio.run(json_loader.aload_config(sources[0], os.path.join(self.example_path, "none.json")))
+
+    def test_build(self):
+        yml_loader = loader.YmlLoader()
+
+        async def load_and_build():
+            data = await yml_loader.aload_config(*self.yml_sources())
+            return await yml_loader.abuild_config(data, [self.schema], lazy=True)
+
+        config = asyncio.run(load_and_build())
+        self.assertEqual(config.database.host, "localhost")
+        self.assertEqual(config.database.username, "root")
+        with self.assertRaises(InvalidDataException):
+            asyncio.run(yml_loader.abuild_config({"database": {"host": 1}}, self.schema))
+
+    def test_timeout(self):
+        release = threading.Event()
+
+        async def load():
+            try:
+                await SlowLoader(release).aload_config(*self.yml_sources(), timeout=0.05)
+            finally:
+                release.set()
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(load())
+
+    def test_cancel(self):
+        release = threading.Event()
+
+        async def cancel():
+            task = asyncio.ensure_future(SlowLoader(release).aload_config(*self.yml_sources()))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+            finally:
+                release.set()
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel())
+
+    def test_subclass(self):
+        release = threading.Event()
+        release.set()
+        config = asyncio.run(SlowLoader(release).aload_config(*self.yml_sources()))
+        self.assertEqual(config, loader.YmlLoader().load_config(*self.yml_sources()))
+        # The files are read at the same time only if load_config is the one that calls load_config_text
+        self.assertFalse(aio._loads_text(SlowLoader(release)))
+        self.assertTrue(aio._loads_text(loader.YmlLoader()))
+        self.assertFalse(aio._loads_text(loader.YmlLoader(streaming=True)))
+        self.assertTrue(aio._loads_text(loader.JsonLoader()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from mapped_config.batch import build_configs, BatchResult
+from mapped_config.loader import build_config
+from mapped_config.schema import compile_schema
+import pickle
+import unittest
+
+
+class TestBuildConfigs(unittest.TestCase):
+    schema = {"tenant": None, "database": {"hostname": "localhost", "port": 3306}, "flags": [{"name": None}]}
+
+    def documents(self, count=50):
+        documents = []
+        for i in range(count):
+            if i % 7 == 3:
+                documents.append({"tenant": "t{i}".format(i=i), "database": {"port": "wrong"}})
+            else:
+                documents.append({"tenant": "t{i}".format(i=i), "flags": [{"name": "f{i}".format(i=i)}]})
+        return documents
+
+    def check(self, executor, ordered):
+        documents = self.documents()
+        results = list(build_configs(self.schema, documents, workers=2, executor=executor, ordered=ordered,
+                                     chunksize=4))
+        if ordered:
+            self.assertEqual([result.index for result in results], list(range(len(documents))))
+        else:
+            results.sort(key=lambda result: result.index)
+            self.assertEqual([result.index for result in results], list(range(len(documents))))
+
+        for index, result in enumerate(results):
+            if index % 7 == 3:
+                self.assertFalse(result.valid)
+                self.assertIsNone(result.config)
+                self.assertEqual(result.errors, ["Field [database:port] must be of integer type"])
+            else:
+                self.assertTrue(result.valid)
+                self.assertEqual(result.config, build_config(self.schema, dict(documents[index])))
+                self.assertIs(type(result.config.flags[0]), type(build_config(self.schema, documents[index]).flags[0]))
+
+    def test_process_ordered(self):
+        self.check("process", ordered=True)
+
+    def test_process_as_completed(self):
+        self.check("process", ordered=False)
+
+    def test_thread_ordered(self):
+        self.check("thread", ordered=True)
+
+    def test_thread_as_completed(self):
+        self.check("thread", ordered=False)
+
+    def test_generator_and_lazy(self):
+        documents = (document for document in self.documents(10))
+        results = list(build_configs(self.schema, documents, workers=2, executor="process", lazy=True))
+        self.assertEqual(results[0].config.flags[0].name, "f0")
+        self.assertEqual(results[0].config.database.port, 3306)
+
+    def test_not_a_document(self):
+        results = list(build_configs(self.schema, [{"tenant": "a"}, ["wrong"]], workers=1, executor="thread"))
+        self.assertTrue(results[0].valid)
+        self.assertFalse(results[1].valid)
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            list(build_configs(self.schema, [], executor="cluster"))
+
+    def test_pickle(self):
+        compiled = compile_schema(self.schema)
+        self.assertIs(pickle.loads(pickle.dumps(compiled)), compiled)
+        config = build_config(compiled, {"tenant": "a", "flags": [{"name": "b"}]})
+        copied = pickle.loads(pickle.dumps(config))
+        self.assertEqual(copied, config)
+        self.assertIs(type(copied), type(config))
+        self.assertIs(type(copied.flags[0]), type(config.flags[0]))
+        result = BatchResult(0, config, None)
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+from mapped_config import codegen
+from mapped_config.codegen import GeneratedValidator, generate_source, load_module, set_cache_directory
+from mapped_config.loader import format_errors, build_config, InvalidDataException
+from mapped_config.schema import mapped_to_cerberus, compile_schema, schema_fingerprint
+from mapped_config.test.test_validator import schemas, documents, cerberus_result, random_schema, random_document
+import copy
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+
+def codegen_result(schema, document):
+    validator = GeneratedValidator(load_module(schema, "test-" + schema_fingerprint(schema)))
+    valid = validator.validate(document)
+    return valid, validator.document if valid else None, format_errors(validator.errors)
+
+
+def built(mapped, document, engine):
+    try:
+        return build_config(compile_schema(mapped, engine), copy.deepcopy(document))
+    except InvalidDataException as e:
+        return e.errors
+
+
+def structure(config):
+    """Classes and values of a config, namedtuples with the same values but other fields are different"""
+    if isinstance(config, tuple) and hasattr(config, "_fields"):
+        return type(config), [(name, structure(value)) for name, value in zip(config._fields, config)]
+    elif isinstance(config, list):
+        return [structure(item) for item in config]
+    return type(config), config
+
+
+class TestCodegenParity(unittest.TestCase):
+
+    def test_parity(self):
+        for mapped in schemas:
+            schema = mapped_to_cerberus(mapped)
+            for document in documents:
+                self.assertEqual(cerberus_result(schema, document), codegen_result(schema, document),
+                                 "Different result for {s} {d}".format(s=mapped, d=document))
+
+    def test_random_parity(self):
+        rnd = random.Random(2468)
+        for _ in range(200):
+            mapped = random_schema(rnd)
+            schema = mapped_to_cerberus(mapped)
+            for _ in range(5):
+                document = random_document(rnd, mapped)
+                self.assertEqual(cerberus_result(schema, document), codegen_result(schema, document),
+                                 "Different result for {s} {d}".format(s=mapped, d=document))
+
+    def test_namedtuples(self):
+        rnd = random.Random(1357)
+        cases = [(mapped, document) for mapped in schemas for document in documents]
+        for _ in range(100):
+            mapped = random_schema(rnd)
+            cases += [(mapped, random_document(rnd, mapped)) for _ in range(5)]
+        for mapped, document in cases:
+            self.assertEqual(structure(built(mapped, document, "fast")), structure(built(mapped, document, "codegen")),
+                             "Different config for {s} {d}".format(s=mapped, d=document))
+
+    def test_defaults_not_shared(self):
+        mapped = {"hosts": ["a", "b"], "auth": {"users": {"type": "list", "default": [{"name": "root"}]}}}
+        schema = compile_schema(mapped, "codegen")
+        first = build_config(schema, {}, as_named_tuple=False)
+        first["hosts"].append("c")
+        first["auth"]["users"][0]["name"] = "other"
+        self.assertEqual(build_config(schema, {}, as_named_tuple=False),
+                         {"hosts": ["a", "b"], "auth": {"users": [{"name": "root"}]}})
+
+    def test_document_not_modified(self):
+        schema = compile_schema({"hosts": [{"ip": None, "port": 1}], "auth": {"user": "root"}}, "codegen")
+        document = {"hosts": [{"ip": "a"}]}
+        config = build_config(schema, document)
+        self.assertEqual(document, {"hosts": [{"ip": "a"}]})
+        self.assertEqual(config.hosts[0].port, 1)
+        self.assertEqual(config.auth.user, "root")
+
+
+class TestCodegenEngine(unittest.TestCase):
+
+    def test_engine(self):
+        schema = compile_schema({"number": 1}, "codegen")
+        self.assertEqual(schema.engine, "codegen")
+        self.assertEqual(build_config(schema, {"number": 2}).number, 2)
+        with self.assertRaises(InvalidDataException) as context:
+            build_config(schema, {"number": "2", "other": 1}, max_errors=1)
+        self.assertTrue(context.exception.truncated)
+        self.assertEqual(len(context.exception.errors), 1)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            compile_schema({"number": {"type": "integer", "min": 10}}, "codegen")
+
+    def test_sections(self):
+        schema = compile_schema({"queue": {"workers": 2}, "database": {"host": None}}, "codegen")
+        config = build_config(schema, {"queue": {}}, sections=["queue"])
+        self.assertEqual(config.queue.workers, 2)
+        self.assertEqual(build_config(schema, {"queue": {}, "database": {"host": "h"}}, workers=2).database.host, "h")
+
+    def test_source(self):
+        source, constants = generate_source(mapped_to_cerberus({"port": 1, "auth": {"user": None}}))
+        self.assertEqual(constants, {})
+        self.assertIn("def _validate", source)
+        compile(source, "<test>", "exec")
+
+
+class TestCodegenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        set_cache_directory(self.directory)
+
+    def tearDown(self):
+        set_cache_directory(None)
+        shutil.rmtree(self.directory)
+
+    def test_disk_cache(self):
+        schema = mapped_to_cerberus({"port": 1, "hosts": [{"ip": None}]})
+        fingerprint = "disk-" + schema_fingerprint({"port": 1, "hosts": [{"ip": None}]})
+        load_module(schema, fingerprint)
+        files = os.listdir(self.directory)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith(fingerprint))
+
+        # Another process: the code is read from the file instead of compiled
+        codegen._modules.clear()
+        compiled = []
+        codegen.compile = lambda *args: compiled.append(args) or compile(*args)
+        try:
+            module = load_module(schema, fingerprint)
+        finally:
+            del codegen.compile
+        self.assertEqual(compiled, [])
+        validator = GeneratedValidator(module)
+        self.assertTrue(validator.validate({"hosts": [{"ip": "a"}]}))
+        self.assertEqual(validator.to_namedtuple().hosts[0].ip, "a")
+
+    def test_constants_not_cached(self):
+        default = object()
+        schema = {"value": {"default": default, "nullable": True}}
+        load_module(schema, "constants-test")
+        self.assertEqual(os.listdir(self.directory), [])
+        validator = GeneratedValidator(load_module(schema, "constants-test"))
+        self.assertTrue(validator.validate({}))
+        self.assertIs(validator.document["value"], default)
+
+
+if __name__ == '__main__':
+    unittest.main()
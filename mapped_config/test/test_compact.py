@@ -0,0 +1,103 @@
+from mapped_config import nodes
+from mapped_config.loader import build_config
+from mapped_config.compact import ColumnarList, COLUMNAR_MIN_LENGTH, dict_to_compact
+from mapped_config.diff import diff, CHANGED
+from mapped_config.fingerprint import structural_digest
+from array import array
+import copy
+import pickle
+import unittest
+
+
+class TestCompact(unittest.TestCase):
+    mapping = {"inventory": {
+        "name": None,
+        "hosts": [{"name": None, "region": None, "port": 22, "weight": 1.0, "provider": {"name": None}}],
+        "tags": [""],
+    }}
+
+    def document(self, hosts=40):
+        return {"inventory": {
+            "name": "production",
+            # Strings made at runtime, like the parsed ones, are separate objects
+            "hosts": [{"name": "host{i}".format(i=i), "region": "eu-{n}".format(n=i % 2), "port": i,
+                       "provider": {"name": "".join(["a", "ws"])}} for i in range(hosts)],
+            "tags": ["".join(["we", "b"]), "".join(["w", "eb"])],
+        }}
+
+    def test_equal_to_namedtuples(self):
+        config = build_config(self.mapping, self.document(), compact=True)
+        plain = build_config(self.mapping, self.document())
+        self.assertEqual(config, plain)
+        self.assertEqual(structural_digest(config), structural_digest(plain))
+        self.assertEqual(config.inventory.hosts[3], plain.inventory.hosts[3])
+        self.assertEqual(config.inventory.hosts[-1].name, "host39")
+        self.assertEqual(config.inventory.hosts[1:3], plain.inventory.hosts[1:3])
+        self.assertEqual(list(config.inventory.hosts), plain.inventory.hosts)
+        self.assertEqual(type(config.inventory.hosts[0]), type(plain.inventory.hosts[0]))
+        with self.assertRaises(IndexError):
+            config.inventory.hosts[40]
+
+    def test_shared_values(self):
+        config = build_config(self.mapping, self.document(), compact=True)
+        hosts = config.inventory.hosts
+        self.assertIsInstance(hosts, ColumnarList)
+        self.assertIsInstance(hosts.column("port"), array)
+        self.assertIsInstance(hosts.column("weight"), array)
+        self.assertIs(hosts[0].region, hosts[2].region)
+        self.assertIs(hosts[0].provider, hosts[1].provider)
+        self.assertIs(config.inventory.tags[0], config.inventory.tags[1])
+
+    def test_plain_lists(self):
+        short = build_config(self.mapping, self.document(COLUMNAR_MIN_LENGTH - 1), compact=True)
+        self.assertIsInstance(short.inventory.hosts, list)
+
+        document = self.document()
+        document["inventory"]["hosts"][7] = dict(reversed(list(document["inventory"]["hosts"][7].items())))
+        config = build_config(self.mapping, copy.deepcopy(document), compact=True)
+        self.assertIsInstance(config.inventory.hosts, ColumnarList)
+        self.assertEqual(config, build_config(self.mapping, document))
+
+        items = [{"a": i} for i in range(COLUMNAR_MIN_LENGTH)] + [{"a": 1, "b": 2}]
+        self.assertIsInstance(dict_to_compact({"items": items}).items, list)
+
+    def test_pickle_and_diff(self):
+        config = build_config(self.mapping, self.document(), compact=True)
+        self.assertEqual(pickle.loads(pickle.dumps(config)), config)
+
+        document = self.document()
+        document["inventory"]["hosts"][4]["port"] = 2222
+        changed = build_config(self.mapping, document, compact=True)
+        self.assertEqual([(change.kind, change.path, change.new) for change in diff(config, changed)],
+                         [(CHANGED, "inventory:hosts:4:port", 2222)])
+
+    def test_classes_evicted(self):
+        config = build_config(self.mapping, self.document(), compact=True)
+        hosts = config.inventory.hosts
+        expected = hosts[3]
+        # Another document builds the same path with the keys in another order after the class was evicted
+        nodes._namedtuple_classes.clear()
+        fields = list(reversed(hosts._fields))
+        reversed_class = nodes.namedtuple_class("inventory.hosts", fields)
+        self.assertEqual(list(reversed_class._fields), fields)
+        self.assertEqual(hosts[3], expected)
+        self.assertEqual(list(hosts)[3], expected)
+        self.assertEqual(pickle.loads(pickle.dumps(hosts))[3]._asdict(), expected._asdict())
+
+        columns = ColumnarList("inventory.hosts", ["port", "name"], [[1, 2], ["a", "b"]])
+        columns_reversed = ColumnarList("inventory.hosts", ["name", "port"], [["a", "b"], [1, 2]])
+        self.assertEqual(columns[1]._asdict(), {"port": 2, "name": "b"})
+        self.assertEqual(columns_reversed[1]._asdict(), {"port": 2, "name": "b"})
+        self.assertEqual(columns.column("name"), ["a", "b"])
+
+    def test_options(self):
+        with self.assertRaises(ValueError):
+            build_config(self.mapping, self.document(), compact=True, lazy=True)
+        with self.assertRaises(ValueError):
+            build_config(self.mapping, self.document(), compact=True, hashed=True)
+        self.assertEqual(build_config(self.mapping, self.document(), compact=True, workers=2),
+                         build_config(self.mapping, self.document()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+from mapped_config.loader import build_config
+from mapped_config.diff import diff, changed_roots, Change, ADDED, REMOVED, CHANGED
+import copy
+import unittest
+
+
+class NotComparable(object):
+    def __eq__(self, other):
+        raise AssertionError("Unchanged subtree compared")
+
+    __hash__ = object.__hash__
+
+
+class NotWalkable(dict):
+    """Compared in C, walking it (like hashing it) reads the items"""
+    def items(self):
+        raise AssertionError("Unchanged subtree walked")
+
+
+class TestDiff(unittest.TestCase):
+    mapping = {
+        "database": {"default": None, "providers": [{"name": None, "hostname": "localhost"}]},
+        "queue": {"max_instances": 5, "workers": [{"name": None, "plans": []}]},
+    }
+    document = {
+        "database": {"default": "main", "providers": [{"name": "main"}, {"name": "replica", "hostname": "db2"}]},
+        "queue": {"workers": [{"name": "cpu", "plans": [1, 2]}]},
+    }
+
+    def build(self, changes=None, as_named_tuple=True):
+        document = copy.deepcopy(self.document)
+        if changes:
+            changes(document)
+        return build_config(self.mapping, document, as_named_tuple=as_named_tuple)
+
+    def test_no_changes(self):
+        self.assertEqual(list(diff(self.build(), self.build())), [])
+        self.assertEqual(list(diff(self.build(as_named_tuple=False), self.build(as_named_tuple=False))), [])
+
+    def check_changes(self, as_named_tuple):
+        def changes(document):
+            document["database"]["providers"][1]["hostname"] = "db3"
+            document["database"]["providers"].append({"name": "backup"})
+            document["queue"]["workers"][0]["plans"] = [1]
+            document["queue"]["max_instances"] = 6
+
+        old = self.build(as_named_tuple=as_named_tuple)
+        new = self.build(changes, as_named_tuple=as_named_tuple)
+        result = sorted(diff(old, new), key=lambda change: change.path)
+        self.assertEqual([(change.kind, change.path) for change in result], [
+            (CHANGED, "database:providers:1:hostname"),
+            (ADDED, "database:providers:2"),
+            (CHANGED, "queue:max_instances"),
+            (REMOVED, "queue:workers:0:plans:1"),
+        ])
+        self.assertEqual(result[0], Change(CHANGED, "database:providers:1:hostname", "db2", "db3"))
+        self.assertEqual(result[3].old, 2)
+        self.assertEqual(changed_roots(old, new), {"database", "queue"})
+
+    def test_changes_namedtuple(self):
+        self.check_changes(as_named_tuple=True)
+
+    def test_changes_dict(self):
+        self.check_changes(as_named_tuple=False)
+
+    def test_changes_lazy(self):
+        old = build_config(self.mapping, copy.deepcopy(self.document), lazy=True)
+        document = copy.deepcopy(self.document)
+        document["database"]["providers"][0]["hostname"] = "db1"
+        new = build_config(self.mapping, document, lazy=True)
+        self.assertEqual(list(diff(old, new)), [Change(CHANGED, "database:providers:0:hostname", "localhost", "db1")])
+
+    def test_keys(self):
+        old = {"a": 1, "b": {"c": 2}}
+        new = {"a": 1, "b": {"d": 2}, "e": [1]}
+        result = sorted(diff(old, new), key=lambda change: change.path)
+        self.assertEqual(result, [
+            Change(REMOVED, "b:c", 2, None),
+            Change(ADDED, "b:d", None, 2),
+            Change(ADDED, "e", None, [1]),
+        ])
+
+    def test_type_change(self):
+        self.assertEqual(list(diff({"a": {"b": 1}}, {"a": [1]})), [Change(CHANGED, "a", {"b": 1}, [1])])
+
+    def test_scalar_types(self):
+        # Equal for ==, but a change of an untyped field
+        self.assertEqual(list(diff(1, True)), [Change(CHANGED, "", 1, True)])
+        self.assertEqual(list(diff({"a": 1}, {"a": True})), [])
+        self.assertEqual(list(diff({"a": 1}, {"a": True}, strict=True)), [Change(CHANGED, "a", 1, True)])
+        self.assertEqual(list(diff({"a": {"b": [1]}}, {"a": {"b": [1.0]}}, strict=True)),
+                         [Change(CHANGED, "a:b:0", 1, 1.0)])
+        old = build_config({"a": {"b": None}}, {"a": {"b": 0}})
+        new = build_config({"a": {"b": None}}, {"a": {"b": False}})
+        self.assertEqual(list(diff(old, new, strict=True)), [Change(CHANGED, "a:b", 0, False)])
+        old = build_config({"a": {"b": None}}, {"a": {"b": 0}}, hashed=True)
+        new = build_config({"a": {"b": None}}, {"a": {"b": False}}, hashed=True)
+        self.assertEqual(list(diff(old, new)), [Change(CHANGED, "a:b", 0, False)])
+
+    def test_sequences(self):
+        # Tuples are walked like lists, but a namedtuple replaced by a list is a change of the whole value
+        self.assertEqual(list(diff({"a": (1, 2)}, {"a": (1, 3)})), [Change(CHANGED, "a:1", 2, 3)])
+        node = build_config({"a": {"b": 1}}, {})
+        self.assertEqual(list(diff({"a": node.a}, {"a": [1]})), [Change(CHANGED, "a", node.a, [1])])
+
+    def test_equal_subtrees_are_skipped(self):
+        old = {"same": NotWalkable(big=1), "value": 1}
+        new = {"same": NotWalkable(big=1), "value": 2}
+        self.assertEqual(list(diff(old, new)), [Change(CHANGED, "value", 1, 2)])
+
+    def test_shared_subtrees_are_skipped(self):
+        shared = {"big": NotComparable()}
+        old = {"shared": shared, "value": 1}
+        new = {"shared": shared, "value": 2}
+        self.assertEqual(list(diff(old, new)), [Change(CHANGED, "value", 1, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+from mapped_config.loader import build_config
+from mapped_config.constructor import MultiField, IntegerField, StringField
+from mapped_config.diff import diff, CHANGED
+from mapped_config.fingerprint import structural_digest
+from mapped_config.lazy import LazyNode
+from mapped_config.nodes import dict_to_namedtuple, dict_to_hashed_namedtuple
+from mapped_config.schema import schema_fingerprint
+import copy
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+
+
+class TestSchemaFingerprint(unittest.TestCase):
+    def test_equivalent_forms(self):
+        fingerprint = schema_fingerprint({"database": {"host": "localhost", "port": 5432}, "queue": {"name": None}})
+        self.assertEqual(schema_fingerprint(MultiField([
+            MultiField(name="database", fields=[StringField("host", "localhost"), IntegerField("port", 5432)]),
+            MultiField(name="queue", fields=[StringField("name")]),
+        ])), schema_fingerprint({"database": {"host": "localhost", "port": 5432},
+                                 "queue": {"name": {"type": "string", "required": True}}}))
+        self.assertEqual(schema_fingerprint([{"queue": {"name": None}}, {"database": {"port": 5432,
+                                                                                       "host": "localhost"}}]),
+                         fingerprint)
+        self.assertEqual(schema_fingerprint({"database": {"host": {"type": "string", "default": "localhost",
+                                                                   "required": False}, "port": 5432},
+                                             "queue": {"name": None}}), fingerprint)
+        # Rules with the default value of cerberus
+        self.assertEqual(schema_fingerprint({"a": "x"}), schema_fingerprint({"a": {"type": "string", "default": "x"}}))
+        self.assertEqual(schema_fingerprint({"a": [{"b": 1}]}),
+                         schema_fingerprint({"a": {"type": "list", "default": [], "required": False, "schema": {
+                             "type": "dict", "nullable": False, "default": {},
+                             "schema": {"b": {"type": "integer", "default": 1}}}}}))
+        self.assertNotEqual(schema_fingerprint({"a": "x"}), schema_fingerprint({"a": {"type": "string",
+                                                                                      "default": "x",
+                                                                                      "nullable": True}}))
+
+    def test_different_schemas(self):
+        fingerprints = set(schema_fingerprint(schema) for schema in [
+            {"port": 1}, {"port": 1.0}, {"port": True}, {"port": "1"}, {"port": None}, {"port": [1]}, {"port": {}}])
+        self.assertEqual(len(fingerprints), 7)
+
+    def test_stable_between_processes(self):
+        code = "from mapped_config.schema import schema_fingerprint; print(schema_fingerprint({0!r}))"
+        schema = {"database": {"host": "localhost", "port": 5432, "users": [{"name": None}]}, "debug": False}
+        env = dict(os.environ, PYTHONHASHSEED="123")
+        output = subprocess.check_output([sys.executable, "-c", code.format(schema)], env=env)
+        self.assertEqual(output.decode("ascii").strip(), schema_fingerprint(schema))
+
+
+class TestStructuralHash(unittest.TestCase):
+    mapping = {
+        "tenant": {"name": None, "database": {"host": "localhost", "port": 5432}, "users": [{"name": None}]},
+    }
+
+    def document(self, name, host="db"):
+        return {"tenant": {"name": name, "database": {"host": host}, "users": [{"name": "admin"}]}}
+
+    def test_digest(self):
+        document = {"a": {"b": [1, {"c": "d"}]}, "e": None}
+        digest = structural_digest(document)
+        self.assertEqual(structural_digest({"e": None, "a": {"b": [1, {"c": "d"}]}}), digest)
+        self.assertEqual(structural_digest(LazyNode(copy.deepcopy(document))), digest)
+        self.assertEqual(structural_digest(dict_to_namedtuple(copy.deepcopy(document))), digest)
+        self.assertEqual(structural_digest(dict_to_hashed_namedtuple(document)), digest)
+        self.assertNotEqual(structural_digest({"a": 1}), structural_digest({"a": True}))
+        self.assertNotEqual(structural_digest({"a": [1, 2]}), structural_digest({"a": [2, 1]}))
+        self.assertNotEqual(structural_digest({"a": "1"}), structural_digest({"a": 1}))
+
+    def test_hashed_config(self):
+        first = build_config(self.mapping, self.document("first"), hashed=True)
+        second = build_config(self.mapping, self.document("second"), hashed=True)
+        plain = build_config(self.mapping, self.document("first"))
+        # Equal values with different hashes: hashed nodes are only equal to hashed nodes
+        self.assertNotEqual(first, plain)
+        self.assertNotEqual(plain, first)
+        self.assertNotEqual(first.tenant.database, LazyNode(self.document("first")["tenant"]["database"]))
+        self.assertNotEqual(LazyNode(self.document("first")["tenant"]["database"]), first.tenant.database)
+        self.assertEqual(len({first.tenant.database, plain.tenant.database}), 2)
+        self.assertEqual(first.tenant.database.host, "db")
+        self.assertEqual(first.tenant.database, second.tenant.database)
+        self.assertNotEqual(first.tenant, second.tenant)
+        self.assertEqual(hash(first.tenant.database), hash(second.tenant.database))
+        self.assertEqual(len({first.tenant.database, second.tenant.database, first.tenant.users[0]}), 2)
+        self.assertEqual(first._digest, structural_digest(plain))
+
+        replaced = first.tenant._replace(name="second")
+        self.assertEqual(replaced, second.tenant)
+        self.assertEqual(pickle.loads(pickle.dumps(first)), first)
+        self.assertEqual(pickle.loads(pickle.dumps(first))._digest, first._digest)
+        self.assertEqual(build_config(self.mapping, self.document("first"), hashed=True, workers=2), first)
+
+        with self.assertRaises(ValueError):
+            build_config(self.mapping, self.document("first"), hashed=True, lazy=True)
+
+    def test_interned(self):
+        interned = {}
+        configs = [dict_to_hashed_namedtuple(build_config(self.mapping, self.document(name), as_named_tuple=False),
+                                             interned=interned) for name in ("a", "b", "c")]
+        self.assertIs(configs[0].tenant.database, configs[2].tenant.database)
+        self.assertIs(configs[0].tenant.users[0], configs[1].tenant.users[0])
+        self.assertIsNot(configs[0].tenant, configs[1].tenant)
+
+    def test_diff(self):
+        old = build_config(self.mapping, self.document("first"), hashed=True)
+        new = build_config(self.mapping, self.document("first", host="db2"), hashed=True)
+        self.assertEqual([(change.kind, change.path) for change in diff(old, new)],
+                         [(CHANGED, "tenant:database:host")])
+        self.assertEqual(list(diff(old, build_config(self.mapping, self.document("first"), hashed=True))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
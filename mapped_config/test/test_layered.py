@@ -0,0 +1,124 @@
+from mapped_config.layered import LayeredLoader, register_loader, LOADERS
+from mapped_config.loader import YmlLoader
+import copy
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class TestLayeredLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # JSON is valid YAML too, the YML and JSON layers can read it
+        self.parameters = self.write("parameters.json", json.dumps({"db_password": "secret"}))
+        self.base = self.write("base.yml", "database:\n  host: localhost\n  port: 3306\n  password: {db_password}\n"
+                                           "queue:\n  workers: [a, b]\n")
+        self.region = self.write("region.json", json.dumps({"database": {"host": "eu.db"}, "queue": {"workers": ["c"]},
+                                                            "region": "eu"}))
+        self.host = self.write("host.yml", "queue:\n  workers: [b, d]\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def sources(self):
+        return [self.base, self.region, self.host, {"database": {"port": 3307}}]
+
+    def test_merge_replace(self):
+        config, provenance = LayeredLoader().load_with_provenance(self.sources(), self.parameters)
+        self.assertEqual(config, {
+            "database": {"host": "eu.db", "port": 3307, "password": "secret"},
+            "queue": {"workers": ["b", "d"]},
+            "region": "eu",
+        })
+        self.assertEqual(provenance, {
+            "database:host": self.region,
+            "database:port": "overlay[3]",
+            "database:password": self.base,
+            "queue:workers": self.host,
+            "region": self.region,
+        })
+
+    def test_merge_lists(self):
+        appended, provenance = LayeredLoader(list_strategy="append").load_with_provenance(self.sources(),
+                                                                                          self.parameters)
+        self.assertEqual(appended["queue"]["workers"], ["a", "b", "c", "b", "d"])
+        self.assertEqual(provenance["queue:workers:2"], self.region)
+        self.assertEqual(provenance["queue:workers:4"], self.host)
+        unique = LayeredLoader(list_strategy="unique").load_config(self.sources(), self.parameters)
+        self.assertEqual(unique["queue"]["workers"], ["a", "b", "c", "d"])
+        with self.assertRaises(ValueError):
+            LayeredLoader(list_strategy="zip")
+
+    def test_replace_other_types(self):
+        config = LayeredLoader().load_config([self.base, {"database": None}, {"database": {"host": "h"}}],
+                                             self.parameters)
+        self.assertEqual(config["database"], {"host": "h"})
+
+    def test_only_changed_layers_are_parsed(self):
+        layered = LayeredLoader()
+        first = layered.load_config(self.sources(), self.parameters)
+        self.assertEqual(layered.layer_cache.misses, 3)
+
+        # Keep the size, only the modification time tells that it changed
+        time.sleep(0.01)
+        self.write("host.yml", "queue:\n  workers: [x, y]\n")
+        second = layered.load_config(self.sources(), self.parameters)
+        self.assertEqual(layered.layer_cache.misses, 4)
+        self.assertEqual(second["queue"]["workers"], ["x", "y"])
+        # Keys without changes are not merged again
+        self.assertIs(second["database"], first["database"])
+        self.assertIs(second["region"], first["region"])
+
+    def test_build(self):
+        layered = LayeredLoader()
+        config = layered.build_config(layered.load_config(self.sources(), self.parameters), {
+            "database": {"host": None, "port": None, "password": None},
+            "queue": {"workers": [], "size": 10},
+            "region": None,
+        })
+        self.assertEqual(config.queue.size, 10)
+        self.assertEqual(config.database.port, 3307)
+
+    def test_build_does_not_modify_cached_layers(self):
+        extras = self.write("extras.yml", "extras:\n  - a:\n      b: 1\n")
+        layered = LayeredLoader()
+        first = layered.load_config([self.base, extras], self.parameters)
+        expected = copy.deepcopy(first)
+        schema = {"database": {"host": None, "port": None, "password": None}, "queue": {"workers": []}, "extras": []}
+        self.assertEqual(layered.build_config(first, schema).extras[0].a.b, 1)
+        self.assertEqual(layered.load_config([self.base, extras], self.parameters), expected)
+
+    def test_loaders(self):
+        with self.assertRaises(ValueError):
+            LayeredLoader().load_config([self.write("config.ini", "[a]")], self.parameters)
+
+        class IniLoader(YmlLoader):
+            def load_config(self, config_source, parameters_source):
+                return {"ini": True}
+
+        register_loader(".INI", IniLoader)
+        try:
+            self.assertEqual(LayeredLoader().load_config([self.write("config.ini", "[a]")], self.parameters),
+                             {"ini": True})
+        finally:
+            del LOADERS[".ini"]
+
+        streaming = YmlLoader(streaming=True)
+        layered = LayeredLoader(loaders={".yml": streaming})
+        self.assertIs(layered.loader_for(self.base), streaming)
+        self.assertEqual(layered.load_config(self.sources(), self.parameters),
+                         LayeredLoader().load_config(self.sources(), self.parameters))
+
+
+if __name__ == '__main__':
+    unittest.main()
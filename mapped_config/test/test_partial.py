@@ -0,0 +1,143 @@
+from mapped_config import loader
+from mapped_config.loader import build_config, MissingParametersException, InvalidDataException
+from mapped_config.partial import selector_tree, split_yaml, split_json
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+YML_CONFIG = """# Services
+database:
+  password: {database_password}
+  providers:
+    - name: main
+      hostname: {database_host}
+
+  timeout: 5
+queue:
+  name: {queue_name}
+  # Comments and blank lines stay in the section
+
+  workers: 4
+debug: true
+"""
+
+JSON_CONFIG = """{
+  "database": {"password": %database_password%, "providers": [{"name": "main", "hostname": %database_host%}],
+               "timeout": 5},
+  "queue": {"name": %queue_name%, "workers": 4, "text": "braces } ] and commas, \\" in strings"},
+  "debug": true
+}"""
+
+
+class TestPartialLoading(unittest.TestCase):
+    mapping = {
+        "database": {"password": None, "providers": [{"name": None, "hostname": None}], "timeout": 10},
+        "queue": {"name": None, "workers": 1, "text": ""},
+        "debug": False,
+    }
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.parameters = os.path.join(self.tmp_dir, "parameters.json")
+        # database_password is a secret that this process does not have
+        with open(self.parameters, "w") as parameters:
+            json.dump({"queue_name": "jobs", "database_host": "db"}, parameters)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as config:
+            config.write(text)
+        return path
+
+    def test_selector_tree(self):
+        self.assertEqual(selector_tree(["database:providers", "queue", "database:timeout"]),
+                         {"database": {"providers": None, "timeout": None}, "queue": None})
+        self.assertEqual(selector_tree(["database", "database:providers"]), {"database": None})
+        self.assertEqual(selector_tree([("database", "providers")]), {"database": {"providers": None}})
+        with self.assertRaises(ValueError):
+            selector_tree(["database:"])
+        with self.assertRaises(TypeError):
+            selector_tree("queue")
+
+    def test_split_yaml(self):
+        blocks = split_yaml(YML_CONFIG)
+        self.assertEqual(list(blocks), ["database", "queue", "debug"])
+        self.assertEqual(blocks["queue"], "queue:\n  name: {queue_name}\n  # Comments and blank lines stay in the "
+                                          "section\n\n  workers: 4\n")
+        for text in ["---\na: 1\n", "a: &anchor 1\nb: *anchor\n", "'a': 1\n", "{a: 1}\n", "a: 1\na: 2\n",
+                     "- 1\n- 2\n"]:
+            self.assertIsNone(split_yaml(text), text)
+
+    def test_split_json(self):
+        members = split_json(JSON_CONFIG)
+        self.assertEqual(list(members), ["database", "queue", "debug"])
+        self.assertEqual(members["debug"].strip(), '"debug": true')
+        self.assertEqual(json.loads("{" + members["queue"].replace("%queue_name%", '"jobs"') + "}")["queue"]["text"],
+                         'braces } ] and commas, " in strings')
+        for text in ["[1, 2]", '{"a": 1} {"b": 2}', '{"a": 1, "a": 2}', '{"a": {"b": 1}', "{1: 2}"]:
+            self.assertIsNone(split_json(text), text)
+
+    def check_loader(self, config_loader, path, queue):
+        with self.assertRaises(MissingParametersException):
+            config_loader.load_config(path, self.parameters)
+        self.assertEqual(config_loader.load_config(path, self.parameters, sections=["queue"]), {"queue": queue})
+        self.assertEqual(config_loader.load_config(path, self.parameters, sections=["queue:workers", "debug"]),
+                         {"queue": {"workers": 4}, "debug": True})
+        os.environ["database_password"] = "secret"
+        try:
+            config = config_loader.load_config(path, self.parameters, sections=["database:providers"])
+        finally:
+            del os.environ["database_password"]
+        self.assertEqual(config, {"database": {"providers": [{"name": "main", "hostname": "db"}]}})
+
+    def test_yml(self):
+        path = self.write("config.yml", YML_CONFIG)
+        queue = {"name": "jobs", "workers": 4}
+        self.check_loader(loader.YmlLoader(), path, queue)
+        self.check_loader(loader.YmlLoader(streaming=True), path, queue)
+
+    def test_json(self):
+        self.check_loader(loader.JsonLoader(), self.write("config.json", JSON_CONFIG),
+                          {"name": "jobs", "workers": 4, "text": 'braces } ] and commas, " in strings'})
+
+    def test_yml_fallback(self):
+        # Anchors can not be split, the whole file is parsed and every parameter is needed
+        path = self.write("config.yml", YML_CONFIG.replace("timeout: 5", "timeout: &timeout 5"))
+        with self.assertRaises(MissingParametersException):
+            loader.YmlLoader().load_config(path, self.parameters, sections=["queue"])
+        os.environ["database_password"] = "secret"
+        try:
+            config = loader.YmlLoader().load_config(path, self.parameters, sections=["queue"])
+        finally:
+            del os.environ["database_password"]
+        self.assertEqual(config, {"queue": {"name": "jobs", "workers": 4}})
+
+    def test_build_config(self):
+        # The database section is not valid, it is not validated
+        document = {"database": {"timeout": "x"}, "queue": {"name": "jobs"}, "debug": True}
+        config = build_config(self.mapping, document, sections=["queue"])
+        self.assertEqual(config._fields, ("queue",))
+        self.assertEqual(config.queue.workers, 1)
+        with self.assertRaises(InvalidDataException):
+            build_config(self.mapping, document)
+
+        config = build_config(self.mapping, {"database": {"timeout": 3, "password": 1}},
+                              sections=["database:timeout"], workers=2)
+        self.assertEqual(config.database._fields, ("timeout",))
+        self.assertEqual(config.database.timeout, 3)
+        with self.assertRaises(InvalidDataException) as context:
+            build_config(self.mapping, {"database": {"timeout": "x"}}, sections=["database:timeout", "debug"])
+        self.assertEqual(context.exception.errors, ["Field [database:timeout] must be of integer type"])
+
+        for sections in (["cache"], ["debug:value"], ["database:providers:name"]):
+            with self.assertRaises(ValueError):
+                build_config(self.mapping, {}, sections=sections)
+
+
+if __name__ == '__main__':
+    unittest.main()
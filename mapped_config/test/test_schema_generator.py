@@ -1,7 +1,12 @@
 from mapped_config.loader import build_config, InvalidDataException, mapped_to_cerberus
 from mapped_config.constructor import MultiField, IntegerField, StringField, ListField
-from mapped_config import loader
+from mapped_config import loader, sections
+from mapped_config.schema import CompiledSchema, compile_schema
+from mapped_config.cache import ConfigCache
+import copy
 import os
+import shutil
+import tempfile
 import unittest
 import six
 
@@ -65,62 +70,277 @@ class TestSchemaGenerator(unittest.TestCase):
         self.assertDictEqual(mapped_to_cerberus({"field": None}), {'field': {'required': True}})
 
 # The same but using the schema consctructor
-if six.PY3:
-    class TestSchemaConstructor(unittest.TestCase):
+class TestSchemaConstructor(unittest.TestCase):
 
-        def test_simple_object(self):
-            mapped_schema = MultiField([IntegerField("number", 12345)])
+    def test_simple_object(self):
+        mapped_schema = MultiField([IntegerField("number", 12345)])
 
-            data = {
-                "number": 56
-            }
+        data = {
+            "number": 56
+        }
 
-            c = build_config(mapped_schema, data)
-            self.assertEqual(c.number, data["number"])
+        c = build_config(mapped_schema, data)
+        self.assertEqual(c.number, data["number"])
 
-            with self.assertRaises(InvalidDataException):
-                build_config(mapped_schema, {"number": "string"})
+        with self.assertRaises(InvalidDataException):
+            build_config(mapped_schema, {"number": "string"})
 
-            # Extra field
-            with self.assertRaises(InvalidDataException):
-                build_config(mapped_schema, {"number": 123, "extra_field": "testing"})
+        # Extra field
+        with self.assertRaises(InvalidDataException):
+            build_config(mapped_schema, {"number": 123, "extra_field": "testing"})
 
-        def test_nested_object(self):
+    def test_nested_object(self):
 
-            schema = MultiField([
-                MultiField(name="auth", fields=[
-                    StringField("username", "root")
-                ])
+        schema = MultiField([
+            MultiField(name="auth", fields=[
+                StringField("username", "root")
             ])
+        ])
 
-            data = {
-                "auth": {
-                    "username": "user"
-                }
+        data = {
+            "auth": {
+                "username": "user"
             }
-            c = build_config(schema, data)
-            self.assertEqual(c.auth.username, data["auth"]["username"])
-
-            # Default value
-            c = build_config(schema, {})
-            self.assertEqual(c.auth.username, "root")
-
-            with self.assertRaises(InvalidDataException):
-                build_config(schema, {"auth": {"username": 123}})
-
-        def test_list(self):
-            schema = MultiField([
-                ListField("hosts", MultiField([
-                    StringField("ip", "192.168.2.1"),
-                    IntegerField("port", 5000)
-                ]))
-            ])
-            data = {"hosts": [{"ip": "192.168.2.1", "port": 5000}, {"ip": "192.168.2.4", "port": 6000}]}
+        }
+        c = build_config(schema, data)
+        self.assertEqual(c.auth.username, data["auth"]["username"])
+
+        # Default value
+        c = build_config(schema, {})
+        self.assertEqual(c.auth.username, "root")
+
+        with self.assertRaises(InvalidDataException):
+            build_config(schema, {"auth": {"username": 123}})
+
+    def test_list(self):
+        schema = MultiField([
+            ListField("hosts", MultiField([
+                StringField("ip", "192.168.2.1"),
+                IntegerField("port", 5000)
+            ]))
+        ])
+        data = {"hosts": [{"ip": "192.168.2.1", "port": 5000}, {"ip": "192.168.2.4", "port": 6000}]}
+
+        c = build_config(schema, data)
+        self.assertEqual(c.hosts[1].ip, data["hosts"][1]["ip"])
+        with self.assertRaises(InvalidDataException):
+            build_config(schema, {"hosts": [{"ip": "192.168.2.4", "port": "6000"}]})
 
-            c = build_config(schema, data)
-            self.assertEqual(c.hosts[1].ip, data["hosts"][1]["ip"])
-            with self.assertRaises(InvalidDataException):
-                build_config(schema, {"hosts": [{"ip": "192.168.2.4", "port": "6000"}]})
+    def test_build(self):
+        schema = MultiField([
+            MultiField(name="auth", fields=[StringField("username", "root"), StringField("password")]),
+            ListField("hosts", MultiField([IntegerField("port", 5000)])),
+        ])
+        self.assertEqual(schema.build(), {
+            "auth": {
+                "username": {"default": "root", "required": False, "type": "string"},
+                "password": {"required": True, "type": "string"},
+            },
+            "hosts": [{"port": {"default": 5000, "required": False, "type": "integer"}}],
+        })
+        self.assertEqual(compile_schema([schema]), compile_schema(schema.build()))
+
+    def test_slots(self):
+        field = IntegerField("number", 1)
+        self.assertFalse(hasattr(field, "__dict__"))
+        self.assertFalse(hasattr(MultiField([field]), "__dict__"))
+        self.assertFalse(hasattr(ListField("numbers"), "__dict__"))
+        with self.assertRaises(AttributeError):
+            field.extra = True
+
+    def test_subclass_rules(self):
+        class RegexField(StringField):
+            def __init__(self, name, regex, nullable=None):
+                super().__init__(name)
+                self.regex = regex
+                self.nullable = nullable
+
+        self.assertEqual(RegexField("x", "a+").build(),
+                         {"x": {"required": True, "type": "string", "regex": "a+"}})
+        schema = compile_schema(MultiField([RegexField("x", "a+", nullable=True)]))
+        self.assertEqual(schema.schema["x"]["regex"], "a+")
+        self.assertEqual(schema.engine, "cerberus")
+        with self.assertRaises(InvalidDataException):
+            build_config(schema, {"x": "b"})
+        self.assertIsNone(build_config(schema, {"x": None}).x)
+
+    def test_duck_typed_field(self):
+        class Custom(object):
+            def build(self):
+                return {"custom": {"type": "integer", "required": True}}
+
+        self.assertEqual(MultiField([Custom(), IntegerField("number", 1)]).build(),
+                         {"custom": {"type": "integer", "required": True},
+                          "number": {"type": "integer", "default": 1, "required": False}})
+        self.assertEqual(build_config(MultiField([Custom()], "node"), {"node": {"custom": 2}}).node.custom, 2)
+        self.assertEqual(build_config(Custom(), {"custom": 3}).custom, 3)
+
+    def test_overridden_build(self):
+        class Upper(StringField):
+            def build(self):
+                return {self.name.upper(): super().build()[self.name]}
+
+        schema = compile_schema(MultiField([Upper("a")]))
+        self.assertEqual(set(schema.schema), {"A"})
+        self.assertEqual(build_config(schema, {"A": "x"}).A, "x")
+        self.assertEqual(set(compile_schema(Upper("b")).schema), {"B"})
+
+
+class TestCompiledSchema(unittest.TestCase):
+
+    def test_same_instance(self):
+        schema = {"hosts": [{"ip": {"type": "string"}, "port": 123}], "auth": {"username": None}}
+        compiled = compile_schema(schema)
+        self.assertIs(compiled, compile_schema({"auth": {"username": None}, "hosts": [{"ip": {"type": "string"}, "port": 123}]}))
+        self.assertIsNot(compiled, compile_schema({"auth": {"username": None}, "hosts": [{"ip": {"type": "string"}, "port": 123.0}]}))
+        self.assertEqual(hash(compiled), hash(CompiledSchema(schema)))
+        with self.assertRaises(AttributeError):
+            compiled.key = None
+
+    def test_schema_not_modified(self):
+        schema = {"number": 12345, "auth": {"username": "root"}}
+        build_config(schema, {"number": 5})
+        self.assertDictEqual(schema, {"number": 12345, "auth": {"username": "root"}})
+        c = build_config(schema, {"number": 6})
+        self.assertEqual(c.number, 6)
+
+    def test_module_mappings(self):
+        mappings = [
+            {"database": {"driver": None, "hostname": "localhost"}},
+            {"crypto": {"magical_numbers": [], "best_algorithm": "caesar"}}
+        ]
+        compiled = compile_schema(mappings)
+        c = build_config(compiled, {"database": {"driver": "mysql"}, "crypto": {"magical_numbers": [1, 3]}})
+        self.assertEqual(c.database.hostname, "localhost")
+        self.assertEqual(c.crypto.magical_numbers, [1, 3])
+
+        yml_loader = loader.YmlLoader()
+        c = yml_loader.build_config({"database": {"driver": "mysql"}}, compiled)
+        self.assertEqual(c.crypto.best_algorithm, "caesar")
+        with self.assertRaises(InvalidDataException):
+            yml_loader.build_config({}, compiled)
+
+
+class TestNamedtupleClasses(unittest.TestCase):
+
+    def test_classes_are_reused(self):
+        schema = {"database": {"default": None, "providers": [{"name": None, "port": 3306}]}}
+        data = {"database": {"default": "mysql", "providers": [{"name": "mysql"}, {"name": "postgres", "port": 5432}]}}
+        c1 = build_config(schema, data)
+        c2 = build_config(schema, {"database": {"default": "sqlite", "providers": [{"name": "sqlite"}]}})
+
+        self.assertIs(type(c1), type(c2))
+        self.assertIs(type(c1.database), type(c2.database))
+        self.assertIs(type(c1.database.providers[0]), type(c1.database.providers[1]))
+        self.assertIsInstance(c2.database.providers[0], type(c1.database.providers[1]))
+
+    def test_class_names(self):
+        c = build_config({"database": {"providers": [{"name": None}]}}, {"database": {"providers": [{"name": "a"}]}})
+        self.assertEqual(type(c).__name__, "Configuration")
+        self.assertEqual(type(c.database).__name__, "database")
+        self.assertEqual(type(c.database.providers[0]).__name__, "database.providers")
+        self.assertTrue(repr(c).startswith("Configuration(database=database(providers=[database.providers("))
+
+
+class TestLazyConfig(unittest.TestCase):
+    schema = {"database": {"default": None, "providers": [{"name": None, "port": 3306}]}, "debug": False}
+    data = {"database": {"default": "mysql", "providers": [{"name": "mysql"}, {"name": "postgres", "port": 5432}]}}
+
+    def test_same_as_eager(self):
+        eager = build_config(self.schema, self.data)
+        lazy = build_config(self.schema, self.data, lazy=True)
+        self.assertEqual(lazy._fields, eager._fields)
+        self.assertEqual(lazy.database.providers[1].port, 5432)
+        self.assertEqual(lazy.database.providers[-1].name, "postgres")
+        self.assertEqual(len(lazy.database.providers), 2)
+        self.assertEqual(lazy, eager)
+        self.assertEqual(lazy.database, eager.database)
+        self.assertEqual(lazy.database.providers, eager.database.providers)
+        self.assertEqual(list(lazy._asdict().keys()), list(eager._asdict().keys()))
+        self.assertEqual(repr(lazy), repr(eager))
+        database, debug = lazy
+        self.assertIs(debug, False)
+        self.assertIs(lazy[0], database)
+
+    def test_memoized(self):
+        lazy = build_config(self.schema, self.data, lazy=True)
+        self.assertEqual(lazy._children, {})
+        self.assertIs(lazy.database, lazy.database)
+        self.assertIs(lazy.database.providers[0], lazy.database.providers[0])
+        self.assertNotIn("debug", lazy._children)
+
+    def test_read_only(self):
+        lazy = build_config(self.schema, self.data, lazy=True)
+        with self.assertRaises(AttributeError):
+            lazy.debug = True
+        with self.assertRaises(AttributeError):
+            lazy.database.providers[0].name = "sqlite"
+        with self.assertRaises(AttributeError):
+            lazy.unknown
+        with self.assertRaises(IndexError):
+            lazy.database.providers[2]
+        self.assertTrue(lazy._replace(debug=True).debug)
+        self.assertFalse(lazy.debug)
+
+    def test_invalid(self):
+        with self.assertRaises(InvalidDataException):
+            build_config(self.schema, {"debug": "no"}, lazy=True)
+
+
+class TestSections(unittest.TestCase):
+    modules = [
+        {"database": {"default": None, "providers": [{"name": None, "hostname": "localhost"}]}},
+        {"queue": {"max_instances": 5, "workers": [{"name": None, "plans": []}]}},
+        {"crypto": {"magical_numbers": [], "best_algorithm": "random"}},
+    ]
+    data = {
+        "queue": {"workers": [{"name": "cpu", "plans": [1]}]},
+        "database": {"default": "mysql", "providers": [{"name": "mysql"}]},
+    }
+
+    def test_same_as_whole_document(self):
+        for workers in (1, 4):
+            eager = build_config(self.modules, copy.deepcopy(self.data))
+            sectioned = build_config(self.modules, copy.deepcopy(self.data), workers=workers)
+            self.assertEqual(sectioned, eager)
+            self.assertEqual(sectioned._fields, eager._fields)
+            self.assertIs(type(sectioned.database.providers[0]), type(eager.database.providers[0]))
+            self.assertEqual(build_config(self.modules, copy.deepcopy(self.data), workers=workers, lazy=True), eager)
+            self.assertEqual(build_config(self.modules, copy.deepcopy(self.data), workers=workers,
+                                          as_named_tuple=False),
+                             build_config(self.modules, copy.deepcopy(self.data), as_named_tuple=False))
+
+    def test_errors(self):
+        data = {"database": {"providers": [{"name": 1}]}, "queue": {"max_instances": "5"}, "extra": 1}
+        with self.assertRaises(InvalidDataException) as whole:
+            build_config(self.modules, data)
+        with self.assertRaises(InvalidDataException) as sectioned:
+            build_config(self.modules, data, workers=2)
+        self.assertEqual(sectioned.exception.errors, whole.exception.errors)
+
+    def test_only_changed_sections_are_validated(self):
+        build_config(self.modules, copy.deepcopy(self.data), workers=2)
+        data = copy.deepcopy(self.data)
+        data["queue"]["max_instances"] = 8
+        hits, misses = sections._results.hits, sections._results.misses
+        config = build_config(self.modules, data, workers=2)
+        self.assertEqual(config.queue.max_instances, 8)
+        self.assertEqual(sections._results.hits - hits, 2)
+        self.assertEqual(sections._results.misses - misses, 1)
+
+    def test_cached_lists_not_shared(self):
+        first = build_config(self.modules, copy.deepcopy(self.data), workers=2)
+        first.queue.workers.append("extra")
+        first.queue.workers[0].plans.append(2)
+        second = build_config(self.modules, copy.deepcopy(self.data), workers=2)
+        self.assertIsNot(second.queue.workers, first.queue.workers)
+        self.assertEqual(second, build_config(self.modules, copy.deepcopy(self.data)))
+
+    def test_collisions(self):
+        with self.assertRaises(loader.SchemaCollision) as context:
+            compile_schema(self.modules + [{"queue": {"size": 1}, "crypto": {}}, {"other": 1}])
+        self.assertEqual(context.exception.keys, ["crypto", "queue"])
+        self.assertIsInstance(context.exception, ValueError)
 
 
 class TestYmlLoader(unittest.TestCase):
@@ -152,5 +372,201 @@ class TestYmlLoader(unittest.TestCase):
 
         self.assertDictEqual(real_config, test_config, "Config data was not loaded correctly")
 
+    def test_missing_parameters(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            config_path = os.path.join(tmp_dir, "config.yml")
+            with open(config_path, "w") as config:
+                config.write("database:\n  host: {database_host}\n  user: {user_name}\n  url: x{other_name}\n")
+            for streaming in [False, True]:
+                with self.assertRaises(loader.MissingParametersException) as context:
+                    loader.YmlLoader(streaming=streaming).load_config(
+                        config_path, os.path.join(self.dir_path, "parameters.yml"))
+                self.assertEqual(context.exception.names, ["other_name", "user_name"])
+                self.assertEqual(str(context.exception), "Missing parameters: other_name, user_name")
+                self.assertIsInstance(context.exception, KeyError)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_environment_overwrites(self):
+        os.environ["database_host"] = "remote"
+        try:
+            for streaming in [False, True]:
+                config = loader.YmlLoader(streaming=streaming).load_config(
+                    os.path.join(self.dir_path, "config.yml"), os.path.join(self.dir_path, "parameters.yml"))
+                self.assertEqual(config["database"]["host"], "remote")
+        finally:
+            del os.environ["database_host"]
+
+    def test_streaming_load_config(self):
+        example_path = os.path.join(self.dir_path, "..", "example")
+        cases = [(os.path.join(self.dir_path, name), os.path.join(self.dir_path, "parameters.yml"))
+                 for name in ["config.yml", "full_extra_config.yml", "list_objects_config.yml"]]
+        cases.append((os.path.join(example_path, "example_config.yml"),
+                      os.path.join(example_path, "example_parameters.yml")))
+        for config_path, parameters_path in cases:
+            self.assertEqual(loader.YmlLoader().load_config(config_path, parameters_path),
+                             loader.YmlLoader(streaming=True).load_config(config_path, parameters_path))
+
+    def test_streaming_sections(self):
+        yml_loader = loader.YmlLoader(streaming=True)
+        sections = list(yml_loader.iter_config_sections(
+            os.path.join(self.dir_path, "..", "example", "example_config.yml"),
+            os.path.join(self.dir_path, "..", "example", "example_parameters.yml")
+        ))
+        self.assertEqual([key for key, _ in sections], ["database", "persistence", "crypto", "queue"])
+        self.assertEqual(sections[1][1], {"amazon": {"bucket": "images"}, "azure": {"storage": "images"},
+                                          "local": {"directory": "/media/images"}})
+
+    def test_streaming_scalars(self):
+        from mapped_config import streaming
+        document = streaming.load(six.StringIO(
+            "url: http://{host}:{port}/x\nport: {port}\nitems: [{port}, {host}]\nflow: {a: 1}\n"
+            "base: &base {user: root}\nchild:\n  <<: *base\n  user: admin\n  other: {host}\n"
+        ), {"host": "'localhost'", "port": 80})
+        self.assertEqual(document, {
+            "url": "http://'localhost':80/x", "port": 80, "items": [80, "localhost"], "flow": {"a": 1},
+            "base": {"user": "root"}, "child": {"user": "admin", "other": "localhost"}
+        })
+
+class TestJsonLoader(unittest.TestCase):
+    example_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "example")
+
+    def test_load_config(self):
+        config = loader.JsonLoader().load_config(os.path.join(self.example_path, "example_simple_config.json"),
+                                                 os.path.join(self.example_path, "example_simple_parameters.json"))
+        self.assertEqual(config, {"database": {"driver": "mysql", "hostname": "localhost", "username": "root",
+                                               "port": 566}})
+
+    def test_missing_parameters(self):
+        with self.assertRaises(loader.MissingParametersException) as context:
+            loader.JsonLoader().load_config(os.path.join(self.example_path, "example_simple_config.json"),
+                                            os.path.join(self.example_path, "no_parameters.json"))
+        self.assertEqual(context.exception.names,
+                         ["database_driver", "database_hostname", "database_password", "database_port"])
+
+    def test_typed_values(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            config_path = os.path.join(tmp_dir, "config.json")
+            parameters_path = os.path.join(tmp_dir, "parameters.json")
+            with open(config_path, "w") as config:
+                config.write('{"a": %a%, "b": %b%, "c": %c%, "d": %d%, "e": [%e%, %e%], "f": %f%, "g": %g%}')
+            with open(parameters_path, "w") as parameters:
+                parameters.write('{"a": 1.5, "b": true, "c": null, "d": "say \\"hi\\"", "e": "12", "f": [1, "x"], '
+                                 '"g": "0123"}')
+            config = loader.JsonLoader().load_config(config_path, parameters_path)
+            self.assertEqual(config, {"a": 1.5, "b": True, "c": None, "d": 'say "hi"', "e": [12, 12], "f": [1, "x"],
+                                      "g": "0123"})
+
+            os.environ["a"] = "false"
+            try:
+                self.assertIs(loader.JsonLoader().load_config(config_path, parameters_path)["a"], False)
+            finally:
+                del os.environ["a"]
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TestConfigCache(unittest.TestCase):
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp_dir, "config.yml")
+        self.parameters_path = os.path.join(self.dir_path, "parameters.yml")
+        shutil.copy(os.path.join(self.dir_path, "config.yml"), self.config_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hits_and_invalidation(self):
+        cache = ConfigCache(maxsize=4)
+        yml_loader = loader.YmlLoader(cache=cache)
+        first = yml_loader.load_config(self.config_path, self.parameters_path)
+        self.assertIs(first, yml_loader.load_config(self.config_path, self.parameters_path))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        with open(self.config_path, "a") as config:
+            config.write("extra: 1\n")
+        os.utime(self.config_path, (0, 0))
+        changed = yml_loader.load_config(self.config_path, self.parameters_path)
+        self.assertEqual(changed["extra"], 1)
+
+        # Only the environment variables used by the config matter
+        for name, expected in [("MAPPED_CONFIG_TEST_VARIABLE", (2, 2)), ("database_host", (2, 3))]:
+            os.environ[name] = "1"
+            try:
+                yml_loader.load_config(self.config_path, self.parameters_path)
+            finally:
+                del os.environ[name]
+            self.assertEqual((cache.hits, cache.misses), expected)
+
+    def test_disk_cache(self):
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        config = loader.YmlLoader(cache=ConfigCache(directory=cache_dir)).load_config(
+            self.config_path, self.parameters_path)
+
+        # A new process starts with an empty memory cache
+        cache = ConfigCache(directory=cache_dir)
+        self.assertEqual(config, loader.YmlLoader(cache=cache).load_config(self.config_path, self.parameters_path))
+        self.assertEqual((cache.disk_hits, cache.misses), (1, 0))
+
+
+    def test_build_does_not_modify_cached_config(self):
+        with open(self.config_path, "w") as config:
+            config.write("extras:\n  - a:\n      b: 1\n")
+        yml_loader = loader.YmlLoader(cache=ConfigCache())
+        first = yml_loader.load_config(self.config_path, self.parameters_path)
+        expected = copy.deepcopy(first)
+        self.assertEqual(loader.build_config({"extras": []}, first).extras[0].a.b, 1)
+        second = yml_loader.load_config(self.config_path, self.parameters_path)
+        self.assertIs(first, second)
+        self.assertEqual(second, expected)
+        self.assertEqual(loader.build_config({"extras": []}, second, as_named_tuple=False), expected)
+
+@unittest.skipUnless("libyaml" in loader.YAML_BACKENDS, "PyYAML built without libyaml")
+class TestYamlBackends(unittest.TestCase):
+    example_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "example")
+
+    def setUp(self):
+        # The example config with the lists scaled up
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp_dir, "config.yml")
+        self.parameters_path = os.path.join(self.example_path, "example_parameters.yml")
+        with open(os.path.join(self.example_path, "example_config.yml")) as example:
+            config = example.read()
+        providers = "".join("    - name: mysql{i}\n      hostname: {{mysql_hostname}}\n      username: user{i}\n"
+                            .format(i=i) for i in range(2000))
+        workers = "".join("      - name: worker{i}\n        scheduler_plans:\n            low: [1, 3, {i}]\n"
+                          .format(i=i) for i in range(2000))
+        config = config.replace("  providers:\n", "  providers:\n" + providers)
+        config = config.replace("   workers:\n", "   workers:\n" + workers)
+        with open(self.config_path, "w") as scaled:
+            scaled.write(config)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_default_backend(self):
+        self.assertEqual(loader.YmlLoader().backend, "libyaml")
+        self.assertEqual(loader.YmlLoader(backend="python").backend, "python")
+        with self.assertRaises(ValueError):
+            loader.YmlLoader(backend="rust")
+
+    def test_compare_backends(self):
+        # Only the results, benchmarks/bench_yaml_backend.py compares the timings
+        results = {}
+        for backend in ["python", "libyaml"]:
+            for streaming in [False, True]:
+                yml_loader = loader.YmlLoader(streaming=streaming, backend=backend)
+                results[backend, streaming] = yml_loader.load_config(self.config_path, self.parameters_path)
+
+        expected = results["python", False]
+        self.assertEqual(len(expected["database"]["providers"]), 2002)
+        for key, result in results.items():
+            self.assertEqual(expected, result, "Different result with {key}".format(key=key))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+from mapped_config.diff import diff
+from mapped_config.fingerprint import structural_digest
+from mapped_config.lazy import LazyNode
+from mapped_config.loader import YmlLoader, build_config, InvalidDataException
+from mapped_config.shared import publish_config, load_and_publish, SharedConfig, SharedConfigError, decode
+from mapped_config.test.test_validator import schemas, documents
+import copy
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+schema = {"database": {"host": None, "port": 3306, "replicas": [{"host": None, "weight": 1}]},
+          "queue": {"workers": 4, "names": ["default"]}}
+document = {"database": {"host": "db", "replicas": [{"host": "r1"}, {"host": "r2", "weight": 3}]}}
+
+
+class TestSharedConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "config.shm")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def publish(self, data):
+        return publish_config(self.path, build_config(schema, copy.deepcopy(data), as_named_tuple=False), schema)
+
+    def test_round_trip(self):
+        self.assertEqual(self.publish(document), 1)
+        shared = SharedConfig(self.path, schema)
+        expected = build_config(schema, copy.deepcopy(document))
+        self.assertEqual(shared.generation, 1)
+        self.assertEqual(shared.config, expected)
+        self.assertEqual(set(shared.config._fields), set(expected._fields))
+        self.assertEqual(shared.config.database.replicas[1].weight, 3)
+        self.assertEqual(shared.config.queue.names, ["default"])
+        self.assertIsInstance(shared.config, LazyNode)
+        self.assertEqual(structural_digest(shared.config), structural_digest(expected))
+        self.assertEqual(list(diff(shared.config, expected)), [])
+        self.assertEqual(pickle.loads(pickle.dumps(shared.config)), expected)
+        self.assertEqual(decode(shared.config._data), build_config(schema, copy.deepcopy(document),
+                                                                   as_named_tuple=False))
+
+    def test_documents(self):
+        for mapped in schemas:
+            for data in documents:
+                try:
+                    expected = build_config(mapped, copy.deepcopy(data), as_named_tuple=False)
+                except InvalidDataException:
+                    continue
+                publish_config(self.path, expected)
+                self.assertEqual(decode(SharedConfig(self.path).config._data), expected)
+
+    def test_scalars(self):
+        values = {"int": 2 ** 70, "negative": -1, "float": 1.5, "true": True, "one": 1, "float_one": 1.0,
+                  "none": None, "bytes": b"\x00a", "text": "ñ\ud800", "tuple": (1, "a"), "list": [[], {}]}
+        publish_config(self.path, values)
+        config = SharedConfig(self.path).config
+        self.assertEqual(decode(config._data), values)
+        self.assertIs(type(config.true), bool)
+        self.assertIs(type(config.float_one), float)
+
+    def test_generations(self):
+        self.publish(document)
+        shared = SharedConfig(self.path, schema)
+        old = shared.config
+        self.assertFalse(shared.changed())
+        self.assertFalse(shared.refresh())
+
+        changed = copy.deepcopy(document)
+        changed["queue"] = {"workers": 8}
+        self.assertEqual(self.publish(changed), 2)
+        self.assertTrue(shared.changed())
+        self.assertTrue(shared.refresh())
+        self.assertEqual(shared.generation, 2)
+        self.assertEqual(shared.config.queue.workers, 8)
+        self.assertFalse(shared.changed())
+        # The views of the old generation still work
+        self.assertEqual(old.queue.workers, 4)
+
+        other = SharedConfig(self.path)
+        self.assertEqual(self.publish(document), 3)
+        self.assertEqual(self.publish(document), 4)
+        self.assertTrue(other.refresh())
+        self.assertEqual(other.generation, 4)
+
+    def test_schema_mismatch(self):
+        self.publish(document)
+        with self.assertRaises(SharedConfigError):
+            SharedConfig(self.path, {"other": 1})
+        shared = SharedConfig(self.path, schema)
+        publish_config(self.path, {"other": 1}, {"other": 1})
+        with self.assertRaises(SharedConfigError):
+            shared.refresh()
+        self.assertEqual(shared.generation, 1)
+
+    def test_not_shared_config(self):
+        with open(self.path, "wb") as f:
+            f.write(b"database: {}\n" * 10)
+        with self.assertRaises(SharedConfigError):
+            SharedConfig(self.path)
+        # Not a shared config, it is replaced with the first generation
+        self.assertEqual(publish_config(self.path, {"a": 1}), 1)
+        self.assertEqual(SharedConfig(self.path).config.a, 1)
+
+    def test_load_and_publish(self):
+        config_path = os.path.join(self.tmp_dir, "config.yml")
+        parameters_path = os.path.join(self.tmp_dir, "parameters.yml")
+        with open(config_path, "w") as f:
+            f.write("database:\n  host: {host}\n  replicas:\n    - host: r1\n")
+        with open(parameters_path, "w") as f:
+            f.write("host: localhost\n")
+        load_and_publish(self.path, YmlLoader(), config_path, parameters_path, schema)
+        config = SharedConfig(self.path, schema).config
+        self.assertEqual(config.database.host, "localhost")
+        self.assertEqual(config.database.replicas[0].weight, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+from mapped_config import snapshot
+from mapped_config.cache import write_atomic
+from mapped_config.loader import YmlLoader, build_config
+from mapped_config.snapshot import write_snapshot, read_snapshot, load_with_snapshot, StaleSnapshot
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+schema = {"database": {"host": None, "port": 3306, "replicas": [{"host": None, "weight": 1}]}}
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = self.write("config.yml", "database:\n  host: {database_host}\n"
+                                               "  replicas:\n    - host: r1\n    - host: r2\n      weight: 3\n")
+        self.parameters = self.write("parameters.yml", "database_host: localhost\n")
+        self.snapshot = os.path.join(self.tmp_dir, "config.snapshot")
+        os.environ.pop("database_host", None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        os.environ.pop("database_host", None)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def expected(self):
+        return build_config(schema, YmlLoader().load_config(self.config, self.parameters))
+
+    def test_round_trip(self):
+        write_snapshot(self.snapshot, YmlLoader(), self.config, self.parameters, schema)
+        config = read_snapshot(self.snapshot, schema, self.config, self.parameters)
+        self.assertEqual(config, self.expected())
+        self.assertIs(type(config.database.replicas[0]), type(self.expected().database.replicas[0]))
+        self.assertEqual(read_snapshot(self.snapshot, schema, lazy=True), self.expected())
+        self.assertEqual(read_snapshot(self.snapshot, schema, as_named_tuple=False)["database"]["port"], 3306)
+
+    def test_stale(self):
+        write_snapshot(self.snapshot, YmlLoader(), self.config, self.parameters, schema)
+        with self.assertRaises(StaleSnapshot):
+            read_snapshot(self.snapshot, {"database": {"host": None}}, self.config, self.parameters)
+
+        self.write("parameters.yml", "database_host: remote\n")
+        with self.assertRaises(StaleSnapshot):
+            read_snapshot(self.snapshot, schema, self.config, self.parameters)
+        # Without the sources only the schema and the environment are checked
+        self.assertEqual(read_snapshot(self.snapshot, schema).database.host, "localhost")
+
+        os.environ["database_host"] = "from_env"
+        with self.assertRaises(StaleSnapshot):
+            read_snapshot(self.snapshot, schema)
+
+    def test_other_python(self):
+        cache_tag = sys.implementation.cache_tag
+        sys.implementation.cache_tag = "cpython-00"
+        try:
+            write_snapshot(self.snapshot, YmlLoader(), self.config, self.parameters, schema)
+        finally:
+            sys.implementation.cache_tag = cache_tag
+        with self.assertRaises(StaleSnapshot):
+            read_snapshot(self.snapshot, schema)
+
+    def test_write_atomic(self):
+        write_atomic(self.snapshot, b"old")
+        with self.assertRaises(TypeError):
+            write_atomic(self.snapshot, object())
+        # The file is not replaced and the temporary file is removed
+        with open(self.snapshot, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["config.snapshot", "config.yml", "parameters.yml"])
+
+    def test_not_a_snapshot(self):
+        for content in ["", "garbage", "MCSNAP\x01\xff\xff\xff\x00"]:
+            self.write("config.snapshot", content)
+            with self.assertRaises(StaleSnapshot):
+                read_snapshot(self.snapshot, schema)
+
+    def test_load_with_snapshot(self):
+        config = load_with_snapshot(self.snapshot, YmlLoader(), self.config, self.parameters, schema)
+        self.assertEqual(config, self.expected())
+        self.assertTrue(os.path.isfile(self.snapshot))
+        self.write("config.yml", "database:\n  host: {database_host}\n  port: 1\n")
+        config = load_with_snapshot(self.snapshot, YmlLoader(), self.config, self.parameters, schema)
+        self.assertEqual(config.database.port, 1)
+        self.assertEqual(read_snapshot(self.snapshot, schema, self.config, self.parameters).database.port, 1)
+
+    def test_cli(self):
+        arguments = ["--config", self.config, "--parameters", self.parameters, "--output", self.snapshot,
+                     "--schema", "mapped_config.test.test_snapshot:schema"]
+        self.assertEqual(snapshot.main(["check"] + arguments), 1)
+        self.assertEqual(snapshot.main(["build"] + arguments), 0)
+        self.assertEqual(snapshot.main(["check"] + arguments), 0)
+        self.assertEqual(read_snapshot(self.snapshot, schema), self.expected())
+
+
+if __name__ == '__main__':
+    unittest.main()
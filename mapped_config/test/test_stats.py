@@ -0,0 +1,115 @@
+from mapped_config import loader
+from mapped_config.cache import ConfigCache
+from mapped_config.loader import build_config, InvalidDataException
+from mapped_config.stats import LoadStats, LoggingHook, prometheus_text, write_prometheus, count_nodes
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super(ListHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLoadStats(unittest.TestCase):
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    example_path = os.path.join(dir_path, "..", "example")
+    schema = {"database": {"host": None, "username": None, "static": None}}
+
+    def yml_sources(self):
+        return os.path.join(self.dir_path, "config.yml"), os.path.join(self.dir_path, "parameters.yml")
+
+    def test_yml_stages(self):
+        stats = LoadStats()
+        yml_loader = loader.YmlLoader(stats=stats)
+        config = yml_loader.build_config(yml_loader.load_config(*self.yml_sources()), self.schema)
+        self.assertEqual(config.database.host, "localhost")
+        self.assertEqual(set(stats.stages), {"read", "parameters_file", "parameters", "substitute", "parse", "load",
+                                             "compile", "validate", "namedtuple"})
+        self.assertEqual(stats.stages["read"]["bytes"], os.path.getsize(self.yml_sources()[0]))
+        self.assertEqual(stats.stages["parameters"]["placeholders"], 2)
+        self.assertEqual(stats.stages["validate"]["nodes"], 5)
+        self.assertEqual(stats.stages["validate"]["errors"], 0)
+        for totals in stats.stages.values():
+            self.assertEqual(totals["calls"], 1)
+            self.assertGreaterEqual(totals["seconds"], 0)
+
+        streaming_stats = LoadStats()
+        loader.YmlLoader(streaming=True, stats=streaming_stats).load_config(*self.yml_sources())
+        self.assertEqual(set(streaming_stats.stages), {"stream", "load"})
+
+    def test_json_stages(self):
+        stats = LoadStats()
+        loader.JsonLoader(stats=stats).load_config(os.path.join(self.example_path, "example_simple_config.json"),
+                                                   os.path.join(self.example_path, "example_simple_parameters.json"))
+        self.assertEqual(set(stats.stages), {"template", "parameters_file", "parameters", "substitute", "parse",
+                                             "load"})
+        self.assertEqual(stats.stages["template"]["placeholders"], 4)
+
+    def test_cache_hits(self):
+        stats = LoadStats()
+        yml_loader = loader.YmlLoader(cache=ConfigCache(), stats=stats)
+        for _ in range(3):
+            yml_loader.load_config(*self.yml_sources())
+        self.assertEqual(stats.stages["load"]["cache_hits"], 2)
+        self.assertEqual(stats.stages["load"]["cache_misses"], 1)
+        self.assertEqual(stats.stages["parse"]["calls"], 1)
+
+    def test_errors(self):
+        stats = LoadStats()
+        with self.assertRaises(InvalidDataException):
+            build_config(self.schema, {"database": {"host": 1}}, stats=stats)
+        self.assertEqual(stats.stages["validate"]["errors"], 1)
+        self.assertNotIn("namedtuple", stats.stages)
+
+    def test_hooks(self):
+        calls = []
+        handler = ListHandler()
+        logger = logging.getLogger("mapped_config.test.stats")
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        try:
+            stats = LoadStats(hooks=[LoggingHook(logger)])
+            stats.add_hook(lambda stage, measurements: calls.append((stage, sorted(measurements))))
+            build_config(self.schema, {"database": {"host": "a", "username": "b", "static": "c"}}, stats=stats)
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(calls, [("compile", ["seconds"]), ("validate", ["errors", "nodes", "seconds"]),
+                                 ("namedtuple", ["seconds"])])
+        self.assertEqual([record.config_stage for record in handler.records], ["compile", "validate", "namedtuple"])
+        self.assertEqual(handler.records[1].config_nodes, 5)
+
+    def test_prometheus(self):
+        stats = LoadStats()
+        stats.record("parse", 0.5, bytes=10)
+        stats.record("parse", 0.25, bytes=5)
+        stats.record("validate", 1, nodes=3)
+        text = prometheus_text(stats, prefix="app")
+        self.assertIn('app_stage_seconds_total{stage="parse"} 0.75\n', text)
+        self.assertIn('app_stage_calls_total{stage="parse"} 2.0\n', text)
+        self.assertIn('app_stage_bytes_total{stage="parse"} 15.0\n', text)
+        self.assertIn('app_stage_nodes_total{stage="validate"} 3.0\n', text)
+        self.assertIn("# TYPE app_stage_nodes_total counter\n", text)
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "config.prom")
+            write_prometheus(stats, path, prefix="app")
+            with open(path) as metrics:
+                self.assertEqual(metrics.read(), text)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_count_nodes(self):
+        self.assertEqual(count_nodes({"a": [1, {"b": 2}], "c": None}), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
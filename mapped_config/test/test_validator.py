@@ -0,0 +1,230 @@
+from mapped_config.loader import format_errors, iter_errors, build_config, InvalidDataException
+from mapped_config.schema import mapped_to_cerberus, compile_schema
+from mapped_config.validator import FastValidator, compile_validator
+from cerberus import Validator
+import copy
+import random
+import unittest
+
+
+schemas = [
+    {"number": 12345},
+    {"auth": {"username": {"type": "string", "default": "root"}, "password": None}},
+    {"hosts": [{"ip": {"type": "string"}, "port": 123}]},
+    {"names": [{"type": "string"}], "numbers": [1, 2], "anything": []},
+    {"mysql": None, "port": 34190, "ratio": 0.5, "debug": False,
+     "auth": {"username": {"type": "float", "default": "root"}, "password": None}},
+    {"queue": {"max_instances": 5, "workers": [{"name": None, "scheduler_plans": {"low": [], "high": []}}]}},
+    {"nullable": {"type": "integer", "nullable": True, "default": 3}, "optional": {"type": "dict"}},
+]
+
+documents = [
+    {},
+    {"number": 56},
+    {"number": "string"},
+    {"number": None},
+    {"number": True},
+    {"number": 1, "extra_field": "testing"},
+    {"auth": {"username": "user"}},
+    {"auth": {"username": 123, "password": None}},
+    {"auth": {"password": "x", "other": 1}},
+    {"auth": None},
+    {"auth": [1, 2]},
+    {"hosts": [{"ip": "192.168.2.1", "port": 5000}, {"ip": "192.168.2.4", "port": 6000}]},
+    {"hosts": [{"ip": "192.168.2.4", "port": "6000"}, None, {"port": 1}, 5]},
+    {"hosts": {"ip": "1"}},
+    {"hosts": None},
+    {"names": ["pepe", 123, None], "numbers": None, "anything": [None, {"a": 1}]},
+    {"names": "pepe", "numbers": [1.5, True]},
+    {"mysql": "si", "port": 12, "auth": {"password": "123", "username": "23"}, "ratio": 1, "debug": 0},
+    {"mysql": None, "ratio": "1", "debug": True},
+    {"queue": {"workers": [{"name": "cpu", "scheduler_plans": {"low": [1, 3]}}, {"scheduler_plans": None}]}},
+    {"queue": {"max_instances": 5.0, "workers": [None]}},
+    {"nullable": None, "optional": {"a": 1}},
+    {"nullable": "x", "optional": None},
+]
+
+
+def cerberus_result(schema, document):
+    validator = Validator(schema)
+    valid = validator.validate(document)
+    return valid, validator.document if valid else None, format_errors(validator.errors)
+
+
+def fast_result(schema, document):
+    validator = FastValidator(compile_validator(schema))
+    valid = validator.validate(document)
+    return valid, validator.document if valid else None, format_errors(validator.errors)
+
+
+def random_schema(rnd, depth=0):
+    schema = {}
+    for i in range(rnd.randint(1, 4)):
+        kind = rnd.choice(["required", "integer", "string", "float", "boolean", "list", "objects"] +
+                          (["dict"] * 2 if depth < 3 else []))
+        name = "f{i}".format(i=i)
+        if kind == "required":
+            schema[name] = None
+        elif kind == "integer":
+            schema[name] = rnd.randint(0, 10)
+        elif kind == "string":
+            schema[name] = rnd.choice([{"type": "string"}, "text"])
+        elif kind == "float":
+            schema[name] = 1.5
+        elif kind == "boolean":
+            schema[name] = True
+        elif kind == "list":
+            schema[name] = rnd.choice([[], [1, 2], ["a"]])
+        elif kind == "objects" and depth < 3:
+            schema[name] = [random_schema(rnd, depth + 1)]
+        else:
+            schema[name] = random_schema(rnd, depth + 1)
+    return schema
+
+
+def random_document(rnd, schema):
+    document = {}
+    for name, value in schema.items():
+        if rnd.random() < 0.2:
+            continue
+        if isinstance(value, dict) and "type" not in value:
+            document[name] = rnd.choice([random_document(rnd, value), None, "x"]) if rnd.random() < 0.3 \
+                else random_document(rnd, value)
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            document[name] = [random_document(rnd, value[0]) if rnd.random() < 0.8 else rnd.choice([None, 1])
+                              for _ in range(rnd.randint(0, 3))]
+        else:
+            document[name] = rnd.choice([1, 2.5, "text", True, None, [1, "a"], {"a": 1}])
+    if rnd.random() < 0.1:
+        document["unknown"] = 1
+    return document
+
+
+class TestFastValidatorParity(unittest.TestCase):
+
+    def test_parity(self):
+        for mapped in schemas:
+            schema = mapped_to_cerberus(mapped)
+            for document in documents:
+                self.assertEqual(cerberus_result(schema, document), fast_result(schema, document),
+                                 "Different result for {s} {d}".format(s=mapped, d=document))
+
+    def test_random_parity(self):
+        rnd = random.Random(1234)
+        for _ in range(200):
+            mapped = random_schema(rnd)
+            schema = mapped_to_cerberus(mapped)
+            for _ in range(5):
+                document = random_document(rnd, mapped)
+                self.assertEqual(cerberus_result(schema, document), fast_result(schema, document),
+                                 "Different result for {s} {d}".format(s=mapped, d=document))
+
+    def test_document_not_modified(self):
+        schema = mapped_to_cerberus({"hosts": [{"ip": None, "port": 1}], "auth": {"user": "root"}})
+        document = {"hosts": [{"ip": "a"}]}
+        validator = FastValidator(compile_validator(schema))
+        self.assertTrue(validator.validate(document))
+        self.assertEqual(document, {"hosts": [{"ip": "a"}]})
+        self.assertEqual(validator.document, {"hosts": [{"ip": "a", "port": 1}], "auth": {"user": "root"}})
+
+
+def build_result(mapped, document, **kwargs):
+    try:
+        config = build_config(mapped, copy.deepcopy(document), as_named_tuple=False, **kwargs)
+        return True, config, None
+    except InvalidDataException as e:
+        return False, None, e.errors
+
+
+class TestSectionParity(unittest.TestCase):
+
+    def test_parity(self):
+        rnd = random.Random(4321)
+        cases = [(mapped, document) for mapped in schemas for document in documents]
+        for _ in range(100):
+            mapped = random_schema(rnd)
+            cases += [(mapped, random_document(rnd, mapped)) for _ in range(5)]
+        for mapped, document in cases:
+            for engine in ("fast", "cerberus"):
+                compiled = compile_schema(mapped, engine)
+                self.assertEqual(build_result(compiled, document), build_result(compiled, document, workers=2),
+                                 "Different result for {s} {d}".format(s=mapped, d=document))
+
+
+class TestEngineSelection(unittest.TestCase):
+
+    def test_fallback(self):
+        self.assertEqual(compile_schema({"number": 1}).engine, "fast")
+        compiled = compile_schema({"number": {"type": "integer", "min": 10}})
+        self.assertEqual(compiled.engine, "cerberus")
+        with self.assertRaises(InvalidDataException) as context:
+            build_config(compiled, {"number": 5})
+        self.assertEqual(context.exception.errors, ["Field [number] min value is 10"])
+
+        with self.assertRaises(ValueError):
+            compile_schema({"number": {"type": "integer", "min": 10}}, engine="fast")
+
+    def test_same_errors(self):
+        schema = {"hosts": [{"ip": {"type": "string"}, "port": 123}]}
+        data = {"hosts": [{"ip": "192.168.2.4", "port": "6000"}]}
+        errors = []
+        for engine in ["fast", "cerberus"]:
+            with self.assertRaises(InvalidDataException) as context:
+                build_config(compile_schema(schema, engine=engine), data)
+            errors.append(context.exception.errors)
+        self.assertEqual(errors[0], ["Field [hosts:0:port] must be of integer type"])
+        self.assertEqual(errors[0], errors[1])
+
+
+def errors_of(mapped, document, **kwargs):
+    try:
+        build_config(mapped, copy.deepcopy(document), **kwargs)
+        return [], False
+    except InvalidDataException as e:
+        return e.errors, e.truncated
+
+
+class TestErrorBudget(unittest.TestCase):
+
+    def test_random_budget(self):
+        rnd = random.Random(2468)
+        cases = [(mapped, document) for mapped in schemas for document in documents]
+        for _ in range(100):
+            mapped = random_schema(rnd)
+            cases += [(mapped, random_document(rnd, mapped)) for _ in range(5)]
+        for mapped, document in cases:
+            for engine in ("fast", "cerberus"):
+                compiled = compile_schema(mapped, engine)
+                all_errors, truncated = errors_of(compiled, document)
+                self.assertFalse(truncated)
+                for max_errors in (1, 2, 3):
+                    errors, truncated = errors_of(compiled, document, max_errors=max_errors)
+                    message = "Different result for {s} {d}".format(s=mapped, d=document)
+                    # Both engines report the first errors in the cerberus order
+                    self.assertEqual(errors, all_errors[:max_errors], message)
+                    if len(all_errors) > max_errors:
+                        self.assertTrue(truncated, message)
+
+    def test_fail_fast(self):
+        document = {"hosts": [{"ip": 1, "port": "x"} for _ in range(1000)]}
+        schema = {"hosts": [{"ip": {"type": "string"}, "port": 123}]}
+        self.assertEqual(len(errors_of(schema, document)[0]), 2000)
+        self.assertEqual(errors_of(schema, document, fail_fast=True),
+                         (["Field [hosts:0:ip] must be of string type"], True))
+        self.assertEqual(errors_of(schema, document, max_errors=3),
+                         (["Field [hosts:0:ip] must be of string type", "Field [hosts:0:port] must be of integer type",
+                           "Field [hosts:1:ip] must be of string type"], True))
+        with self.assertRaises(ValueError):
+            build_config(schema, document, max_errors=0)
+
+    def test_iter_errors(self):
+        errors = {"b": [{0: [{"c": ["bad"]}], 1: ["worse"]}], "a": ["required field"]}
+        self.assertEqual(list(iter_errors(errors)), format_errors(errors))
+        self.assertEqual(format_errors(errors, ["root"]), ["Field [root:b:0:c] bad", "Field [root:b:1] worse",
+                                                           "Field [root:a] required field"])
+        messages = iter_errors(errors)
+        self.assertEqual(next(messages), "Field [b:0:c] bad")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+from mapped_config.loader import YmlLoader, InvalidDataException
+from mapped_config.watcher import ConfigWatcher
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+
+class TestConfigWatcher(unittest.TestCase):
+    schema = {"database": {"host": None, "port": 3306}}
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp_dir, "config.yml")
+        self.parameters_path = os.path.join(self.tmp_dir, "parameters.yml")
+        self.write(self.config_path, "database:\n  host: {database_host}\n")
+        self.write(self.parameters_path, "database_host: localhost\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def write(path, content):
+        # Write and rename like most editors do
+        with open(path + ".tmp", "w") as f:
+            f.write(content)
+        os.rename(path + ".tmp", path)
+
+    def watcher(self, use_inotify):
+        return ConfigWatcher(YmlLoader(), self.config_path, self.parameters_path, self.schema,
+                             debounce=0.05, poll_interval=0.05, use_inotify=use_inotify)
+
+    def check_reload(self, use_inotify):
+        watcher = self.watcher(use_inotify)
+        self.assertEqual(watcher.config.database.host, "localhost")
+        reloaded = threading.Event()
+        changes = []
+
+        def on_change(paths, config):
+            changes.append((paths, config))
+            reloaded.set()
+
+        watcher.subscribe(on_change)
+        with watcher:
+            self.write(self.parameters_path, "database_host: remote\n")
+            self.assertTrue(reloaded.wait(5))
+
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0][0], [self.parameters_path])
+        self.assertEqual(watcher.config.database.host, "remote")
+        self.assertIs(changes[0][1], watcher.config)
+
+    def test_reload_polling(self):
+        self.check_reload(use_inotify=False)
+
+    def test_reload_inotify(self):
+        self.check_reload(use_inotify=True)
+
+    def test_invalid_keeps_config(self):
+        watcher = self.watcher(use_inotify=False)
+        config = watcher.config
+        failed = threading.Event()
+        received = []
+
+        def on_error(exception):
+            received.append(exception)
+            failed.set()
+
+        watcher.subscribe_errors(on_error)
+        with watcher:
+            self.write(self.config_path, "database:\n  host: {database_host}\n  port: wrong\n")
+            self.assertTrue(failed.wait(5))
+
+        self.assertIs(watcher.config, config)
+        self.assertIsInstance(received[0], InvalidDataException)
+        self.assertEqual(watcher.errors, ["Field [database:port] must be of integer type"])
+
+    def test_failed_reload_not_retried(self):
+        watcher = self.watcher(use_inotify=False)
+        failed = threading.Event()
+        reloaded = threading.Event()
+        received = []
+        watcher.subscribe_errors(lambda exception: (received.append(exception), failed.set()))
+        watcher.subscribe(lambda paths, config: reloaded.set())
+        with watcher:
+            self.write(self.config_path, "database:\n  host: {database_host}\n  port: wrong\n")
+            self.assertTrue(failed.wait(5))
+            # Many wake-ups, the files did not change again
+            time.sleep(0.5)
+            self.assertEqual(len(received), 1)
+
+            failed.clear()
+            self.write(self.config_path, "database:\n  host: {database_host}\n  port: worse\n")
+            self.assertTrue(failed.wait(5))
+            time.sleep(0.3)
+            self.assertEqual(len(received), 2)
+
+            self.write(self.config_path, "database:\n  host: {database_host}\n  port: 3307\n")
+            self.assertTrue(reloaded.wait(5))
+        self.assertEqual(watcher.config.database.port, 3307)
+        self.assertIsNone(watcher.errors)
+
+    def test_debounce(self):
+        watcher = ConfigWatcher(YmlLoader(), self.config_path, self.parameters_path, self.schema,
+                                debounce=0.3, poll_interval=0.02, use_inotify=False)
+        reloaded = threading.Event()
+        hosts = []
+        watcher.subscribe(lambda paths, config: (hosts.append(config.database.host), reloaded.set()))
+        with watcher:
+            for i in range(5):
+                self.write(self.parameters_path, "database_host: host{i}\n".format(i=i))
+                self.assertFalse(reloaded.wait(0.05))
+            self.assertTrue(reloaded.wait(5))
+        self.assertEqual(hosts, ["host4"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+"""
+Validation engine for the schemas produced by mapped_to_cerberus.
+
+Mapped schemas only use a small subset of cerberus (type, default, required, nullable and nested dict or list
+schemas). This module compiles that subset into precomputed checkers per node, producing the same normalized
+document and the same errors as cerberus. When a schema uses any other rule compile_validator returns None
+and the caller falls back to cerberus.
+"""
+import copy
+import six
+from cerberus import DocumentError, Validator, errors
+from collections.abc import Mapping, Sequence
+
+
+SUPPORTED_RULES = frozenset(["type", "default", "required", "nullable", "schema"])
+
+_messages = errors.BasicErrorHandler.messages
+REQUIRED_FIELD = _messages[errors.REQUIRED_FIELD.code]
+UNKNOWN_FIELD = _messages[errors.UNKNOWN_FIELD.code]
+NOT_NULLABLE = _messages[errors.NOT_NULLABLE.code]
+BAD_TYPE = _messages[errors.BAD_TYPE.code]
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class _Budget(object):
+    """Errors left before the validation stops (max_errors of FastValidator)"""
+    __slots__ = ("remaining", "truncated")
+
+    def __init__(self, max_errors):
+        self.remaining = max_errors
+        self.truncated = False
+
+    def exhausted(self):
+        """True when no more errors are allowed, the rest of the document is not validated"""
+        if self.remaining <= 0:
+            self.truncated = True
+            return True
+        return False
+
+
+class _Field(object):
+    """
+    Precomputed rules of a field. check(value, budget) returns the cerberus error list of a value or None, the
+    budget is a _Budget or None to find every error
+    """
+    __slots__ = ("check", "normalize", "has_default", "default", "copy_default", "nullable")
+
+    def default_value(self):
+        return copy.deepcopy(self.default) if self.copy_default else self.default
+
+
+class _Node(object):
+    """Precomputed rules of a dict schema"""
+    __slots__ = ("fields", "defaults", "required")
+
+
+def _compile_node(schema):
+    if not isinstance(schema, dict):
+        raise UnsupportedSchema(schema)
+    node = _Node()
+    node.fields = dict((name, _compile_field(rules)) for name, rules in schema.items())
+    node.defaults = tuple((name, field) for name, field in node.fields.items() if field.has_default)
+    node.required = tuple(name for name, rules in schema.items() if rules.get("required") is True)
+    return node
+
+
+def _compile_field(rules):
+    if not isinstance(rules, dict) or not SUPPORTED_RULES.issuperset(rules):
+        raise UnsupportedSchema(rules)
+
+    field = _Field()
+    field.nullable = nullable = rules.get("nullable", False)
+    field.has_default = "default" in rules
+    field.default = rules.get("default")
+    field.copy_default = isinstance(field.default, (dict, list))
+    if not isinstance(nullable, bool) or not isinstance(rules.get("required", False), bool):
+        raise UnsupportedSchema(rules)
+
+    type_name = rules.get("type")
+    if type_name is not None:
+        if not isinstance(type_name, six.string_types) or type_name not in Validator.types_mapping:
+            raise UnsupportedSchema(rules)
+        definition = Validator.types_mapping[type_name]
+        included, excluded = definition.included_types, definition.excluded_types
+        type_error = [BAD_TYPE.format(constraint=type_name)]
+
+    node = item = None
+    if "schema" in rules:
+        if type_name == "dict":
+            node = _compile_node(rules["schema"])
+        elif type_name == "list":
+            item = _compile_field(rules["schema"])
+        else:
+            raise UnsupportedSchema(rules)
+
+    def check(value, budget):
+        if value is None:
+            if nullable:
+                return None
+            if budget is not None:
+                budget.remaining -= 1
+            return [NOT_NULLABLE]
+        if type_name is not None and (not isinstance(value, included) or isinstance(value, excluded)):
+            if budget is not None:
+                budget.remaining -= 1
+            return type_error
+        if node is not None:
+            node_errors = _validate_node(node, value, budget)
+            return [node_errors] if node_errors else None
+        if item is not None:
+            item_check = item.check
+            item_errors = {}
+            for i, value_item in enumerate(value):
+                if budget is not None and budget.exhausted():
+                    break
+                error = item_check(value_item, budget)
+                if error:
+                    item_errors[i] = error
+            return [item_errors] if item_errors else None
+        return None
+
+    field.check = check
+
+    if node is not None:
+        def normalize(value):
+            if isinstance(value, Mapping):
+                return _normalize_node(node, value)
+            return value
+    elif item is not None:
+        def normalize(value):
+            if isinstance(value, Sequence) and not isinstance(value, six.string_types):
+                return type(value)(_normalize_item(item, value_item) for value_item in value)
+            return value
+    else:
+        normalize = None
+    field.normalize = normalize
+
+    return field
+
+
+def _normalize_item(field, value):
+    if value is None and field.has_default and not field.nullable:
+        value = field.default_value()
+    if field.normalize is not None:
+        value = field.normalize(value)
+    return value
+
+
+def _normalize_node(node, mapping):
+    result = copy.copy(mapping)
+    for name, field in node.defaults:
+        if name not in result or (result[name] is None and not field.nullable):
+            result[name] = field.default_value()
+    fields = node.fields
+    for name in result:
+        field = fields.get(name)
+        if field is not None and field.normalize is not None:
+            result[name] = field.normalize(result[name])
+    return result
+
+
+def _error_key(name):
+    """Cerberus sorts the errors by path: integers (list items) first, then strings, then anything else"""
+    if isinstance(name, six.integer_types):
+        return 0, name, ""
+    elif isinstance(name, six.string_types):
+        return 1, 0, name
+    return 2, 0, repr(name)
+
+
+def sort_errors(node_errors):
+    """The errors of a node in the cerberus order"""
+    if len(node_errors) < 2:
+        return node_errors
+    return dict((name, node_errors[name]) for name in sorted(node_errors, key=_error_key))
+
+
+def _validate_node(node, mapping, budget=None):
+    if budget is not None:
+        return _validate_node_budget(node, mapping, budget)
+    node_errors = {}
+    fields = node.fields
+    for name, value in mapping.items():
+        field = fields.get(name)
+        if field is None:
+            node_errors[name] = [UNKNOWN_FIELD]
+        else:
+            error = field.check(value, None)
+            if error:
+                node_errors[name] = error
+    for name in node.required:
+        if name not in mapping:
+            node_errors[name] = [REQUIRED_FIELD]
+    return sort_errors(node_errors)
+
+
+def _validate_node_budget(node, mapping, budget):
+    # The fields are checked in the cerberus order, so the errors found before stopping are the first ones
+    names = list(mapping)
+    names.extend(name for name in node.required if name not in mapping)
+    node_errors = {}
+    fields = node.fields
+    for name in sorted(names, key=_error_key):
+        if budget.exhausted():
+            break
+        if name not in mapping:
+            node_errors[name] = [REQUIRED_FIELD]
+            budget.remaining -= 1
+            continue
+        field = fields.get(name)
+        if field is None:
+            node_errors[name] = [UNKNOWN_FIELD]
+            budget.remaining -= 1
+        else:
+            error = field.check(mapping[name], budget)
+            if error:
+                node_errors[name] = error
+    return node_errors
+
+
+class FastValidator(object):
+    """
+    Same interface as the cerberus Validator used by build_config: validate, document and errors.
+    With max_errors the validation stops after that many errors, truncated tells if part of the document was
+    not validated
+    """
+    __slots__ = ("_node", "_max_errors", "document", "errors", "truncated")
+
+    def __init__(self, node, max_errors=None):
+        self._node = node
+        self._max_errors = max_errors
+        self.document = None
+        self.errors = {}
+        self.truncated = False
+
+    def validate(self, document):
+        if document is None:
+            raise DocumentError(errors.DOCUMENT_MISSING)
+        if not isinstance(document, Mapping):
+            raise DocumentError(errors.DOCUMENT_FORMAT.format(document))
+        self.document = _normalize_node(self._node, document)
+        budget = _Budget(self._max_errors) if self._max_errors is not None else None
+        self.errors = _validate_node(self._node, self.document, budget)
+        self.truncated = budget is not None and budget.truncated
+        return not self.errors
+
+    __call__ = validate
+
+
+def compile_validator(schema):
+    """Compile a cerberus schema. Returns None if it uses rules not supported by the fast engine"""
+    try:
+        return _compile_node(schema)
+    except UnsupportedSchema:
+        return None
@@ -0,0 +1,216 @@
+"""
+Reload a configuration when its files change.
+
+ConfigWatcher watches the config and parameters files (with inotify on Linux, polling their stat otherwise),
+rebuilds the configuration in a background thread and swaps it when the new one is valid.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import sys
+import threading
+from .cache import file_key
+from .loader import build_config, InvalidDataException
+from .schema import compile_schema
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class PollingWatch(object):
+    """Wakes up every interval, the watcher compares the stat of the files"""
+
+    def __init__(self, directories, stop_event):
+        self._stop_event = stop_event
+
+    def wait(self, timeout):
+        self._stop_event.wait(timeout)
+
+    def close(self):
+        pass
+
+
+class InotifyWatch(object):
+    """Wakes up as soon as something changes in the directories of the files"""
+
+    def __init__(self, directories, stop_event):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch the directories, editors usually replace the file instead of writing it
+        for directory in directories:
+            if libc.inotify_add_watch(self._fd, directory.encode(sys.getfilesystemencoding()), WATCH_MASK) < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed for {path}".format(path=directory))
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if readable:
+            self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                if not os.read(self._fd, 65536):
+                    return
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+
+    def close(self):
+        os.close(self._fd)
+
+
+class ConfigWatcher(object):
+    """
+    Keep the configuration built from config_source and parameters_source up to date.
+
+    The initial configuration is built in the constructor (errors are raised). After start, changes are
+    debounced (the files must stay unchanged for debounce seconds) and the configuration is rebuilt in a
+    background thread. If the new configuration is not valid the old one is kept, the errors are stored in
+    errors and the error subscribers are called with the exception.
+    """
+
+    def __init__(self, loader, config_source, parameters_source, mapping, as_namedtuple=True, debounce=0.2,
+                 poll_interval=1.0, use_inotify=True):
+        self.loader = loader
+        self.config_source = config_source
+        self.parameters_source = parameters_source
+        self.schema = compile_schema(mapping)
+        self.as_namedtuple = as_namedtuple
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.errors = None
+        self._last_exception = None
+        self._config = None
+        self._signatures = None
+        # Files of the last failed reload, it is not retried until they change again
+        self._failed_signatures = None
+        self._subscribers = []
+        self._error_subscribers = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._watch = None
+        if not self.reload():
+            raise self._last_exception
+
+    @property
+    def config(self):
+        """The current configuration"""
+        return self._config
+
+    @property
+    def paths(self):
+        return [self.config_source, self.parameters_source]
+
+    def subscribe(self, callback):
+        """callback(changed_paths, config) is called after every successful reload"""
+        self._subscribers.append(callback)
+
+    def subscribe_errors(self, callback):
+        """callback(exception) is called when a reload fails"""
+        self._error_subscribers.append(callback)
+
+    def _current_signatures(self):
+        return dict((path, file_key(path)) for path in self.paths)
+
+    def reload(self, changed_paths=None):
+        """Build the configuration again and swap it. Returns False (keeping the old one) if it fails"""
+        signatures = self._current_signatures()
+        try:
+            data = self.loader.load_config(self.config_source, self.parameters_source)
+            config = build_config(self.schema, data, as_named_tuple=self.as_namedtuple)
+        except Exception as e:
+            self._last_exception = e
+            self._failed_signatures = signatures
+            self.errors = e.errors if isinstance(e, InvalidDataException) else [str(e)]
+            if self._config is not None:
+                logger.warning("Configuration %s not reloaded: %s", self.config_source, "; ".join(self.errors))
+                for callback in list(self._error_subscribers):
+                    callback(e)
+            return False
+
+        with self._lock:
+            self._config = config
+            self._signatures = signatures
+            self._failed_signatures = None
+            self.errors = None
+        if changed_paths is not None:
+            for callback in list(self._subscribers):
+                callback(changed_paths, config)
+        return True
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        directories = sorted(set(os.path.dirname(os.path.abspath(path)) for path in self.paths))
+        self._watch = None
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._watch = InotifyWatch(directories, self._stop_event)
+            except (OSError, AttributeError) as e:
+                logger.info("inotify not available (%s), polling the config files", e)
+        if self._watch is None:
+            self._watch = PollingWatch(directories, self._stop_event)
+        self._thread = threading.Thread(target=self._run, name="ConfigWatcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._watch.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _changed_paths(self, signatures):
+        return sorted(path for path in self.paths if signatures[path] != self._signatures[path])
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._watch.wait(self.poll_interval)
+            signatures = self._current_signatures()
+            if signatures == self._failed_signatures or not self._changed_paths(signatures):
+                continue
+
+            # Wait until the files stop changing, editors can write several times
+            while not self._stop_event.wait(self.debounce):
+                current = self._current_signatures()
+                if current == signatures:
+                    break
+                signatures = current
+            if self._stop_event.is_set():
+                return
+
+            changed_paths = self._changed_paths(signatures)
+            if changed_paths and signatures != self._failed_signatures:
+                try:
+                    self.reload(changed_paths)
+                except Exception:
+                    logger.exception("Error in a configuration subscriber")
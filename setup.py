@@ -15,5 +15,9 @@ setup(
     keywords=['config', 'configuration', 'yml', 'json'],
     classifiers=['Topic :: Adaptive Technologies', 'Topic :: Software Development', 'Topic :: System',
                  'Topic :: Utilities'],
-    install_requires=install_requires
+    python_requires='>=3.7',
+    install_requires=install_requires,
+    entry_points={
+        'console_scripts': ['mapped-config-snapshot=mapped_config.snapshot:main'],
+    }
 )